@@ -0,0 +1,3 @@
+ALTER TABLE user_activities ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT now();
+UPDATE user_activities SET updated_at = created_at;
+CREATE INDEX IF NOT EXISTS ix_user_activities_updated_at ON user_activities (updated_at);
@@ -16,7 +16,8 @@ from app.schemas.orders import (
     OrderStats,
     TransactionStats
 )
-from app.models.orders import OrderStatus, TransactionStatus
+from app.models.orders import OrderStatus, TransactionStatus, TransactionType
+from app.services.trending import trending_engine
 
 router = APIRouter()
 
@@ -103,7 +104,9 @@ def borrow_book(
         raise HTTPException(status_code=404, detail="Order not found")
     if order.user_id != current_user.id and not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    return crud_orders.borrow_book(db=db, order_id=order_id, borrow_request=borrow_request)
+    order = crud_orders.borrow_book(db=db, order_id=order_id, borrow_request=borrow_request)
+    trending_engine.record(order.book_id, "borrow")
+    return order
 
 @router.post("/{order_id}/purchase", response_model=Order)
 def purchase_book(
@@ -121,7 +124,9 @@ def purchase_book(
         raise HTTPException(status_code=404, detail="Order not found")
     if order.user_id != current_user.id and not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    return crud_orders.purchase_book(db=db, order_id=order_id, purchase_request=purchase_request)
+    order = crud_orders.purchase_book(db=db, order_id=order_id, purchase_request=purchase_request)
+    trending_engine.record(order.book_id, "purchase")
+    return order
 
 @router.post("/{order_id}/return", response_model=Order)
 def return_book(
@@ -204,7 +209,11 @@ def create_transaction(
     """
     Create new transaction.
     """
-    return crud_orders.create_transaction(db=db, user_id=current_user.id, transaction=transaction_in)
+    transaction = crud_orders.create_transaction(db=db, user_id=current_user.id, transaction=transaction_in)
+    event = "purchase" if transaction_in.transaction_type == TransactionType.BUY else "borrow"
+    for item in transaction_in.items:
+        trending_engine.record(item.book_id, event)
+    return transaction
 
 @router.get("/transactions/", response_model=List[Transaction])
 def read_transactions(
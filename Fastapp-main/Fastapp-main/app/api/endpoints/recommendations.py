@@ -1,8 +1,9 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from typing import Dict, List, Optional
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
-from app.core.deps import get_db
+from app.core.deps import get_db, get_current_superuser
 from app.core.auth import get_current_user
 from app.crud import recommendations as crud_recommendations
 from app.schemas.recommendations import (
@@ -14,11 +15,21 @@ from app.schemas.recommendations import (
     RecommendationUpdate,
     RecommendationResponse,
     TrendingBook,
+    TrendingScore,
     RecommendationRequest,
-    SimilarBooksRequest
+    SimilarBooksRequest,
+    BatchRecommendationRequest,
+    BatchRecommendationResult,
+    TrainingJob
 )
 from app.services.recommender import HybridRecommender
+from app.services.model_registry import model_registry, get_recommender
+from app.services.recommendation_cache import recommendation_cache, trending_cache
+from app.services.candidates import stage_timings
+from app.services.trending import trending_engine
+from app.services.cold_start import cold_start_recommender, is_cold_start
 from app.crud import books as crud_books
+from app.crud import users as crud_users
 
 router = APIRouter()
 
@@ -30,11 +41,13 @@ def create_user_activity(
     current_user = Depends(get_current_user)
 ) -> UserActivity:
     """Create a new user activity record."""
-    return crud_recommendations.create_user_activity(
+    db_activity = crud_recommendations.create_user_activity(
         db=db,
         user_id=current_user.id,
         activity=activity
     )
+    recommendation_cache.invalidate_user(current_user.id)
+    return db_activity
 
 @router.put("/activities/{book_id}", response_model=UserActivity)
 def update_user_activity(
@@ -53,6 +66,7 @@ def update_user_activity(
     )
     if not db_activity:
         raise HTTPException(status_code=404, detail="Activity not found")
+    recommendation_cache.invalidate_user(current_user.id)
     return db_activity
 
 @router.post("/activities/{book_id}/view", response_model=UserActivity)
@@ -67,11 +81,14 @@ def record_book_view(
     if not crud_books.get_book(db, book_id=book_id):
         raise HTTPException(status_code=404, detail="Book not found")
     
-    return crud_recommendations.record_book_view(
+    db_activity = crud_recommendations.record_book_view(
         db=db,
         user_id=current_user.id,
         book_id=book_id
     )
+    recommendation_cache.invalidate_user(current_user.id)
+    trending_engine.record(book_id, "view")
+    return db_activity
 
 @router.post("/activities/{book_id}/favorite", response_model=UserActivity)
 def toggle_favorite(
@@ -85,11 +102,17 @@ def toggle_favorite(
     if not crud_books.get_book(db, book_id=book_id):
         raise HTTPException(status_code=404, detail="Book not found")
     
-    return crud_recommendations.toggle_favorite(
+    db_activity = crud_recommendations.toggle_favorite(
         db=db,
         user_id=current_user.id,
         book_id=book_id
     )
+    recommendation_cache.invalidate_user(current_user.id)
+    if db_activity.is_favorite:
+        trending_engine.record(book_id, "favorite")
+    else:
+        trending_engine.retract(book_id, "favorite")
+    return db_activity
 
 @router.get("/activities/", response_model=List[UserActivity])
 def get_user_activities(
@@ -235,44 +258,89 @@ def get_trending_books(
     days: int = 7
 ) -> List[TrendingBook]:
     """Get trending books based on recent activity."""
-    return crud_recommendations.get_trending_books(
-        db=db,
-        limit=limit,
-        days=days
-    )
+    trending = trending_cache.get((limit, days))
+    if trending is None:
+        trending = crud_recommendations.get_trending_books(
+            db=db,
+            limit=limit,
+            days=days
+        )
+        trending_cache.set((limit, days), trending)
+    return trending
+
+@router.get("/trending/live", response_model=List[TrendingScore])
+def get_live_trending_books(
+    *,
+    db: Session = Depends(get_db),
+    limit: int = 10
+) -> List[TrendingScore]:
+    """
+    Get trending books by exponentially decayed event scores, updated on every event.
+
+    Scores are kept per worker process: they include every process's events
+    up to the last restart, but only this worker's events since then.
+    """
+    top = trending_engine.top(limit)
+    books = {book.book_id: book for book in crud_books.get_books_by_ids(db, [book_id for book_id, _ in top])}
+    return [
+        TrendingScore(
+            book_id=book_id,
+            title=books[book_id].title,
+            author=books[book_id].author,
+            trending_score=score
+        )
+        for book_id, score in top
+        if book_id in books
+    ]
 
 @router.post("/generate/", response_model=RecommendationResponse)
 def generate_recommendations(
     *,
     db: Session = Depends(get_db),
     request: RecommendationRequest,
-    background_tasks: BackgroundTasks,
     current_user = Depends(get_current_user)
 ) -> RecommendationResponse:
     """Generate personalized recommendations for the user."""
-    recommender = HybridRecommender(db)
-    
-    # Get user activities and books
-    user_activities = crud_recommendations.get_user_activities(
-        db=db,
-        user_id=current_user.id,
-        limit=1000
-    )
-    books = crud_books.get_books(db, skip=0, limit=1000)
-    
-    # Train the model if needed
-    if not recommender.content_model or not recommender.collaborative_model:
-        background_tasks.add_task(
-            recommender.train,
-            books=[book.__dict__ for book in books],
-            user_activities=[activity.__dict__ for activity in user_activities]
+
+    seen = crud_recommendations.get_user_book_ids(db, current_user.id)
+    if is_cold_start(len(seen)):
+        # New users: popular books in their favorite genres, without touching the models
+        recommendations = cold_start_recommender.recommend(
+            db, current_user.favorite_genres, request.n_recommendations, exclude=seen
+        )
+    else:
+        recommender = model_registry.get_recommender(db)
+
+        # Queue a training run if needed; concurrent requests share one job
+        if not recommender.content_model or not recommender.collaborative_model:
+            crud_recommendations.enqueue_training_job(db, model_name=recommender.model_name)
+
+        def compute_recommendations():
+            user_activities = crud_recommendations.get_user_activities(
+                db=db,
+                user_id=current_user.id,
+                limit=1000
+            )
+            return recommender.get_hybrid_recommendations(
+                user_id=current_user.id,
+                n_recommendations=request.n_recommendations,
+                interactions={
+                    activity.book_id: activity.interaction_score
+                    for activity in user_activities
+                },
+                content_weight=request.content_weight,
+                collab_weight=request.collab_weight,
+                db=db
+            )
+
+        # Generate recommendations, reusing the cached list until the user's activity changes
+        recommendations = recommendation_cache.personalized(
+            user_id=current_user.id,
+            model_version=recommender.version,
+            n_recommendations=request.n_recommendations,
+            compute=compute_recommendations,
+            variant=f"{request.content_weight}:{request.collab_weight}"
         )
-    
-    # Generate recommendations
-    recommendations = recommender.get_hybrid_recommendations(
-        user_id=current_user.id,
-        n_recommendations=request.n_recommendations
-    )
     
     # Create recommendation record
     recommendation = crud_recommendations.create_recommendation(
@@ -306,6 +374,102 @@ def generate_recommendations(
         books=books
     )
 
+@router.post("/batch/", response_model=BatchRecommendationResult)
+def generate_batch_recommendations(
+    *,
+    db: Session = Depends(get_db),
+    request: BatchRecommendationRequest,
+    recommender: HybridRecommender = Depends(get_recommender),
+    current_user = Depends(get_current_superuser)
+) -> BatchRecommendationResult:
+    """Precompute and store personalized recommendations for many users."""
+    user_ids = request.user_ids
+    if user_ids is None:
+        user_ids = [] if recommender.user_ids is None else recommender.user_ids.tolist()
+
+    scored = recommender.recommend_batch(
+        user_ids=user_ids,
+        n_recommendations=request.n_recommendations
+    )
+
+    # Stored relevance is relative to each user's best match (0-1)
+    recommendations = {}
+    for user_id, recs in scored.items():
+        top_score = recs[0][1] if recs and recs[0][1] > 0 else 1.0
+        recommendations[user_id] = [
+            {
+                "book_id": book_id,
+                "relevance_score": max(score, 0.0) / top_score,
+                "reason": "Based on similar users' preferences"
+            }
+            for book_id, score in recs
+        ]
+
+    created = crud_recommendations.bulk_create_recommendations(
+        db=db,
+        recommendations=recommendations
+    )
+    return BatchRecommendationResult(
+        model_version=recommender.version,
+        users_scored=len(scored),
+        recommendations_created=created
+    )
+
+@router.post("/model/update", response_model=TrainingJob)
+def update_model(
+    *,
+    db: Session = Depends(get_db),
+    since: Optional[datetime] = None,
+    full: bool = False,
+    current_user = Depends(get_current_superuser)
+) -> TrainingJob:
+    """
+    Queue a model update for the training worker.
+
+    By default books and activities recorded since the last update (or `since`)
+    are folded into the current model; `full` requests a complete retrain.
+    """
+    return crud_recommendations.enqueue_training_job(
+        db,
+        model_name=model_registry.model_name,
+        kind="train" if full else "update",
+        payload={"since": since.isoformat() if since else None}
+    )
+
+@router.get("/training-jobs/", response_model=List[TrainingJob])
+def get_training_jobs(
+    *,
+    db: Session = Depends(get_db),
+    model_name: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 20,
+    current_user = Depends(get_current_superuser)
+) -> List[TrainingJob]:
+    """List recent training jobs, newest first."""
+    return crud_recommendations.get_training_jobs(
+        db, model_name=model_name, skip=skip, limit=limit
+    )
+
+@router.get("/training-jobs/{job_id}", response_model=TrainingJob)
+def get_training_job(
+    *,
+    db: Session = Depends(get_db),
+    job_id: int,
+    current_user = Depends(get_current_superuser)
+) -> TrainingJob:
+    """Get the status of a training job."""
+    job = crud_recommendations.get_training_job(db, job_id=job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
+
+@router.get("/pipeline/timings", response_model=Dict[str, Dict[str, float]])
+def get_pipeline_timings(
+    current_user = Depends(get_current_superuser)
+) -> Dict[str, Dict[str, float]]:
+    """Recent per-stage latencies of the two-stage recommendation pipeline in this process."""
+    return stage_timings.summary()
+
 @router.post("/recommendations", response_model=List[RecommendationResponse])
 def get_recommendations(
     request: RecommendationRequest,
@@ -315,11 +479,30 @@ def get_recommendations(
     Get personalized book recommendations for a user.
     """
     try:
-        recommender = HybridRecommender(db)
-        recommendations = recommender.get_hybrid_recommendations(
-            user_id=request.user_id,
-            n_recommendations=request.n_recommendations
-        )
+        seen = crud_recommendations.get_user_book_ids(db, request.user_id)
+        if is_cold_start(len(seen)):
+            user = crud_users.get_user(db, user_id=request.user_id)
+            recommendations = cold_start_recommender.recommend(
+                db,
+                user.favorite_genres if user else None,
+                request.n_recommendations,
+                exclude=seen
+            )
+        else:
+            recommender = model_registry.get_recommender(db)
+            recommendations = recommendation_cache.personalized(
+                user_id=request.user_id,
+                model_version=recommender.version,
+                n_recommendations=request.n_recommendations,
+                compute=lambda: recommender.get_hybrid_recommendations(
+                    user_id=request.user_id,
+                    n_recommendations=request.n_recommendations,
+                    content_weight=request.content_weight,
+                    collab_weight=request.collab_weight,
+                    db=db
+                ),
+                variant=f"{request.content_weight}:{request.collab_weight}"
+            )
         return [
             RecommendationResponse(
                 book_id=rec["book_id"],
@@ -334,19 +517,41 @@ def get_recommendations(
             detail=f"Error generating recommendations: {str(e)}"
         )
 
+@router.get("/also-borrowed/{book_id}", response_model=List[RecommendationResponse])
+def get_also_borrowed(
+    book_id: int,
+    n_recommendations: int = 10,
+    recommender: HybridRecommender = Depends(get_recommender)
+) -> List[RecommendationResponse]:
+    """
+    Get books that readers of this book also borrowed, bought or liked.
+    """
+    return [
+        RecommendationResponse(
+            book_id=rec["book_id"],
+            score=rec["score"],
+            reason=rec["reason"]
+        )
+        for rec in recommender.get_also_borrowed(book_id, n_recommendations)
+    ]
+
 @router.post("/similar-books", response_model=List[RecommendationResponse])
 def get_similar_books(
     request: SimilarBooksRequest,
-    db: Session = Depends(get_db)
+    recommender: HybridRecommender = Depends(get_recommender)
 ) -> List[RecommendationResponse]:
     """
     Get books similar to a given book.
     """
     try:
-        recommender = HybridRecommender(db)
-        similar_books = recommender.get_similar_books(
+        similar_books = recommendation_cache.similar(
             book_id=request.book_id,
-            n_recommendations=request.n_recommendations
+            model_version=recommender.version,
+            n_recommendations=request.n_recommendations,
+            compute=lambda: recommender.get_similar_books(
+                book_id=request.book_id,
+                n_recommendations=request.n_recommendations
+            )
         )
         return [
             RecommendationResponse(
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Path
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
@@ -19,15 +19,19 @@ from app.schemas.reviews import (
     ReviewStats
 )
 from app.crud import reviews as crud_reviews
-from app.services.sentiment_analyzer import SentimentAnalyzer
+from app.services.review_sentiment import (
+    get_review_sentiments, polarity, refresh_review_sentiment, sentiment_stats
+)
+from app.services.sentiment_analyzer import sentiment_interpretation
+from app.services.trending import trending_engine
 
 router = APIRouter()
-sentiment_analyzer = SentimentAnalyzer()
 
 # BookReview endpoints
 @router.post("/", response_model=BookReviewSchema)
 def create_book_review(
     review: BookReviewCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
@@ -35,9 +39,13 @@ def create_book_review(
     Create a new book review.
     """
     try:
-        return crud_reviews.create_book_review(db, review, current_user.id)
+        db_review = crud_reviews.create_book_review(db, review, current_user.id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    trending_engine.record(db_review.book_id, "review")
+    if db_review.review_text:
+        background_tasks.add_task(refresh_review_sentiment, db_review.review_id)
+    return db_review
 
 @router.get("/", response_model=List[BookReviewSchema])
 def get_book_reviews(
@@ -77,6 +85,7 @@ def get_book_reviews(
 
 @router.put("/{review_id}", response_model=BookReviewSchema)
 def update_book_review(
+    background_tasks: BackgroundTasks,
     review_id: int = Path(..., title="The ID of the book review to update"),
     review: BookReviewUpdate = None,
     db: Session = Depends(get_db),
@@ -88,6 +97,9 @@ def update_book_review(
     updated_review = crud_reviews.update_book_review(db, review_id, review, current_user.id)
     if not updated_review:
         raise HTTPException(status_code=404, detail="Book review not found or unauthorized")
+    if updated_review.review_text:
+        # A no-op when the text is unchanged
+        background_tasks.add_task(refresh_review_sentiment, review_id)
     return updated_review
 
 @router.delete("/{review_id}", response_model=bool)
@@ -157,20 +169,25 @@ def analyze_review_sentiment(
     current_user: User = Depends(get_current_user)
 ):
     """
-    Analyze the sentiment of a specific review.
+    Get the sentiment of a specific review, computed once per review text.
     """
     review = crud_reviews.get_book_review(db, review_id)
     if not review:
         raise HTTPException(status_code=404, detail="Book review not found")
-    
-    sentiment = sentiment_analyzer.analyze_sentiment(review.review_text or "")
-    interpretation = sentiment_analyzer.get_sentiment_interpretation(sentiment)
-    
+    if not review.review_text:
+        raise HTTPException(status_code=404, detail="Book review has no text")
+
+    sentiment = get_review_sentiments(db, [review])[review_id]
+    score = polarity(sentiment["scores"])
+
     return {
         "review_id": review_id,
         "book_title": review.book.title,
-        "sentiment": sentiment,
-        "interpretation": interpretation
+        "sentiment": sentiment["sentiment"],
+        "score": score,
+        "confidence": sentiment["confidence"],
+        "scores": sentiment["scores"],
+        "interpretation": sentiment_interpretation(score)
     }
 
 @router.get("/books/{book_id}/sentiment/stats", response_model=BookSentimentStats)
@@ -180,21 +197,19 @@ def analyze_book_reviews_sentiment(
     current_user: User = Depends(get_current_user)
 ):
     """
-    Analyze the sentiment of all reviews for a specific book.
+    Summarize the sentiment of all reviews for a specific book.
     """
-    reviews = crud_reviews.get_book_reviews(db, book_id=book_id)
+    reviews = crud_reviews.get_book_reviews(db, book_id=book_id, limit=None)
     if not reviews:
         raise HTTPException(status_code=404, detail="No reviews found for this book")
-    
-    # Prepare reviews for analysis
-    review_data = [(r.review_id, r.book.title, r.review_text or "") for r in reviews]
-    analysis_results = sentiment_analyzer.analyze_reviews(review_data)
-    stats = sentiment_analyzer.get_sentiment_stats(analysis_results)
-    
+
+    # The model is only loaded if some review has no up-to-date stored sentiment
+    sentiments = get_review_sentiments(db, reviews)
+
     return {
         "book_id": book_id,
         "book_title": reviews[0].book.title,
-        **stats
+        **sentiment_stats(list(sentiments.values()))
     }
 
 # Special review lists
@@ -1,4 +1,4 @@
-from typing import List, Union
+from typing import List, Optional, Union
 from pydantic import AnyHttpUrl, field_validator
 from pydantic_settings import BaseSettings
 import secrets
@@ -63,9 +63,46 @@ class Settings(BaseSettings):
     MAX_UPLOAD_SIZE: int = 5 * 1024 * 1024  # 5MB
 
     # ML Model
-    MODEL_DIR: Path = Path("models")
+    MODEL_DIR: Path = Path("models")  # Versioned model artifacts (.npy, mmap-able)
+    MODEL_ARTIFACT_VERSIONS: int = 3  # Artifact versions kept on disk per model
+    MODEL_VERIFY_CHECKSUMS: bool = False  # Hash every artifact file on load; reads them in full, defeating mmap
     RECOMMENDATION_THRESHOLD: float = 0.5
     MAX_RECOMMENDATIONS: int = 10
+    ML_MODELS_DIR: Path = Path("ml_models")
+    CONTENT_NEIGHBORS: int = 50  # Neighbours kept per book in the content index
+    MODEL_REFRESH_INTERVAL: float = 30.0  # Seconds between model version checks
+    MODEL_DRIFT_THRESHOLD: float = 0.2  # Share of new books/changed users before a full refit
+    TRAINING_WORKERS: int = 1  # Training processes per worker (one job per model at a time)
+    TRAINING_POLL_INTERVAL: float = 5.0  # Seconds between job queue polls
+    TRAINING_JOB_TIMEOUT: int = 6 * 60 * 60  # Running jobs older than this are presumed lost
+    TRAINING_N_JOBS: int = os.cpu_count() or 1  # Processes for TF-IDF and similarity builds
+    RECOMMENDATION_CACHE_SIZE: int = 10000  # Cached recommendation lists per process
+    RECOMMENDATION_CACHE_TTL: float = 600.0  # Seconds a cached list may be served
+    RECOMMENDATION_CACHE_URL: Optional[str] = os.getenv("RECOMMENDATION_CACHE_URL")  # e.g. redis://redis:6379/0
+    VECTOR_INDEX: str = "ivf"  # "ivf" (approximate) or "exact"
+    VECTOR_INDEX_PROBES: int = 8  # IVF lists scanned per query
+    VECTOR_INDEX_MIN_SIZE: int = 10000  # Smaller collections are searched exactly
+    CANDIDATE_MIN_CATALOG: int = 5000  # Catalogs this large use candidate generation + re-ranking
+    CANDIDATES_PER_SOURCE: int = 200  # Candidates each generator proposes per request
+    COOCCURRENCE_NEIGHBORS: int = 50  # "Also borrowed" neighbours kept per book
+    SHARED_INPUT_TTL: float = 300.0  # Seconds request-independent strategy inputs (e.g. popularity) are reused
+    SQL_STRATEGY_LIMIT: int = 200  # Books each SQL-backed strategy scores per request
+    POPULARITY_HOURLY_RETENTION: int = 48  # Hours of hourly popularity buckets kept
+    POPULARITY_DAILY_RETENTION: int = 90  # Days of daily popularity buckets kept
+    TRENDING_CACHE_TTL: float = 60.0  # Seconds a computed trending list is served
+    COLD_START_MIN_INTERACTIONS: int = 5  # Users with fewer interactions get cold-start recommendations
+    COLD_START_CACHE_TTL: float = 600.0  # Seconds the category popularity rankings are reused
+    COLD_START_PER_CATEGORY: int = 100  # Popular books kept per category for cold start
+    SENTIMENT_MODEL_VERSION: str = "roberta-1"  # Bump when ML_MODELS_DIR/roberta_model changes to recompute stored sentiments
+    SENTIMENT_WARMUP: bool = False  # Load the sentiment model at startup (in the background) instead of on first use
+    SENTIMENT_BACKEND: str = "torch"  # torch, quantized (int8) or onnx; part of the stored sentiment version
+    SENTIMENT_ONNX_FILE: str = "model.onnx"  # Graph in ML_MODELS_DIR/roberta_model used by the onnx backend
+    SENTIMENT_BATCH_SIZE: int = 32  # Reviews per sentiment forward pass
+    SENTIMENT_MAX_BATCH_TOKENS: int = 8192  # Padded tokens per forward pass, bounds memory for long reviews
+    SENTIMENT_MAX_LENGTH: int = 512  # Tokens kept per review
+    SENTIMENT_NUM_THREADS: int = 0  # torch intra-op threads for sentiment inference (0 = torch default)
+    TRENDING_HALF_LIFE: float = 24 * 60 * 60  # Seconds for an event's trending weight to halve
+    TRENDING_CHECKPOINT_INTERVAL: float = 300.0  # Seconds between trending score checkpoints
 
     # Superuser settings
     FIRST_SUPERUSER_EMAIL: str = os.getenv("FIRST_SUPERUSER_EMAIL", "admin@iqraa.com")
@@ -1,12 +1,18 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from typing import List, Optional
+from datetime import datetime
 from app.models.books import Book, Category
 from app.schemas.books import BookCreate, BookUpdate, CategoryCreate
 
 def get_book(db: Session, book_id: int) -> Optional[Book]:
     return db.query(Book).filter(Book.book_id == book_id).first()
 
+def get_books_by_ids(db: Session, book_ids: List[int]) -> List[Book]:
+    if not book_ids:
+        return []
+    return db.query(Book).filter(Book.book_id.in_(book_ids)).all()
+
 def get_books(
     db: Session,
     skip: int = 0,
@@ -30,6 +36,9 @@ def get_books(
     
     return query.offset(skip).limit(limit).all()
 
+def get_books_created_since(db: Session, since: datetime) -> List[Book]:
+    return db.query(Book).filter(Book.created_at >= since).order_by(Book.book_id).all()
+
 def create_book(db: Session, book: BookCreate) -> Book:
     db_book = Book(
         isbn=book.isbn,
@@ -1,12 +1,25 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
+from sqlalchemy import desc, func, insert, literal, update, select, union, union_all
+from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException
+import logging
 
-from app.models.recommendations import UserActivity, Recommendation, RecommendationItem, ModelData
-from app.models.books import Book
+from app.core.config import settings
+from app.models.recommendations import (
+    BookPopularity,
+    Recommendation,
+    RecommendationItem,
+    ModelData,
+    TrainingJob,
+    TrainingJobStatus
+)
+from app.models.books import Book, Category, book_category
+from app.models.orders import Transaction, TransactionItem
+from app.models.reviews import BookReview
 from app.models.users import User
+from app.models.user_activities import UserActivity
 from app.schemas.recommendations import (
     UserActivityCreate,
     UserActivityUpdate,
@@ -15,6 +28,8 @@ from app.schemas.recommendations import (
     ModelDataCreate
 )
 
+logger = logging.getLogger(__name__)
+
 def get_user_activity(db: Session, user_id: int, book_id: int) -> Optional[UserActivity]:
     return db.query(UserActivity).filter(
         UserActivity.user_id == user_id,
@@ -66,17 +81,18 @@ def record_book_view(db: Session, user_id: int, book_id: int) -> UserActivity:
         db_activity.interaction_score = calculate_interaction_score(db_activity)
         db.commit()
         db.refresh(db_activity)
-        return db_activity
-    
-    return create_user_activity(
-        db,
-        user_id,
-        UserActivityCreate(
-            book_id=book_id,
-            view_count=1,
-            interaction_score=0.1  # Initial score for a view
+    else:
+        db_activity = create_user_activity(
+            db,
+            user_id,
+            UserActivityCreate(
+                book_id=book_id,
+                view_count=1,
+                interaction_score=0.1  # Initial score for a view
+            )
         )
-    )
+    record_popularity_event(db, book_id, views=1)
+    return db_activity
 
 def toggle_favorite(db: Session, user_id: int, book_id: int) -> UserActivity:
     db_activity = get_user_activity(db, user_id, book_id)
@@ -91,6 +107,7 @@ def toggle_favorite(db: Session, user_id: int, book_id: int) -> UserActivity:
         db_activity.interaction_score = calculate_interaction_score(db_activity)
         db.commit()
         db.refresh(db_activity)
+    record_popularity_event(db, book_id, favorites=1 if db_activity.is_favorite else -1)
     return db_activity
 
 def calculate_interaction_score(activity: UserActivity) -> float:
@@ -112,6 +129,206 @@ def get_user_activities(
         query = query.filter(UserActivity.is_favorite == True)
     return query.order_by(desc(UserActivity.last_viewed)).offset(skip).limit(limit).all()
 
+def get_activities_since(
+    db: Session,
+    since: Optional[datetime] = None
+) -> List[UserActivity]:
+    """
+    Activities of all users created or modified at or after `since` (all
+    when omitted), oldest change first.
+    """
+    changed_at = func.coalesce(UserActivity.updated_at, UserActivity.created_at)
+    query = db.query(UserActivity)
+    if since is not None:
+        query = query.filter(changed_at >= since)
+    return query.order_by(changed_at, UserActivity.id).all()
+
+def get_cooccurrence_events(
+    db: Session,
+    since: Optional[datetime] = None,
+    min_rating: float = 4
+) -> List[Tuple[int, int]]:
+    """
+    Distinct (user_id, book_id) pairs from activities, borrows/purchases and
+    well-rated reviews, optionally only those recorded at or after `since`.
+    """
+    activities = select(UserActivity.user_id, UserActivity.book_id)
+    transactions = select(Transaction.user_id, TransactionItem.book_id).join(
+        Transaction, TransactionItem.transaction_id == Transaction.transaction_id
+    )
+    reviews = select(BookReview.user_id, BookReview.book_id).where(BookReview.rating >= min_rating)
+    if since is not None:
+        activities = activities.where(UserActivity.created_at >= since)
+        transactions = transactions.where(TransactionItem.created_at >= since)
+        reviews = reviews.where(BookReview.created_at >= since)
+
+    # UNION also removes duplicate pairs
+    rows = db.execute(union(activities, transactions, reviews)).all()
+    return [(user_id, book_id) for user_id, book_id in rows if user_id is not None and book_id is not None]
+
+def get_category_neighbors(
+    db: Session,
+    book_ids: List[int],
+    limit: int = 200
+) -> List[Tuple[int, int]]:
+    """
+    (book_id, shared categories) of the books sharing the most categories
+    with `book_ids`, excluding those books themselves.
+    """
+    if not book_ids:
+        return []
+    categories = select(book_category.c.category_id).where(book_category.c.book_id.in_(book_ids))
+    shared = func.count().label("shared")
+    rows = db.execute(
+        select(book_category.c.book_id, shared).where(
+            book_category.c.category_id.in_(categories),
+            book_category.c.book_id.notin_(book_ids)
+        ).group_by(book_category.c.book_id).order_by(desc(shared), book_category.c.book_id).limit(limit)
+    ).all()
+    return [(book_id, int(count)) for book_id, count in rows]
+
+def get_sql_strategy_scores(
+    db: Session,
+    user_id: int,
+    min_rating: float = 4,
+    limit: int = 200
+) -> Dict[str, List[Tuple[int, float]]]:
+    """
+    Scores of the SQL-backed strategies for one user, in a single query.
+
+    "similar_readers": books liked by readers who share liked books with the
+    user, each reader weighted by how many they share. "category": books
+    sharing categories with the user's liked books, by number shared. Books
+    the user already liked are left out; each source keeps its best `limit`.
+    """
+    liked = select(BookReview.book_id).where(
+        BookReview.user_id == user_id,
+        BookReview.rating >= min_rating
+    ).distinct().cte("liked")
+    readers = select(
+        BookReview.user_id, func.count().label("overlap")
+    ).join(liked, BookReview.book_id == liked.c.book_id).where(
+        BookReview.user_id != user_id,
+        BookReview.rating >= min_rating
+    ).group_by(BookReview.user_id).cte("readers")
+    reader_scores = select(
+        literal("similar_readers").label("source"),
+        BookReview.book_id,
+        func.sum(readers.c.overlap).label("score")
+    ).join(readers, BookReview.user_id == readers.c.user_id).where(
+        BookReview.rating >= min_rating,
+        BookReview.book_id.notin_(select(liked.c.book_id))
+    ).group_by(BookReview.book_id)
+    liked_categories = select(book_category.c.category_id).join(
+        liked, book_category.c.book_id == liked.c.book_id
+    )
+    category_scores = select(
+        literal("category").label("source"),
+        book_category.c.book_id,
+        func.count().label("score")
+    ).where(
+        book_category.c.category_id.in_(liked_categories),
+        book_category.c.book_id.notin_(select(liked.c.book_id))
+    ).group_by(book_category.c.book_id)
+
+    scores = union_all(reader_scores, category_scores).subquery("scores")
+    ranked = select(
+        scores.c.source,
+        scores.c.book_id,
+        scores.c.score,
+        func.row_number().over(
+            partition_by=scores.c.source,
+            order_by=(scores.c.score.desc(), scores.c.book_id)
+        ).label("rank")
+    ).subquery("ranked")
+    rows = db.execute(
+        select(ranked.c.source, ranked.c.book_id, ranked.c.score)
+        .where(ranked.c.rank <= limit)
+        .order_by(ranked.c.source, ranked.c.rank)
+    ).all()
+
+    results: Dict[str, List[Tuple[int, float]]] = {"similar_readers": [], "category": []}
+    for source, book_id, score in rows:
+        results[source].append((book_id, float(score)))
+    return results
+
+def _book_popularity_scores():
+    """SELECT of (book_id, score) for every book with any activity, transaction or review."""
+    activities = select(
+        UserActivity.book_id, func.count().label("n")
+    ).group_by(UserActivity.book_id).cte("activity_counts")
+    transactions = select(
+        TransactionItem.book_id, func.count().label("n")
+    ).group_by(TransactionItem.book_id).cte("transaction_counts")
+    reviews = select(
+        BookReview.book_id, func.count().label("n"), func.avg(BookReview.rating).label("avg_rating")
+    ).group_by(BookReview.book_id).cte("review_counts")
+
+    score = (
+        0.4 * func.coalesce(activities.c.n, 0)
+        + 0.3 * func.coalesce(transactions.c.n, 0)
+        + 0.3 * func.coalesce(reviews.c.n, 0)
+    ) * func.coalesce(reviews.c.avg_rating / 5.0, 1.0)
+    return select(Book.book_id, score.label("score")).select_from(Book).outerjoin(
+        activities, activities.c.book_id == Book.book_id
+    ).outerjoin(
+        transactions, transactions.c.book_id == Book.book_id
+    ).outerjoin(
+        reviews, reviews.c.book_id == Book.book_id
+    ).where(score > 0)
+
+def get_book_popularity(db: Session, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+    """
+    Most popular books as (book_id, score) pairs, scored in one query:
+    0.4 * activities + 0.3 * transaction items + 0.3 * reviews, scaled by
+    the average rating when the book has one.
+    """
+    scores = _book_popularity_scores().subquery("popularity")
+    query = select(scores.c.book_id, scores.c.score).order_by(desc(scores.c.score), scores.c.book_id)
+    if limit is not None:
+        query = query.limit(limit)
+    return [(book_id, float(score)) for book_id, score in db.execute(query).all()]
+
+def get_category_popularity(db: Session, per_category: int = 50) -> Dict[str, List[Tuple[int, float]]]:
+    """
+    The `per_category` most popular books of every category, keyed by
+    lower-cased category name, in one query (same score as get_book_popularity).
+    """
+    scores = _book_popularity_scores().cte("popularity")
+    category_name = func.lower(Category.name)
+    ranked = select(
+        category_name.label("category"),
+        scores.c.book_id,
+        scores.c.score,
+        func.row_number().over(
+            partition_by=category_name,
+            order_by=(scores.c.score.desc(), scores.c.book_id)
+        ).label("rank")
+    ).select_from(scores).join(
+        book_category, book_category.c.book_id == scores.c.book_id
+    ).join(
+        Category, Category.id == book_category.c.category_id
+    ).subquery("ranked")
+    rows = db.execute(
+        select(ranked.c.category, ranked.c.book_id, ranked.c.score)
+        .where(ranked.c.rank <= per_category)
+        .order_by(ranked.c.category, ranked.c.rank)
+    ).all()
+
+    results: Dict[str, List[Tuple[int, float]]] = {}
+    for category, book_id, score in rows:
+        results.setdefault(category, []).append((book_id, float(score)))
+    return results
+
+def get_user_book_ids(db: Session, user_id: int) -> set:
+    """Books the user viewed, reviewed, borrowed or bought, in one query."""
+    activities = select(UserActivity.book_id).where(UserActivity.user_id == user_id)
+    transactions = select(TransactionItem.book_id).join(
+        Transaction, TransactionItem.transaction_id == Transaction.transaction_id
+    ).where(Transaction.user_id == user_id)
+    reviews = select(BookReview.book_id).where(BookReview.user_id == user_id)
+    return {book_id for book_id, in db.execute(union(activities, transactions, reviews)).all() if book_id is not None}
+
 def get_recommendation(
     db: Session,
     recommendation_id: int
@@ -150,6 +367,66 @@ def create_recommendation(
     db.refresh(db_recommendation)
     return db_recommendation
 
+def bulk_create_recommendations(
+    db: Session,
+    recommendations: Dict[int, List[Dict[str, Any]]],
+    recommendation_type: str = "PERSONALIZED"
+) -> int:
+    """
+    Replace the active recommendation sets of many users in a few statements.
+
+    `recommendations` maps a user id to its ordered items, each a dict with
+    book_id, relevance_score and reason. Returns the number of sets written.
+    """
+    user_ids = [user_id for user_id, items in recommendations.items() if items]
+    if not user_ids:
+        return 0
+
+    db.execute(
+        update(Recommendation)
+        .where(
+            Recommendation.user_id.in_(user_ids),
+            Recommendation.recommendation_type == recommendation_type,
+            Recommendation.is_active == True
+        )
+        .values(is_active=False)
+    )
+
+    now = datetime.utcnow()
+    created = db.execute(
+        insert(Recommendation).returning(
+            Recommendation.recommendation_id,
+            Recommendation.user_id,
+            sort_by_parameter_order=True
+        ),
+        [
+            {
+                "user_id": user_id,
+                "recommendation_type": recommendation_type,
+                "date_generated": now,
+                "is_active": True
+            }
+            for user_id in user_ids
+        ]
+    ).all()
+
+    db.execute(
+        insert(RecommendationItem),
+        [
+            {
+                "recommendation_id": recommendation_id,
+                "book_id": item["book_id"],
+                "relevance_score": item["relevance_score"],
+                "position": position,
+                "reason": item.get("reason")
+            }
+            for recommendation_id, user_id in created
+            for position, item in enumerate(recommendations[user_id], start=1)
+        ]
+    )
+    db.commit()
+    return len(created)
+
 def update_recommendation(
     db: Session,
     recommendation_id: int,
@@ -182,6 +459,11 @@ def get_user_recommendations(
 def get_model_data(db: Session, name: str) -> Optional[ModelData]:
     return db.query(ModelData).filter(ModelData.name == name).first()
 
+def get_model_versions(db: Session, names: List[str]) -> Dict[str, int]:
+    # Only the version column, so polling does not pull the model payloads
+    rows = db.query(ModelData.name, ModelData.version).filter(ModelData.name.in_(names)).all()
+    return {name: version for name, version in rows}
+
 def save_model_data(
     db: Session,
     model_data: ModelDataCreate
@@ -207,50 +489,312 @@ def save_model_data(
     db.refresh(db_model_data)
     return db_model_data
 
+def get_training_job(db: Session, job_id: int) -> Optional[TrainingJob]:
+    return db.query(TrainingJob).filter(TrainingJob.id == job_id).first()
+
+def get_training_jobs(
+    db: Session,
+    model_name: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 20
+) -> List[TrainingJob]:
+    query = db.query(TrainingJob)
+    if model_name:
+        query = query.filter(TrainingJob.model_name == model_name)
+    return query.order_by(desc(TrainingJob.id)).offset(skip).limit(limit).all()
+
+def enqueue_training_job(
+    db: Session,
+    model_name: str,
+    kind: str = "train",
+    payload: Optional[Dict[str, Any]] = None
+) -> TrainingJob:
+    """
+    Queue a training run, or return the one already waiting for this model.
+
+    Requests that arrive while a job is queued are coalesced into it; a full
+    retrain supersedes a queued incremental update.
+    """
+    for _ in range(2):
+        pending = db.query(TrainingJob).filter(
+            TrainingJob.model_name == model_name,
+            TrainingJob.status == TrainingJobStatus.PENDING.value
+        ).first()
+        if pending:
+            if kind == "train" and pending.kind != "train":
+                pending.kind = kind
+                pending.payload = payload
+                db.commit()
+                db.refresh(pending)
+            return pending
+
+        db_job = TrainingJob(
+            model_name=model_name,
+            kind=kind,
+            status=TrainingJobStatus.PENDING.value,
+            payload=payload
+        )
+        db.add(db_job)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another request queued one first; return that instead
+            db.rollback()
+            continue
+        db.refresh(db_job)
+        return db_job
+    raise HTTPException(status_code=409, detail="Could not queue training job")
+
+def claim_training_job(db: Session) -> Optional[TrainingJob]:
+    """Mark the oldest queued job whose model is not already training as running."""
+    running = select(TrainingJob.model_name).where(
+        TrainingJob.status == TrainingJobStatus.RUNNING.value
+    )
+    job = db.query(TrainingJob).filter(
+        TrainingJob.status == TrainingJobStatus.PENDING.value,
+        TrainingJob.model_name.not_in(running)
+    ).order_by(TrainingJob.id).with_for_update(skip_locked=True).first()
+    if job is None:
+        return None
+
+    job.status = TrainingJobStatus.RUNNING.value
+    job.started_at = datetime.utcnow()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker started a job for the same model in the meantime
+        db.rollback()
+        return None
+    db.refresh(job)
+    return job
+
+def finish_training_job(
+    db: Session,
+    job_id: int,
+    model_version: Optional[int] = None,
+    error: Optional[str] = None
+) -> Optional[TrainingJob]:
+    job = get_training_job(db, job_id)
+    if not job:
+        return None
+    job.status = (TrainingJobStatus.FAILED if error else TrainingJobStatus.SUCCEEDED).value
+    job.model_version = model_version
+    job.error = error
+    job.finished_at = datetime.utcnow()
+    db.commit()
+    db.refresh(job)
+    return job
+
+def fail_stale_training_jobs(db: Session, older_than: timedelta) -> int:
+    """Fail running jobs whose worker died, so the model can be queued again."""
+    count = db.query(TrainingJob).filter(
+        TrainingJob.status == TrainingJobStatus.RUNNING.value,
+        TrainingJob.started_at < datetime.utcnow() - older_than
+    ).update(
+        {
+            TrainingJob.status: TrainingJobStatus.FAILED.value,
+            TrainingJob.error: "Worker stopped before the job finished",
+            TrainingJob.finished_at: datetime.utcnow()
+        },
+        synchronize_session=False
+    )
+    db.commit()
+    return count
+
+POPULARITY_COUNTERS = ("views", "favorites", "ratings", "rating_sum")
+
+def popularity_bucket(at: datetime, granularity: str) -> datetime:
+    """Start of the hourly or daily bucket containing `at`."""
+    if granularity == "hour":
+        return at.replace(minute=0, second=0, microsecond=0)
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def record_popularity_event(
+    db: Session,
+    book_id: int,
+    views: int = 0,
+    favorites: int = 0,
+    ratings: int = 0,
+    rating_sum: float = 0.0,
+    at: Optional[datetime] = None
+) -> None:
+    """Add an event's counts to the book's current hourly and daily buckets."""
+    at = at or datetime.utcnow()
+    counts = {"views": views, "favorites": favorites, "ratings": ratings, "rating_sum": float(rating_sum)}
+    rows = [
+        {"book_id": book_id, "granularity": granularity, "bucket_start": popularity_bucket(at, granularity), **counts}
+        for granularity in ("hour", "day")
+    ]
+    try:
+        _upsert_popularity(db, rows)
+        db.commit()
+    except Exception as e:
+        # Popularity is best effort; never fail the user's action over it
+        db.rollback()
+        logger.error(f"Error recording popularity event: {str(e)}")
+
+def _upsert_popularity(db: Session, rows: List[Dict[str, Any]]) -> None:
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        for row in rows:
+            key = (row["book_id"], row["granularity"], row["bucket_start"])
+            bucket = db.get(BookPopularity, key) or BookPopularity(
+                book_id=key[0], granularity=key[1], bucket_start=key[2],
+                views=0, favorites=0, ratings=0, rating_sum=0.0
+            )
+            for counter in POPULARITY_COUNTERS:
+                setattr(bucket, counter, getattr(bucket, counter) + row[counter])
+            db.add(bucket)
+        return
+
+    statement = dialect_insert(BookPopularity).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=["book_id", "granularity", "bucket_start"],
+        set_={
+            counter: getattr(BookPopularity, counter) + getattr(statement.excluded, counter)
+            for counter in POPULARITY_COUNTERS
+        }
+    )
+    db.execute(statement)
+
+def prune_book_popularity(db: Session, now: Optional[datetime] = None) -> int:
+    """Drop buckets older than their retention; returns the number deleted."""
+    now = now or datetime.utcnow()
+    deleted = 0
+    for granularity, retention in (
+        ("hour", timedelta(hours=settings.POPULARITY_HOURLY_RETENTION)),
+        ("day", timedelta(days=settings.POPULARITY_DAILY_RETENTION))
+    ):
+        deleted += db.query(BookPopularity).filter(
+            BookPopularity.granularity == granularity,
+            BookPopularity.bucket_start < popularity_bucket(now - retention, granularity)
+        ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def rebuild_book_popularity(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Recompute all buckets within retention from the same sources as the live
+    path: each activity's views and favorite, and each review's rating at the
+    time it was counted. Only the latest view time of an activity is stored,
+    so all of its views land in that bucket. Used to seed the rollup; returns
+    the buckets written.
+    """
+    now = now or datetime.utcnow()
+    since = popularity_bucket(now - timedelta(days=settings.POPULARITY_DAILY_RETENTION), "day")
+    hourly_since = popularity_bucket(now - timedelta(hours=settings.POPULARITY_HOURLY_RETENTION), "hour")
+    buckets: Dict[Tuple[int, str, datetime], Dict[str, float]] = {}
+
+    def add(book_id, at, **counts):
+        at = at.replace(tzinfo=None)
+        if at < since:
+            return
+        for granularity in ("hour", "day"):
+            if granularity == "hour" and at < hourly_since:
+                continue
+            key = (book_id, granularity, popularity_bucket(at, granularity))
+            bucket = buckets.setdefault(key, dict.fromkeys(POPULARITY_COUNTERS, 0))
+            for counter, value in counts.items():
+                bucket[counter] += value
+
+    viewed_at = func.coalesce(UserActivity.last_viewed, UserActivity.created_at)
+    favorited_at = func.coalesce(UserActivity.updated_at, UserActivity.created_at)
+    activities = db.query(
+        UserActivity.book_id, UserActivity.view_count, viewed_at, UserActivity.is_favorite, favorited_at
+    ).filter(
+        (viewed_at >= since) | (favorited_at >= since)
+    ).yield_per(10000)
+    for book_id, view_count, viewed, is_favorite, favorited in activities:
+        if view_count and viewed is not None:
+            add(book_id, viewed, views=view_count)
+        if is_favorite and favorited is not None:
+            add(book_id, favorited, favorites=1)
+    rated_at = func.coalesce(BookReview.created_at, BookReview.review_date)
+    reviews = db.query(BookReview.book_id, BookReview.rating, rated_at).filter(
+        rated_at >= since
+    ).yield_per(10000)
+    for book_id, rating, created_at in reviews:
+        add(book_id, created_at, ratings=1, rating_sum=float(rating or 0))
+
+    db.query(BookPopularity).delete(synchronize_session=False)
+    if buckets:
+        db.execute(insert(BookPopularity), [
+            {"book_id": book_id, "granularity": granularity, "bucket_start": bucket_start, **counts}
+            for (book_id, granularity, bucket_start), counts in buckets.items()
+            if book_id is not None
+        ])
+    db.commit()
+    return len(buckets)
+
 def get_trending_books(
     db: Session,
     limit: int = 10,
-    days: int = 7
+    days: int = 7,
+    now: Optional[datetime] = None
 ) -> List[Dict[str, Any]]:
-    cutoff_date = datetime.utcnow() - timedelta(days=days)
-    
-    # Get recent views and ratings
-    trending_query = db.query(
-        Book.book_id,
-        Book.title,
-        Book.author,
-        func.count(UserActivity.id).label('recent_views'),
-        func.avg(Book.rating).label('average_rating'),
-        func.count(Book.reviews).label('recent_ratings')
-    ).join(
-        UserActivity,
-        Book.book_id == UserActivity.book_id
-    ).filter(
-        UserActivity.last_viewed >= cutoff_date
-    ).group_by(
-        Book.book_id
-    ).order_by(
-        desc('recent_views'),
-        desc('average_rating')
-    ).limit(limit)
+    """
+    Most viewed books over the last `days`, summed from the popularity
+    rollup: hourly buckets for windows within their retention, else daily.
 
-    results = []
-    for row in trending_query:
-        trending_score = calculate_trending_score(
-            row.recent_views,
-            row.recent_ratings,
-            row.average_rating
+    There is no per-window aggregate, so each call sums every bucket in the
+    window (up to POPULARITY_HOURLY_RETENTION hourly or `days` daily rows per
+    book); the endpoint serves results from trending_cache to bound that.
+    """
+    now = now or datetime.utcnow()
+    if days * 24 <= settings.POPULARITY_HOURLY_RETENTION:
+        granularity = "hour"
+        cutoff = popularity_bucket(now, "hour") - timedelta(hours=days * 24 - 1)
+    else:
+        granularity = "day"
+        cutoff = popularity_bucket(now, "day") - timedelta(days=days - 1)
+
+    recent_views = func.sum(BookPopularity.views).label("recent_views")
+    recent_favorites = func.sum(BookPopularity.favorites).label("recent_favorites")
+    recent_ratings = func.sum(BookPopularity.ratings).label("recent_ratings")
+    totals = select(
+        BookPopularity.book_id,
+        recent_views,
+        recent_favorites,
+        recent_ratings,
+        func.sum(BookPopularity.rating_sum).label("rating_sum")
+    ).where(
+        BookPopularity.granularity == granularity,
+        BookPopularity.bucket_start >= cutoff
+    ).group_by(BookPopularity.book_id).order_by(
+        desc(recent_views), desc(recent_favorites), desc(recent_ratings), BookPopularity.book_id
+    ).limit(limit).subquery("totals")
+
+    # Titles are joined for the top `limit` books only
+    rows = db.execute(
+        select(
+            Book.book_id, Book.title, Book.author, totals.c.recent_views, totals.c.recent_favorites,
+            totals.c.recent_ratings, totals.c.rating_sum
+        ).join(
+            totals, Book.book_id == totals.c.book_id
+        ).order_by(
+            desc(totals.c.recent_views), desc(totals.c.recent_favorites),
+            desc(totals.c.recent_ratings), Book.book_id
         )
+    ).mappings().all()
+
+    results = []
+    for row in rows:
+        average_rating = row["rating_sum"] / row["recent_ratings"] if row["recent_ratings"] > 0 else 0.0
         results.append({
-            "book_id": row.book_id,
-            "title": row.title,
-            "author": row.author,
-            "trending_score": trending_score,
-            "recent_views": row.recent_views,
-            "recent_ratings": row.recent_ratings,
-            "average_rating": float(row.average_rating) if row.average_rating else 0.0
+            "book_id": row["book_id"],
+            "title": row["title"],
+            "author": row["author"],
+            "trending_score": calculate_trending_score(
+                row["recent_views"], row["recent_ratings"], average_rating
+            ),
+            "recent_views": row["recent_views"],
+            "recent_ratings": row["recent_ratings"],
+            "average_rating": float(average_rating)
         })
-    
     return results
 
 def calculate_trending_score(views: int, ratings: int, avg_rating: float) -> float:
@@ -259,7 +803,7 @@ def calculate_trending_score(views: int, ratings: int, avg_rating: float) -> flo
     
     normalized_views = min(views / 100, 1.0)  # Cap at 100 views
     normalized_ratings = min(ratings / 50, 1.0)  # Cap at 50 ratings
-    normalized_rating = (avg_rating - 1) / 4  # Convert 1-5 scale to 0-1
+    normalized_rating = (avg_rating - 1) / 4 if avg_rating else 0.0  # Convert 1-5 scale to 0-1
     
     return (
         view_weight * normalized_views +
@@ -4,8 +4,9 @@ from typing import List, Optional, Dict, Tuple
 from datetime import datetime, timedelta
 from decimal import Decimal
 
-from app.models.reviews import BookReview, ReviewHelpfulVote
+from app.models.reviews import BookReview, ReviewHelpfulVote, ReviewSentiment
 from app.models.books import Book
+from app.crud.recommendations import record_popularity_event
 from app.schemas.reviews import BookReviewCreate, BookReviewUpdate, ReviewHelpfulVoteCreate
 
 def get_book_review(db: Session, review_id: int) -> Optional[BookReview]:
@@ -14,7 +15,7 @@ def get_book_review(db: Session, review_id: int) -> Optional[BookReview]:
 def get_book_reviews(
     db: Session,
     skip: int = 0,
-    limit: int = 100,
+    limit: Optional[int] = 100,
     book_id: Optional[int] = None,
     user_id: Optional[int] = None,
     min_rating: Optional[Decimal] = None,
@@ -78,13 +79,20 @@ def create_book_review(db: Session, review: BookReviewCreate, user_id: int) -> B
     db.add(db_review)
     db.commit()
     db.refresh(db_review)
+    record_popularity_event(db, db_review.book_id, ratings=1, rating_sum=float(db_review.rating or 0))
     return db_review
 
+def _rated_at(db_review: BookReview) -> Optional[datetime]:
+    """When the review's rating was counted in the popularity rollup (as in rebuild_book_popularity)."""
+    rated_at = db_review.created_at or db_review.review_date
+    return rated_at.replace(tzinfo=None) if rated_at else None
+
 def update_book_review(db: Session, review_id: int, review: BookReviewUpdate, user_id: int) -> Optional[BookReview]:
     db_review = get_book_review(db, review_id)
     if not db_review or db_review.user_id != user_id:
         return None
     
+    old_rating = float(db_review.rating or 0)
     update_data = review.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_review, field, value)
@@ -92,6 +100,12 @@ def update_book_review(db: Session, review_id: int, review: BookReviewUpdate, us
     db_review.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(db_review)
+    if float(db_review.rating or 0) != old_rating:
+        # Retract the old rating from the bucket it was counted in and count the new one now
+        record_popularity_event(
+            db, db_review.book_id, ratings=-1, rating_sum=-old_rating, at=_rated_at(db_review)
+        )
+        record_popularity_event(db, db_review.book_id, ratings=1, rating_sum=float(db_review.rating or 0))
     return db_review
 
 def delete_book_review(db: Session, review_id: int, user_id: int) -> bool:
@@ -99,8 +113,10 @@ def delete_book_review(db: Session, review_id: int, user_id: int) -> bool:
     if not db_review or db_review.user_id != user_id:
         return False
     
+    book_id, rating, rated_at = db_review.book_id, float(db_review.rating or 0), _rated_at(db_review)
     db.delete(db_review)
     db.commit()
+    record_popularity_event(db, book_id, ratings=-1, rating_sum=-rating, at=rated_at)
     return True
 
 def vote_review(db: Session, vote: ReviewHelpfulVoteCreate, user_id: int) -> Optional[ReviewHelpfulVote]:
@@ -155,4 +171,23 @@ def get_review_stats(db: Session, book_id: Optional[int] = None) -> Dict:
         "total_reviews": total_reviews,
         "average_rating": float(avg_rating),
         "verified_reviews": verified_reviews
-    } 
\ No newline at end of file
+    } 
+
+# Review sentiment operations
+def get_review_sentiments(db: Session, review_ids: List[int]) -> Dict[int, ReviewSentiment]:
+    if not review_ids:
+        return {}
+    rows = db.query(ReviewSentiment).filter(ReviewSentiment.review_id.in_(review_ids)).all()
+    return {row.review_id: row for row in rows}
+
+def save_review_sentiments(db: Session, sentiments: List[Dict]) -> None:
+    """Insert or replace stored sentiments, given as dicts of ReviewSentiment columns."""
+    existing = get_review_sentiments(db, [sentiment["review_id"] for sentiment in sentiments])
+    for sentiment in sentiments:
+        row = existing.get(sentiment["review_id"])
+        if row is None:
+            db.add(ReviewSentiment(**sentiment))
+        else:
+            for field, value in sentiment.items():
+                setattr(row, field, value)
+    db.commit()
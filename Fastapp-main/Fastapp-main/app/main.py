@@ -6,6 +6,9 @@ from app.core.config import settings
 from app.db.session import engine
 from app.models import Base
 from app.db.init_db import init_db
+from app.services.model_registry import model_registry
+from app.services.sentiment_analyzer import warmup_sentiment_analyzer
+from app.services.trending import trending_engine
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -33,6 +36,18 @@ Base.metadata.create_all(bind=engine)
 # Initialize database with superuser
 init_db()
 
+@app.on_event("startup")
+def load_recommendation_model():
+    # Load the shared recommender once per worker instead of per request
+    model_registry.warmup()
+    trending_engine.restore()
+    if settings.SENTIMENT_WARMUP:
+        warmup_sentiment_analyzer()
+
+@app.on_event("shutdown")
+def save_trending_scores():
+    trending_engine.save()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to FastApp API"}
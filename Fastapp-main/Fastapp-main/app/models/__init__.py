@@ -2,8 +2,8 @@ from app.db.session import Base
 from app.models.users import User, Group, Permission
 from app.models.books import Book, Category
 from app.models.orders import Order, Transaction, TransactionItem
-from app.models.reviews import BookReview
-from app.models.recommendations import Recommendation
+from app.models.reviews import BookReview, ReviewSentiment
+from app.models.recommendations import BookPopularity, Recommendation, TrainingJob
 from app.models.user_activities import UserActivity
 
 __all__ = [
@@ -12,10 +12,13 @@ __all__ = [
     'Group',
     'Permission',
     'Book',
+    'BookPopularity',
     'Category',
     'Order',
     'BookReview',
     'Recommendation',
+    'ReviewSentiment',
+    'TrainingJob',
     'Transaction',
     'TransactionItem',
     'UserActivity'
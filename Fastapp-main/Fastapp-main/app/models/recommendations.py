@@ -1,8 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, JSON, Table, Text
+import enum
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, JSON, Table, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.session import Base
-from app.models.user_activities import UserActivity
 
 # Association table for recommendations and books
 recommendation_books = Table(
@@ -73,4 +73,60 @@ class ModelData(Base):
     __table_args__ = (
         # Ensure model names are unique
         {'sqlite_autoincrement': True},
-    ) 
\ No newline at end of file
+    )
+
+class TrainingJobStatus(str, enum.Enum):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+
+class TrainingJob(Base):
+    """
+    A queued model training run, executed by the training worker (app.worker).
+    """
+    __tablename__ = "training_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    model_name = Column(String(100), index=True)
+    kind = Column(String(20), default="train")  # train (full refit) or update (incremental)
+    status = Column(String(20), default=TrainingJobStatus.PENDING.value, index=True)
+    payload = Column(JSON, nullable=True)
+    model_version = Column(Integer, nullable=True)  # Version produced by the run
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # At most one queued and one running job per model
+        Index(
+            "uq_training_jobs_active",
+            "model_name",
+            "status",
+            unique=True,
+            postgresql_where=status.in_(["PENDING", "RUNNING"]),
+            sqlite_where=status.in_(["PENDING", "RUNNING"])
+        ),
+        {'sqlite_autoincrement': True},
+    )
+
+class BookPopularity(Base):
+    """
+    Per-book event counts in hourly and daily buckets, incremented on every
+    view, favorite and review, so any trending window is a sum of buckets
+    instead of a scan over user_activities.
+    """
+    __tablename__ = "book_popularity"
+
+    book_id = Column(Integer, ForeignKey('books.book_id', ondelete='CASCADE'), primary_key=True)
+    granularity = Column(String(10), primary_key=True)  # hour or day
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    views = Column(Integer, default=0, nullable=False)
+    favorites = Column(Integer, default=0, nullable=False)  # Net: un-favoriting subtracts
+    ratings = Column(Integer, default=0, nullable=False)
+    rating_sum = Column(Float, default=0.0, nullable=False)
+
+    __table_args__ = (
+        Index("ix_book_popularity_window", "granularity", "bucket_start"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Numeric, Table
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Float, ForeignKey, JSON, Numeric, Table
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.session import Base
@@ -23,6 +23,7 @@ class BookReview(Base):
     book = relationship("Book", back_populates="book_reviews")
     user = relationship("User", back_populates="book_reviews")
     helpful_votes_rel = relationship("ReviewHelpfulVote", back_populates="review", cascade="all, delete-orphan")
+    sentiment = relationship("ReviewSentiment", back_populates="review", uselist=False, cascade="all, delete-orphan")
 
 class ReviewHelpfulVote(Base):
     __tablename__ = "review_helpful_votes"
@@ -40,4 +41,23 @@ class ReviewHelpfulVote(Base):
     __table_args__ = (
         # Ensure a user can only vote once per review
         {'sqlite_autoincrement': True},
-    ) 
\ No newline at end of file
+    ) 
+
+class ReviewSentiment(Base):
+    """
+    Stored sentiment of a review's text. Valid while text_hash matches the
+    current review text and model_version the analyzer in use.
+    """
+    __tablename__ = "review_sentiments"
+
+    review_id = Column(Integer, ForeignKey("book_reviews.review_id", ondelete="CASCADE"), primary_key=True)
+    text_hash = Column(String(64))  # sha256 of the analyzed text
+    model_version = Column(String(100))
+    sentiment = Column(String(20))  # negative, neutral or positive
+    confidence = Column(Float)
+    scores = Column(JSON)  # Probability per label
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # Relationships
+    review = relationship("BookReview", back_populates="sentiment")
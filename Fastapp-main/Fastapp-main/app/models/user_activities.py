@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Boolean, Column, Integer, Float, String, DateTime, ForeignKey, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.session import Base
@@ -13,7 +13,13 @@ class UserActivity(Base):
     book_id = Column(Integer, ForeignKey('books.book_id', ondelete='CASCADE'))
     activity_type = Column(String(50))  # e.g., 'view', 'search', 'purchase'
     details = Column(Text, nullable=True)
+    # Per (user, book) counters maintained by app.crud.recommendations
+    view_count = Column(Integer, default=0)
+    last_viewed = Column(DateTime(timezone=True), server_default=func.now())
+    is_favorite = Column(Boolean, default=False)
+    interaction_score = Column(Float, default=0.0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
 
     # Relationships
     user = relationship("User", back_populates="activities")
@@ -93,6 +93,38 @@ class RecommendationRequest(BaseModel):
     content_weight: float = Field(default=0.3, ge=0, le=1)
     collab_weight: float = Field(default=0.7, ge=0, le=1)
 
+class BatchRecommendationRequest(BaseModel):
+    user_ids: Optional[List[int]] = Field(
+        default=None,
+        description="Users to score; all users known to the model when omitted"
+    )
+    n_recommendations: int = Field(
+        default=10,
+        ge=1,
+        le=50,
+        description="Number of recommendations to store per user"
+    )
+
+class BatchRecommendationResult(BaseModel):
+    model_version: Optional[int]
+    users_scored: int
+    recommendations_created: int
+
+class TrainingJob(BaseModel):
+    id: int
+    model_name: str
+    kind: str
+    status: str
+    payload: Optional[Dict] = None
+    model_version: Optional[int] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 class SimilarBooksRequest(BaseModel):
     book_id: int = Field(..., description="ID of the book to find similar books for")
     n_recommendations: int = Field(
@@ -116,6 +148,12 @@ class RecommendationResponse(BaseModel):
             }
         }
 
+class TrendingScore(BaseModel):
+    book_id: int
+    title: str
+    author: str
+    trending_score: float
+
 class TrendingBook(BaseModel):
     book_id: int
     title: str
@@ -45,11 +45,18 @@ class ReviewHelpfulVote(ReviewHelpfulVoteCreate):
         from_attributes = True
 
 class SentimentAnalysis(BaseModel):
+    review_id: Optional[int] = None
+    book_title: Optional[str] = None
     sentiment: str
-    score: float
+    score: float  # -1 (negative) to 1 (positive)
+    confidence: Optional[float] = None
+    scores: Optional[Dict[str, float]] = None
+    interpretation: Optional[str] = None
 
 class BookSentimentStats(BaseModel):
     book_id: int
+    book_title: Optional[str] = None
+    total_reviews: int = 0
     average_sentiment: float
     sentiment_distribution: Dict[str, int]
 
@@ -0,0 +1,184 @@
+from typing import Dict, Any, Optional, Tuple, Union
+import numpy as np
+from scipy.sparse import csr_matrix, issparse
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+ArrayLike = Union[np.ndarray, csr_matrix]
+
+class ModelArtifactStore:
+    """
+    Versioned on-disk store for trained model state.
+
+    Every save writes a new immutable directory under <root>/<model name>/:
+    one .npy file per dense array (CSR matrices are split into their data,
+    indices and indptr arrays) plus pickles for small Python objects such as
+    the fitted vectorizer. The returned manifest holds only paths, shapes and
+    checksums and is what gets stored in ModelData.data.
+
+    Arrays are opened with np.load(mmap_mode=...), so every worker process
+    that loads the same version shares the pages through the OS cache, and
+    only the pages actually used are read. Loading therefore checks each
+    array's shape and dtype against the manifest only; hashing every file
+    would read it all, so checksums are verified on demand (verify()).
+    """
+
+    FORMAT = "npy-v1"
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def save(
+        self,
+        name: str,
+        arrays: Dict[str, ArrayLike],
+        objects: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Write a new artifact version and return its manifest."""
+        version_dir = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        target = self.root / name / version_dir
+        staging = self.root / name / f".{version_dir}.tmp"
+        staging.mkdir(parents=True, exist_ok=False)
+
+        try:
+            files = {}
+            for key, value in arrays.items():
+                if issparse(value):
+                    value = value.tocsr()
+                    files[key] = {
+                        "kind": "csr",
+                        "shape": list(value.shape),
+                        "parts": {
+                            part: self._write_array(staging, f"{key}.{part}", getattr(value, part))
+                            for part in ("data", "indices", "indptr")
+                        }
+                    }
+                else:
+                    files[key] = {
+                        "kind": "array",
+                        **self._write_array(staging, key, np.asarray(value))
+                    }
+
+            for key, value in (objects or {}).items():
+                path = staging / f"{key}.pkl"
+                with open(path, 'wb') as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                files[key] = {"kind": "pickle", "file": path.name, "sha256": self._checksum(path)}
+
+            # Readers never see a partially written version
+            os.replace(staging, target)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        logger.info(f"Saved model artifacts to {target}")
+        return {
+            "format": self.FORMAT,
+            "path": f"{name}/{version_dir}",
+            "files": files,
+            "created_at": datetime.utcnow().isoformat()
+        }
+
+    def load(
+        self,
+        manifest: Dict[str, Any],
+        mmap_mode: Optional[str] = "r",
+        verify: bool = False
+    ) -> Tuple[Dict[str, ArrayLike], Dict[str, Any]]:
+        """Open the arrays and objects described by a manifest; `verify` also checks every checksum."""
+        if manifest.get("format") != self.FORMAT:
+            raise ValueError(f"Unsupported model artifact format: {manifest.get('format')}")
+
+        directory = self.root / manifest["path"]
+        arrays, objects = {}, {}
+        for key, entry in manifest["files"].items():
+            if entry["kind"] == "csr":
+                parts = {
+                    part: self._read_array(directory, info, mmap_mode, verify)
+                    for part, info in entry["parts"].items()
+                }
+                arrays[key] = csr_matrix(
+                    (parts["data"], parts["indices"], parts["indptr"]),
+                    shape=tuple(entry["shape"]),
+                    copy=False
+                )
+            elif entry["kind"] == "array":
+                arrays[key] = self._read_array(directory, entry, mmap_mode, verify)
+            elif entry["kind"] == "pickle":
+                path = directory / entry["file"]
+                if verify:
+                    self._verify(path, entry["sha256"])
+                with open(path, 'rb') as f:
+                    objects[key] = pickle.load(f)
+            else:
+                raise ValueError(f"Unknown artifact kind: {entry['kind']}")
+        return arrays, objects
+
+    def verify(self, manifest: Dict[str, Any]) -> None:
+        """Check every file of a manifest against its checksum; raises ValueError on a mismatch."""
+        directory = self.root / manifest["path"]
+        for entry in manifest["files"].values():
+            for info in entry["parts"].values() if entry["kind"] == "csr" else [entry]:
+                self._verify(directory / info["file"], info["sha256"])
+
+    def prune(self, name: str, keep: int, current: Optional[str] = None) -> None:
+        """Delete all but the newest `keep` versions of a model, never `current`."""
+        model_dir = self.root / name
+        if not model_dir.exists():
+            return
+        versions = sorted(
+            (p for p in model_dir.iterdir() if p.is_dir() and not p.name.startswith(".")),
+            key=lambda p: p.name,
+            reverse=True
+        )
+        for path in versions[keep:]:
+            if current and f"{name}/{path.name}" == current:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            logger.info(f"Pruned model artifacts at {path}")
+
+    def _write_array(self, directory: Path, key: str, array: np.ndarray) -> Dict[str, Any]:
+        path = directory / f"{key}.npy"
+        np.save(path, np.ascontiguousarray(array), allow_pickle=False)
+        return {
+            "file": path.name,
+            "dtype": str(array.dtype),
+            "shape": list(array.shape),
+            "sha256": self._checksum(path)
+        }
+
+    def _read_array(
+        self,
+        directory: Path,
+        entry: Dict[str, Any],
+        mmap_mode: Optional[str],
+        verify: bool
+    ) -> np.ndarray:
+        path = directory / entry["file"]
+        if verify:
+            self._verify(path, entry["sha256"])
+        # Reads the header only; a truncated file fails to map
+        array = np.load(path, mmap_mode=mmap_mode, allow_pickle=False)
+        if list(array.shape) != entry["shape"] or str(array.dtype) != entry["dtype"]:
+            raise ValueError(f"Model artifact {path} does not match its manifest")
+        return array
+
+    def _verify(self, path: Path, expected: str) -> None:
+        if self._checksum(path) != expected:
+            raise ValueError(f"Checksum mismatch for model artifact {path}")
+
+    @staticmethod
+    def _checksum(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
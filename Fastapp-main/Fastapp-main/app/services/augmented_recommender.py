@@ -1,12 +1,18 @@
 from typing import List, Dict, Any, Optional
 import numpy as np
 import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
 import logging
 from pathlib import Path
 import pickle
 import os
 
+from app.core.config import settings
+from .neighbors import top_k
+from .user_history import UserHistoryIndex
+from .vector_index import build_index
+
 logger = logging.getLogger(__name__)
 
 class AugmentedHybridRecommender:
@@ -14,13 +20,18 @@ class AugmentedHybridRecommender:
         self.model = None
         self.books_df = None
         self.user_item_matrix = None
+        self.book_rows = {}
+        self.book_vector_index = None
+        self.history = None
+        self.user_unit_rows = None
+        self.user_vector_index = None
         self.load_model()
 
     def load_model(self) -> None:
         """Load the augmented hybrid model and data."""
         try:
             # Load processed data
-            processed_df_path = Path("ml_models/processed_df.pkl")
+            processed_df_path = settings.ML_MODELS_DIR / "processed_df.pkl"
             if processed_df_path.exists():
                 with open(processed_df_path, 'rb') as f:
                     self.books_df = pickle.load(f)
@@ -30,15 +41,20 @@ class AugmentedHybridRecommender:
                 return
 
             # Load collaborative data
-            collaborative_path = Path("ml_models/colaborative.csv")
+            collaborative_path = settings.ML_MODELS_DIR / "colaborative.csv"
             if collaborative_path.exists():
-                self.user_item_matrix = pd.read_csv(collaborative_path)
+                ratings_df = pd.read_csv(
+                    collaborative_path,
+                    usecols=['user_id', 'book_id', 'rating']
+                )
+                self.history = UserHistoryIndex.from_ratings(ratings_df)
+                self.user_item_matrix = self.history.ratings
                 logger.info("Loaded collaborative data")
             else:
                 logger.warning(f"Collaborative data not found at {collaborative_path}")
 
             # Load the augmented model
-            model_path = Path("ml_models/augmented_hybrid_model.pkl")
+            model_path = settings.ML_MODELS_DIR / "augmented_hybrid_model.pkl"
             if model_path.exists():
                 with open(model_path, 'rb') as f:
                     self.model = pickle.load(f)
@@ -46,10 +62,40 @@ class AugmentedHybridRecommender:
             else:
                 logger.warning(f"Augmented hybrid model not found at {model_path}")
 
+            self._build_indexes()
+
         except Exception as e:
             logger.error(f"Error loading augmented model data: {str(e)}")
             raise
 
+    def _build_indexes(self) -> None:
+        """Build the similar-book and similar-user vector indexes once at load time."""
+        if self.books_df is not None:
+            features = self.books_df.drop(['book_id', 'title'], axis=1)
+            self.book_rows = {
+                book_id: row for row, book_id in enumerate(self.books_df['book_id'].tolist())
+            }
+            self.book_vector_index = build_index(features.to_numpy(dtype=np.float32))
+            logger.info(f"Indexed {len(self.book_rows)} books for similarity search")
+
+        if self.history is not None:
+            n_users = len(self.history.user_ids)
+            if settings.VECTOR_INDEX == "ivf" and n_users >= settings.VECTOR_INDEX_MIN_SIZE:
+                self.user_vector_index = build_index(self._build_user_vectors())
+                logger.info(f"Indexed {n_users} users for approximate similarity search")
+            else:
+                # Exact cosine search runs directly on the L2-normalised sparse rating rows
+                self.user_unit_rows = normalize(self.history.ratings, norm="l2", axis=1, copy=True)
+                logger.info(f"Indexed {n_users} users for exact similarity search")
+
+    def _build_user_vectors(self, n_components: int = 64) -> np.ndarray:
+        """Embed each user's rating row with truncated SVD for approximate cosine search."""
+        ratings = self.history.ratings
+        n_components = min(n_components, min(ratings.shape) - 1)
+        if n_components < 1:
+            return ratings.toarray()
+        return TruncatedSVD(n_components=n_components, random_state=42).fit_transform(ratings)
+
     def get_user_recommendations(
         self,
         user_id: int,
@@ -57,13 +103,12 @@ class AugmentedHybridRecommender:
     ) -> List[Dict[str, Any]]:
         """Get personalized recommendations for a user."""
         try:
-            if self.user_item_matrix is None:
+            if self.history is None:
                 logger.warning("User-item matrix not loaded")
                 return []
 
             # Get user's interaction history
-            user_history = self.user_item_matrix[self.user_item_matrix['user_id'] == user_id]
-            if user_history.empty:
+            if user_id not in self.history:
                 logger.info(f"No history found for user {user_id}")
                 return []
 
@@ -72,30 +117,17 @@ class AugmentedHybridRecommender:
             if not similar_users:
                 logger.info(f"No similar users found for user {user_id}")
                 return []
-            
-            # Get books liked by similar users
-            recommendations = {}
-            for similar_user in similar_users:
-                user_books = self.user_item_matrix[
-                    (self.user_item_matrix['user_id'] == similar_user) &
-                    (self.user_item_matrix['rating'] >= 4)
-                ]
-                
-                for _, row in user_books.iterrows():
-                    book_id = row['book_id']
-                    if book_id not in recommendations:
-                        recommendations[book_id] = 0
-                    recommendations[book_id] += row['rating']
-
-            # Sort and return top recommendations
-            sorted_recs = sorted(recommendations.items(), key=lambda x: x[1], reverse=True)
+
+            # Sum the ratings similar users gave to books they liked
+            columns, totals = self.history.liked_totals(similar_users)
+            best, best_scores = top_k(totals, n_recommendations)
             return [
                 {
                     'book_id': book_id,
                     'score': float(score),
                     'reason': f"Recommended based on similar users' preferences"
                 }
-                for book_id, score in sorted_recs[:n_recommendations]
+                for book_id, score in zip(self.history.book_ids[columns[best]].tolist(), best_scores)
             ]
 
         except Exception as e:
@@ -113,29 +145,28 @@ class AugmentedHybridRecommender:
                 logger.warning("Books data not loaded")
                 return []
 
-            # Get book features
-            book_features = self.books_df[self.books_df['book_id'] == book_id]
-            if book_features.empty:
+            row = self.book_rows.get(book_id)
+            if row is None:
                 logger.info(f"Book {book_id} not found in the dataset")
                 return []
 
-            # Calculate similarity with other books
-            similarities = cosine_similarity(
-                book_features.drop(['book_id', 'title'], axis=1),
-                self.books_df.drop(['book_id', 'title'], axis=1)
-            )[0]
-
-            # Get top similar books
-            similar_indices = np.argsort(similarities)[::-1][1:n_recommendations + 1]
-            similar_books = self.books_df.iloc[similar_indices]
-
+            # Ask for one extra neighbour because the book matches itself
+            indices, scores = self.book_vector_index.search(
+                self.book_vector_index.vectors[row], n_recommendations + 1
+            )
+            title = self.books_df['title'].iloc[row]
+            neighbors = [
+                (idx, score) for idx, score in zip(indices[0], scores[0]) if idx >= 0 and idx != row
+            ][:n_recommendations]
+            # tolist() yields native ids, which the JSON cache backends can store
+            book_ids = self.books_df['book_id'].iloc[[idx for idx, _ in neighbors]].tolist()
             return [
                 {
-                    'book_id': row['book_id'],
-                    'score': float(similarities[idx]),
-                    'reason': f"Similar to {book_features['title'].iloc[0]}"
+                    'book_id': book_id,
+                    'score': float(score),
+                    'reason': f"Similar to {title}"
                 }
-                for idx, row in similar_books.iterrows()
+                for book_id, (_, score) in zip(book_ids, neighbors)
             ]
 
         except Exception as e:
@@ -145,31 +176,29 @@ class AugmentedHybridRecommender:
     def _get_similar_users(self, user_id: int, n_similar: int = 5) -> List[int]:
         """Get users with similar preferences."""
         try:
-            if self.user_item_matrix is None:
+            if self.user_unit_rows is None and self.user_vector_index is None:
                 logger.warning("User-item matrix not loaded")
                 return []
 
-            # Get user's interaction vector
-            user_vector = self.user_item_matrix[
-                self.user_item_matrix['user_id'] == user_id
-            ].drop(['user_id'], axis=1)
-
-            if user_vector.empty:
+            row = self.history.user_rows.get(user_id)
+            if row is None:
                 logger.info(f"No interaction data found for user {user_id}")
                 return []
 
-            # Calculate similarity with other users
-            other_users = self.user_item_matrix[
-                self.user_item_matrix['user_id'] != user_id
-            ]
-            similarities = cosine_similarity(
-                user_vector,
-                other_users.drop(['user_id'], axis=1)
-            )[0]
-
-            # Get top similar users
-            similar_indices = np.argsort(similarities)[::-1][:n_similar]
-            return other_users.iloc[similar_indices]['user_id'].tolist()
+            # Ask for one extra neighbour because the user matches themselves
+            if self.user_unit_rows is not None:
+                query = self.user_unit_rows[row]
+                similarities = (self.user_unit_rows @ query.T).toarray().ravel()
+                neighbors, _ = top_k(similarities, n_similar + 1)
+            else:
+                indices, _ = self.user_vector_index.search(
+                    self.user_vector_index.vectors[row], n_similar + 1
+                )
+                neighbors = indices[0]
+            return [
+                self.history.user_ids[idx] for idx in neighbors
+                if idx >= 0 and idx != row
+            ][:n_similar]
 
         except Exception as e:
             logger.error(f"Error getting similar users: {str(e)}")
@@ -0,0 +1,139 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import numpy as np
+import logging
+
+from .neighbors import top_k
+
+logger = logging.getLogger(__name__)
+
+class Signal:
+    """
+    One source of scores to blend, e.g. content similarity or popularity.
+
+    `scores` is either a dense vector aligned with the blender's catalog, or,
+    when `item_ids` is given, the scores of just those items. Sparse signals
+    may carry one reason per item in `reasons`. `peak` is the score that maps
+    to 1 when blending; it defaults to the largest of `scores`, and is set by
+    callers that pass a subset of a larger score vector.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        scores: Sequence[float],
+        weight: float,
+        reason: str,
+        item_ids: Optional[Sequence[Any]] = None,
+        reasons: Optional[Sequence[str]] = None,
+        peak: Optional[float] = None
+    ):
+        self.name = name
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self.weight = float(weight)
+        self.reason = reason
+        self.item_ids = item_ids
+        self.reasons = reasons
+        self.peak = peak
+        self._reason_map = None
+
+    def reason_for(self, item_id: Any) -> str:
+        if self.reasons is None:
+            return self.reason
+        if self._reason_map is None:
+            self._reason_map = dict(zip(self.item_ids, self.reasons))
+        return self._reason_map.get(item_id, self.reason)
+
+def normalize_scores(scores: np.ndarray, peak: Optional[float] = None) -> np.ndarray:
+    """Scale a score vector into [0, 1] by `peak` (default: its maximum); negatives count as 0."""
+    scores = np.clip(scores, 0.0, None)
+    if peak is None:
+        peak = scores.max() if scores.size else 0.0
+    return scores / peak if peak > 0 else scores
+
+class ScoreBlender:
+    """
+    Weighted sum of normalized score vectors over the catalog, then top-k.
+
+    Every signal becomes one row of a (signals x items) matrix, so blending
+    any number of sources is a couple of array operations regardless of how
+    many items each one scored. Items a signal returns that are not in the
+    catalog (e.g. from the augmented dataset) are appended as extra columns.
+    Each result's reason is taken from the signal that contributed most.
+    """
+
+    def __init__(self, item_ids: Sequence[Any], item_index: Optional[Dict[Any, int]] = None):
+        # The catalog index is shared with the caller and never modified
+        self.item_ids = item_ids
+        self.item_index = item_index if item_index is not None else {
+            item_id: idx for idx, item_id in enumerate(item_ids)
+        }
+        self.n_catalog = len(item_ids)
+        self.extra_ids: List[Any] = []
+        self.extra_index: Dict[Any, int] = {}
+        self.signals: List[Signal] = []
+
+    def __len__(self) -> int:
+        return self.n_catalog + len(self.extra_ids)
+
+    def column(self, item_id: Any) -> Optional[int]:
+        column = self.item_index.get(item_id)
+        return column if column is not None else self.extra_index.get(item_id)
+
+    def add(self, signal: Signal) -> "ScoreBlender":
+        if signal.weight > 0 and signal.scores.size:
+            if signal.item_ids is not None:
+                for item_id in signal.item_ids:
+                    if self.column(item_id) is None:
+                        self.extra_index[item_id] = len(self)
+                        self.extra_ids.append(item_id)
+            elif len(signal.scores) != self.n_catalog:
+                raise ValueError(f"Signal {signal.name} does not match the catalog size")
+            self.signals.append(signal)
+        return self
+
+    def extend(self, signals: Iterable[Signal]) -> "ScoreBlender":
+        for signal in signals:
+            self.add(signal)
+        return self
+
+    def blend(
+        self,
+        n: int,
+        exclude: Optional[Iterable[Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Return the n best items as dicts with book_id, score and reason."""
+        if not self.signals:
+            return []
+
+        weighted = np.zeros((len(self.signals), len(self)), dtype=np.float32)
+        for row, signal in enumerate(self.signals):
+            if signal.item_ids is None:
+                weighted[row, :self.n_catalog] = signal.scores
+            else:
+                weighted[row, [self.column(item_id) for item_id in signal.item_ids]] = signal.scores
+            weighted[row] = normalize_scores(weighted[row], signal.peak) * signal.weight
+
+        total = weighted.sum(axis=0)
+        if exclude is not None:
+            columns = [self.column(item_id) for item_id in exclude]
+            total[[column for column in columns if column is not None]] = -np.inf
+
+        best, best_scores = top_k(total, n)
+        keep = best_scores > 0
+        best, best_scores = best[keep], best_scores[keep]
+        sources = np.argmax(weighted[:, best], axis=0)
+        results = []
+        for idx, score, source in zip(best.tolist(), best_scores.tolist(), sources.tolist()):
+            item_id = self._item_id(idx)
+            results.append({
+                'book_id': item_id,
+                'score': float(score),
+                'reason': self.signals[source].reason_for(item_id)
+            })
+        return results
+
+    def _item_id(self, column: int) -> Any:
+        if column < self.n_catalog:
+            item_id = self.item_ids[column]
+            return item_id.item() if isinstance(item_id, np.generic) else item_id
+        return self.extra_ids[column - self.n_catalog]
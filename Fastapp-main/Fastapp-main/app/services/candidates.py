@@ -0,0 +1,286 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from collections import deque
+import numpy as np
+import logging
+import threading
+import time
+
+from app.core.config import settings
+from app.crud.recommendations import get_category_neighbors
+from .blending import ScoreBlender, Signal
+from .neighbors import top_k
+from .trending import trending_engine
+
+logger = logging.getLogger(__name__)
+
+class StageTimings:
+    """Rolling per-stage latencies of the recommendation pipeline, for tuning candidate counts."""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, timings: Dict[str, float]) -> None:
+        with self._lock:
+            for stage, seconds in timings.items():
+                self._samples.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            samples = {stage: np.array(values) * 1000 for stage, values in self._samples.items()}
+        return {
+            stage: {
+                "count": int(len(values)),
+                "mean_ms": float(values.mean()),
+                "p50_ms": float(np.percentile(values, 50)),
+                "p95_ms": float(np.percentile(values, 95)),
+                "max_ms": float(values.max())
+            }
+            for stage, values in samples.items()
+        }
+
+stage_timings = StageTimings()
+
+class CandidateGenerator(ABC):
+    """
+    Cheap first-stage source: returns up to n_candidates catalog rows for a
+    user without scoring the whole catalog.
+    """
+
+    name = "base"
+
+    def __init__(self, n_candidates: int = settings.CANDIDATES_PER_SOURCE):
+        self.n_candidates = n_candidates
+
+    @abstractmethod
+    def generate(
+        self,
+        recommender,
+        history: Tuple[np.ndarray, np.ndarray],
+        user_features: Optional[np.ndarray],
+        db=None
+    ) -> np.ndarray:
+        """
+        `history` is (catalog rows, interaction scores); user_features may be
+        None. `db` is the request's session, for generators that query.
+        """
+
+    @staticmethod
+    def _catalog_rows(recommender, book_ids) -> np.ndarray:
+        """Catalog rows of the given book ids, in order, skipping unknown books."""
+        rows = [recommender.book_index.get(book_id, -1) for book_id in book_ids]
+        return np.array([row for row in rows if row >= 0], dtype=np.int64)
+
+class ContentCandidates(CandidateGenerator):
+    """Stored content neighbours of the books in the user's history."""
+
+    name = "content"
+
+    def generate(self, recommender, history, user_features, db=None):
+        if recommender.content_model is None:
+            return np.empty(0, dtype=np.int64)
+        columns, totals = recommender.content_contributions(*history)
+        best, _ = top_k(totals, self.n_candidates)
+        return columns[best]
+
+class CollaborativeCandidates(CandidateGenerator):
+    """Item factors with the largest dot product with the user's factor row."""
+
+    name = "collaborative"
+
+    def generate(self, recommender, history, user_features, db=None):
+        if user_features is None:
+            return np.empty(0, dtype=np.int64)
+        indices, _ = recommender.item_factor_index().search(user_features, self.n_candidates)
+        indices = indices[0]
+        return indices[indices >= 0]
+
+class CooccurrenceCandidates(CandidateGenerator):
+    """Books most often borrowed, bought or liked together with the user's books."""
+
+    name = "cooccurrence"
+
+    def generate(self, recommender, history, user_features, db=None):
+        cooccurrence = recommender.cooccurrence
+        rows, _ = history
+        if cooccurrence is None or not len(rows):
+            return np.empty(0, dtype=np.int64)
+
+        neighbor_ids, neighbor_scores = cooccurrence.neighbor_lists(recommender.book_ids[rows].tolist())
+        catalog_rows = np.array(
+            [recommender.book_index.get(book_id, -1) for book_id in neighbor_ids], dtype=np.int64
+        )
+        known = catalog_rows >= 0
+        if not known.any():
+            return np.empty(0, dtype=np.int64)
+        columns, inverse = np.unique(catalog_rows[known], return_inverse=True)
+        totals = np.zeros(len(columns), dtype=np.float32)
+        np.add.at(totals, inverse, neighbor_scores[known])
+        best, _ = top_k(totals, self.n_candidates)
+        return columns[best]
+
+class PopularCandidates(CandidateGenerator):
+    """Books with the most stored interactions, so sparse histories still get candidates."""
+
+    name = "popular"
+
+    def generate(self, recommender, history, user_features, db=None):
+        popularity = recommender.item_popularity()
+        if popularity is None:
+            return np.empty(0, dtype=np.int64)
+        best, scores = top_k(popularity, self.n_candidates)
+        return best[scores > 0]
+
+class TrendingCandidates(CandidateGenerator):
+    """Books with the highest live trending scores (see app.services.trending)."""
+
+    name = "trending"
+
+    def __init__(self, n_candidates: int = settings.CANDIDATES_PER_SOURCE, engine=trending_engine):
+        super().__init__(n_candidates)
+        self.engine = engine
+
+    def generate(self, recommender, history, user_features, db=None):
+        return self._catalog_rows(recommender, [book_id for book_id, _ in self.engine.top(self.n_candidates)])
+
+class CategoryCandidates(CandidateGenerator):
+    """Books sharing the most categories with the books in the user's history."""
+
+    name = "category"
+
+    def generate(self, recommender, history, user_features, db=None):
+        db = db if db is not None else recommender.db
+        rows, _ = history
+        if db is None or not len(rows):
+            return np.empty(0, dtype=np.int64)
+        neighbors = get_category_neighbors(db, recommender.book_ids[rows].tolist(), self.n_candidates)
+        return self._catalog_rows(recommender, [book_id for book_id, _ in neighbors])
+
+class RecommendationPipeline:
+    """
+    Two-stage recommender: candidate generators propose a few hundred books
+    each, and the re-ranker applies the full hybrid formula to their union
+    only. Per-request work depends on the candidate counts, not on the size
+    of the catalog. Stage latencies are recorded in `timings`.
+    """
+
+    def __init__(
+        self,
+        generators: Optional[List[CandidateGenerator]] = None,
+        timings: StageTimings = stage_timings
+    ):
+        self.generators = generators if generators is not None else [
+            ContentCandidates(),
+            CollaborativeCandidates(),
+            CooccurrenceCandidates(),
+            CategoryCandidates(),
+            TrendingCandidates(),
+            PopularCandidates()
+        ]
+        self.timings = timings
+
+    def recommend(
+        self,
+        recommender,
+        user_id: int,
+        n_recommendations: int,
+        interactions: Optional[Dict[int, float]] = None,
+        content_weight: float = 0.4,
+        collab_weight: float = 0.6,
+        augmented_weight: float = 0.4,
+        extra_signals: Optional[Sequence[Signal]] = None,
+        db=None
+    ) -> List[Dict[str, Any]]:
+        timings = {}
+        started = time.perf_counter()
+        history = recommender.user_history(user_id, interactions)
+        user_features = recommender.get_user_factors(user_id, interactions)
+
+        pools = []
+        for generator in self.generators:
+            stage_start = time.perf_counter()
+            try:
+                pools.append(generator.generate(recommender, history, user_features, db=db))
+            except Exception as e:
+                logger.error(f"Error generating {generator.name} candidates: {str(e)}")
+            timings[f"candidates.{generator.name}"] = time.perf_counter() - stage_start
+        candidates = np.unique(np.concatenate(pools)) if pools else np.empty(0, dtype=np.int64)
+
+        stage_start = time.perf_counter()
+        blender = self._rerank(
+            recommender, history, user_features, candidates,
+            (1.0 - augmented_weight) * content_weight,
+            (1.0 - augmented_weight) * collab_weight,
+            extra_signals
+        )
+        timings["rerank"] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        augmented_recs = recommender.augmented_recommender.get_user_recommendations(
+            user_id, n_recommendations
+        )
+        recommender._add_recommendations(blender, 'augmented', augmented_recs, augmented_weight)
+        results = blender.blend(n_recommendations)
+        timings["augmented"] = time.perf_counter() - stage_start
+
+        timings["total"] = time.perf_counter() - started
+        self.timings.record(timings)
+        logger.debug(f"Scored {len(candidates)} candidates for user {user_id}: {timings}")
+        return results
+
+    @staticmethod
+    def _rerank(
+        recommender,
+        history: Tuple[np.ndarray, np.ndarray],
+        user_features: Optional[np.ndarray],
+        candidates: np.ndarray,
+        content_weight: float,
+        collab_weight: float,
+        extra_signals: Optional[Sequence[Signal]]
+    ) -> ScoreBlender:
+        """
+        Score the candidates with the full hybrid formula.
+
+        Each signal is normalised by its maximum over the whole catalog, as in
+        the full scoring path, not over the candidates: content totals and
+        dense extra signals are already catalog-wide. The collaborative
+        maximum is taken over the candidates, which contain the catalog's best
+        dot product because CollaborativeCandidates retrieves by inner product
+        (exactly below VECTOR_INDEX_MIN_SIZE items, approximately above).
+        """
+        item_ids = recommender.book_ids[candidates]
+        blender = ScoreBlender(item_ids, {item_id: idx for idx, item_id in enumerate(item_ids.tolist())})
+        if not len(candidates):
+            return blender
+
+        if recommender.content_model is not None:
+            columns, totals = recommender.content_contributions(*history)
+            positions = np.searchsorted(columns, candidates)
+            found = positions < len(columns)
+            found[found] = columns[positions[found]] == candidates[found]
+            scores = np.zeros(len(candidates), dtype=np.float32)
+            scores[found] = totals[positions[found]]
+            blender.add(Signal(
+                'content', scores, content_weight, "Based on book content similarity",
+                peak=float(totals.max()) if totals.size else None
+            ))
+
+        if user_features is not None:
+            blender.add(Signal(
+                'collaborative',
+                user_features @ recommender.collaborative_model.components_[:, candidates],
+                collab_weight,
+                "Based on similar users' preferences"
+            ))
+
+        for signal in extra_signals or []:
+            if signal.item_ids is None:
+                # Dense over the catalog; keep only the candidates' entries
+                signal = Signal(
+                    signal.name, signal.scores[candidates], signal.weight, signal.reason,
+                    peak=float(signal.scores.max()) if signal.scores.size else None
+                )
+            blender.add(signal)
+        return blender
@@ -0,0 +1,89 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+
+from app.core.config import settings
+from app.crud.recommendations import get_book_popularity, get_category_popularity
+from .recommendation_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+def is_cold_start(n_interactions: int) -> bool:
+    return n_interactions < settings.COLD_START_MIN_INTERACTIONS
+
+class ColdStartRecommender:
+    """
+    Recommendations for users with too little history for the models.
+
+    Ranks the most popular books of the user's favorite genres (matched to
+    category names), falling back to overall popularity. The per-category
+    rankings come from one query and are reused for COLD_START_CACHE_TTL, so
+    a cold-start request is a few dictionary lookups and never loads a model.
+    """
+
+    def __init__(self, ttl: float = settings.COLD_START_CACHE_TTL):
+        self._rankings = LRUCache(maxsize=1, ttl=ttl)
+
+    def rankings(self, db) -> Tuple[Dict[str, List[Tuple[int, float]]], List[Tuple[int, float]]]:
+        """(popular books per lower-cased category, popular books overall)."""
+        rankings = self._rankings.get("rankings")
+        if rankings is None:
+            per_category = settings.COLD_START_PER_CATEGORY
+            rankings = (get_category_popularity(db, per_category), get_book_popularity(db, per_category))
+            self._rankings.set("rankings", rankings)
+        return rankings
+
+    def clear(self) -> None:
+        self._rankings.clear()
+
+    def recommend(
+        self,
+        db,
+        favorite_genres: Optional[Sequence[str]],
+        n_recommendations: int = 10,
+        exclude: Iterable[Any] = ()
+    ) -> List[Dict[str, Any]]:
+        """Top books for the given genres as {book_id, score, reason} dicts."""
+        try:
+            by_category, overall = self.rankings(db)
+            exclude = set(exclude)
+            scores: Dict[int, float] = {}
+            reasons: Dict[int, str] = {}
+
+            # Each genre's list is scaled to its best book so niche genres are not drowned out
+            for genre in favorite_genres or []:
+                ranked = by_category.get(genre.strip().lower())
+                if not ranked:
+                    continue
+                top_score = ranked[0][1] or 1.0
+                for book_id, score in ranked:
+                    if book_id in exclude:
+                        continue
+                    scores[book_id] = scores.get(book_id, 0.0) + score / top_score
+                    reasons.setdefault(book_id, f"Popular in {genre.strip()}")
+
+            recommendations = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:n_recommendations]
+            results = [
+                {'book_id': book_id, 'score': score, 'reason': reasons[book_id]}
+                for book_id, score in recommendations
+            ]
+
+            if len(results) < n_recommendations and overall:
+                top_score = overall[0][1] or 1.0
+                for book_id, score in overall:
+                    if len(results) >= n_recommendations:
+                        break
+                    if book_id in exclude or book_id in scores:
+                        continue
+                    # Listed after the genre matches, at half weight
+                    results.append({
+                        'book_id': book_id,
+                        'score': 0.5 * score / top_score,
+                        'reason': "Popular with readers"
+                    })
+            return results
+
+        except Exception as e:
+            logger.error(f"Error getting cold-start recommendations: {str(e)}")
+            return []
+
+cold_start_recommender = ColdStartRecommender()
@@ -0,0 +1,213 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from scipy.sparse import csr_matrix
+import logging
+
+from app.core.config import settings
+from app.crud.recommendations import get_model_data, save_model_data
+from app.schemas.recommendations import ModelDataCreate
+from .artifacts import ModelArtifactStore
+
+logger = logging.getLogger(__name__)
+
+def _resize(matrix: csr_matrix, shape: Tuple[int, int]) -> csr_matrix:
+    """Grow a CSR matrix with empty rows/columns without copying its data."""
+    indptr = matrix.indptr
+    if shape[0] > matrix.shape[0]:
+        indptr = np.concatenate([
+            indptr, np.full(shape[0] - matrix.shape[0], indptr[-1], dtype=indptr.dtype)
+        ])
+    return csr_matrix((matrix.data, matrix.indices, indptr), shape=shape)
+
+def _top_k_rows(similarities: csr_matrix, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Best k columns per row of a sparse matrix as (n_rows, k) arrays padded with -1."""
+    n_rows = similarities.shape[0]
+    indices = np.full((n_rows, k), -1, dtype=np.int32)
+    scores = np.zeros((n_rows, k), dtype=np.float32)
+    if similarities.nnz == 0 or k == 0:
+        return indices, scores
+
+    # Sort every entry by (row, -score) and keep each row's first k
+    rows = np.repeat(np.arange(n_rows), np.diff(similarities.indptr))
+    order = np.lexsort((-similarities.data, rows))
+    rank = np.arange(len(order)) - similarities.indptr[rows[order]]
+    keep = order[rank < k]
+    indices[rows[keep], rank[rank < k]] = similarities.indices[keep]
+    scores[rows[keep], rank[rank < k]] = similarities.data[keep]
+    return indices, scores
+
+class CooccurrenceModel:
+    """
+    Item-to-item co-occurrence ("readers who borrowed this also borrowed").
+
+    Built from a binary users x books matrix A of borrows, purchases,
+    liked reviews and other activity. C = AᵀA counts how many users share
+    each pair of books; neighbours are ranked by C_ij / sqrt(n_i * n_j) so
+    that merely popular books do not dominate, and only the top k per book
+    are kept for serving. New events update C with sparse products over the
+    affected users only, and re-rank just the books whose counts changed.
+    """
+
+    model_name = "cooccurrence"
+
+    def __init__(self, k: int = settings.COOCCURRENCE_NEIGHBORS):
+        self.k = k
+        self.user_ids: List[Any] = []
+        self.book_ids: List[Any] = []
+        self.user_index: Dict[Any, int] = {}
+        self.book_index: Dict[Any, int] = {}
+        self.interactions = csr_matrix((0, 0), dtype=np.float32)
+        self.counts = csr_matrix((0, 0), dtype=np.float32)
+        self.indices = np.full((0, k), -1, dtype=np.int32)
+        self.scores = np.zeros((0, k), dtype=np.float32)
+        self.updated_at: Optional[str] = None  # Events up to this time are included
+        self.version = None
+
+    def __len__(self) -> int:
+        return len(self.book_ids)
+
+    @classmethod
+    def build(cls, events: Iterable[Tuple[Any, Any]], k: int = settings.COOCCURRENCE_NEIGHBORS) -> "CooccurrenceModel":
+        model = cls(k)
+        model.add_events(events)
+        return model
+
+    def add_events(self, events: Iterable[Tuple[Any, Any]]) -> int:
+        """
+        Add (user_id, book_id) events and refresh the affected neighbours.
+
+        Repeated events are ignored. Returns the number of new pairs.
+        """
+        rows, columns = [], []
+        for user_id, book_id in events:
+            rows.append(self._user_row(user_id))
+            columns.append(self._book_column(book_id))
+
+        shape = (len(self.user_ids), len(self.book_ids))
+        old = _resize(self.interactions, shape)
+        if not rows:
+            self.interactions = old
+            return 0
+
+        delta = csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, columns)), shape=shape
+        )
+        delta.data[:] = 1.0
+        # Only pairs that were not recorded before
+        delta = (delta - delta.multiply(old)).tocsr()
+        delta.eliminate_zeros()
+        if delta.nnz == 0:
+            self.interactions = old
+            return 0
+
+        # (A + D)ᵀ(A + D) - AᵀA, restricted to the users that changed
+        users = np.unique(delta.tocoo().row)
+        old_rows, delta_rows = old[users], delta[users]
+        change = (delta_rows.T @ old_rows + old_rows.T @ delta_rows + delta_rows.T @ delta_rows).tocsr()
+
+        self.interactions = (old + delta).tocsr()
+        self.counts = (_resize(self.counts, (shape[1], shape[1])) + change).tocsr()
+        self._rerank(np.unique(change.tocoo().row))
+        return delta.nnz
+
+    def similar(self, book_id: Any, n: int = 10) -> List[Tuple[Any, float]]:
+        """Books most often read together with book_id, as (book_id, score) pairs."""
+        column = self.book_index.get(book_id)
+        if column is None:
+            return []
+        indices = self.indices[column, :n]
+        valid = indices >= 0
+        return [
+            (self.book_ids[idx], float(score))
+            for idx, score in zip(indices[valid].tolist(), self.scores[column, :n][valid].tolist())
+        ]
+
+    def neighbor_lists(self, book_ids: Sequence[Any]) -> Tuple[List[Any], np.ndarray]:
+        """Stored neighbour ids and scores of several books, flattened."""
+        columns = [self.book_index[book_id] for book_id in book_ids if book_id in self.book_index]
+        if not columns:
+            return [], np.empty(0, dtype=np.float32)
+        indices = self.indices[columns]
+        valid = indices >= 0
+        return [self.book_ids[idx] for idx in indices[valid].tolist()], self.scores[columns][valid]
+
+    def _rerank(self, columns: np.ndarray) -> None:
+        n_books = len(self.book_ids)
+        if len(self.indices) < n_books:
+            pad = n_books - len(self.indices)
+            self.indices = np.vstack([self.indices, np.full((pad, self.k), -1, dtype=np.int32)])
+            self.scores = np.vstack([self.scores, np.zeros((pad, self.k), dtype=np.float32)])
+        else:
+            self.indices = np.array(self.indices)
+            self.scores = np.array(self.scores)
+        if not len(columns):
+            return
+
+        # The diagonal holds how many users read each book
+        readers = self.counts.diagonal()
+        rows = self.counts[columns].tocoo()
+        keep = rows.col != columns[rows.row]
+        values = rows.data[keep] / np.sqrt(readers[columns[rows.row[keep]]] * readers[rows.col[keep]])
+        similarities = csr_matrix(
+            (values.astype(np.float32), (rows.row[keep], rows.col[keep])),
+            shape=(len(columns), n_books)
+        )
+        self.indices[columns], self.scores[columns] = _top_k_rows(similarities, self.k)
+
+    def _user_row(self, user_id: Any) -> int:
+        row = self.user_index.get(user_id)
+        if row is None:
+            row = self.user_index[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+        return row
+
+    def _book_column(self, book_id: Any) -> int:
+        column = self.book_index.get(book_id)
+        if column is None:
+            column = self.book_index[book_id] = len(self.book_ids)
+            self.book_ids.append(book_id)
+        return column
+
+    def save(self, db, artifact_store: Optional[ModelArtifactStore] = None) -> None:
+        artifact_store = artifact_store or ModelArtifactStore(settings.MODEL_DIR)
+        manifest = artifact_store.save(
+            self.model_name,
+            arrays={
+                'interactions': self.interactions,
+                'counts': self.counts,
+                'indices': self.indices,
+                'scores': self.scores
+            },
+            objects={
+                'user_ids': self.user_ids,
+                'book_ids': self.book_ids,
+                'state': {'k': self.k, 'updated_at': self.updated_at}
+            }
+        )
+        saved = save_model_data(db, ModelDataCreate(name=self.model_name, data={'artifacts': manifest}))
+        self.version = saved.version
+        artifact_store.prune(self.model_name, keep=settings.MODEL_ARTIFACT_VERSIONS, current=manifest['path'])
+        logger.info(f"Saved co-occurrence model version {saved.version} over {len(self)} books")
+
+    @classmethod
+    def load(cls, db, artifact_store: Optional[ModelArtifactStore] = None) -> Optional["CooccurrenceModel"]:
+        """Load the latest saved model, or None if none has been built yet."""
+        model_data = get_model_data(db, cls.model_name)
+        if not model_data or not (model_data.data or {}).get('artifacts'):
+            return None
+        artifact_store = artifact_store or ModelArtifactStore(settings.MODEL_DIR)
+        arrays, objects = artifact_store.load(
+            model_data.data['artifacts'], verify=settings.MODEL_VERIFY_CHECKSUMS
+        )
+        model = cls(objects['state']['k'])
+        model.user_ids = objects['user_ids']
+        model.book_ids = objects['book_ids']
+        model.user_index = {user_id: row for row, user_id in enumerate(model.user_ids)}
+        model.book_index = {book_id: column for column, book_id in enumerate(model.book_ids)}
+        model.interactions = arrays['interactions']
+        model.counts = arrays['counts']
+        model.indices = arrays['indices']
+        model.scores = arrays['scores']
+        model.updated_at = objects['state']['updated_at']
+        model.version = model_data.version
+        return model
@@ -0,0 +1,135 @@
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Set, Tuple
+import numpy as np
+import resource
+import sys
+import time
+
+def make_synthetic_catalog(
+    n_books: int,
+    n_users: int,
+    interactions_per_user: int = 20,
+    n_genres: int = 50,
+    words_per_genre: int = 30,
+    seed: int = 42
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Generate books and user activities with learnable structure.
+
+    Every book belongs to one genre and its description draws from that
+    genre's vocabulary. Every user prefers two genres and mostly interacts
+    with their books, with Zipf-like popularity inside each genre, so both
+    the content and the collaborative models have real signal to find.
+    """
+    rng = np.random.default_rng(seed)
+    book_genres = rng.integers(0, n_genres, size=n_books)
+    vocabulary = np.array([f"g{g}w{w}" for g in range(n_genres) for w in range(words_per_genre)])
+    shared = np.array([f"common{w}" for w in range(200)])
+
+    genre_words = rng.integers(0, words_per_genre, size=(n_books, 8)) + book_genres[:, None] * words_per_genre
+    filler = rng.integers(0, len(shared), size=(n_books, 4))
+    books = [
+        {
+            "book_id": book_id,
+            "title": f"Book {book_id}",
+            "author": f"Author {book_id % max(1, n_books // 5)}",
+            "description": " ".join(vocabulary[genre_words[book_id]]) + " " + " ".join(shared[filler[book_id]]),
+            "genres": [f"genre{book_genres[book_id]}"]
+        }
+        for book_id in range(n_books)
+    ]
+
+    # Books of each genre, most popular first
+    order = np.argsort(book_genres, kind="stable")
+    offsets = np.searchsorted(book_genres[order], np.arange(n_genres + 1))
+
+    activities = []
+    user_genres = rng.integers(0, n_genres, size=(n_users, 2))
+    for user_id in range(n_users):
+        n_items = max(2, int(rng.poisson(interactions_per_user)))
+        picks = set()
+        for _ in range(n_items):
+            genre = user_genres[user_id, 0 if rng.random() < 0.6 else 1] if rng.random() < 0.85 \
+                else rng.integers(0, n_genres)
+            members = order[offsets[genre]:offsets[genre + 1]]
+            if len(members):
+                rank = min(int(rng.zipf(1.5)) - 1, len(members) - 1)
+                picks.add(int(members[rank]))
+        for book_id in picks:
+            activities.append({
+                "user_id": user_id,
+                "book_id": book_id,
+                "interaction_score": float(rng.uniform(0.3, 1.0))
+            })
+    return books, activities
+
+def split_by_user(
+    activities: Sequence[Dict[str, Any]],
+    test_fraction: float = 0.2,
+    seed: int = 42
+) -> Tuple[List[Dict[str, Any]], Dict[Any, Set[Any]]]:
+    """
+    Hold out a random share of each user's interactions.
+
+    Returns (training activities, {user_id: held-out book ids}). Users with
+    fewer than two interactions keep all of them for training.
+    """
+    rng = np.random.default_rng(seed)
+    by_user: Dict[Any, List[Dict[str, Any]]] = {}
+    for activity in activities:
+        by_user.setdefault(activity["user_id"], []).append(activity)
+
+    train, test = [], {}
+    for user_id, items in by_user.items():
+        n_test = int(len(items) * test_fraction)
+        if len(items) < 2 or n_test == 0:
+            train.extend(items)
+            continue
+        held_out = set(rng.choice(len(items), n_test, replace=False).tolist())
+        train.extend(item for idx, item in enumerate(items) if idx not in held_out)
+        test[user_id] = {items[idx]["book_id"] for idx in held_out}
+    return train, test
+
+def precision_recall_at_k(
+    recommended: Dict[Any, Sequence[Any]],
+    relevant: Dict[Any, Set[Any]],
+    k: int
+) -> Dict[str, float]:
+    """Mean precision@k and recall@k over the users in `relevant`."""
+    precisions, recalls = [], []
+    for user_id, truth in relevant.items():
+        top = list(recommended.get(user_id, []))[:k]
+        hits = len(truth.intersection(top))
+        precisions.append(hits / k)
+        recalls.append(hits / len(truth))
+    return {
+        f"precision@{k}": float(np.mean(precisions)) if precisions else 0.0,
+        f"recall@{k}": float(np.mean(recalls)) if recalls else 0.0,
+        "users": len(precisions)
+    }
+
+def time_calls(function: Callable[[Any], Any], arguments: Iterable[Any]) -> Dict[str, float]:
+    """Call `function` once per argument and summarise the latencies in milliseconds."""
+    latencies = []
+    for argument in arguments:
+        start = time.perf_counter()
+        function(argument)
+        latencies.append(time.perf_counter() - start)
+    return latency_summary(latencies)
+
+def latency_summary(seconds: Sequence[float]) -> Dict[str, float]:
+    latencies_ms = np.array(seconds) * 1000
+    if not len(latencies_ms):
+        return {"calls": 0}
+    return {
+        "calls": len(latencies_ms),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "max_ms": float(latencies_ms.max())
+    }
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
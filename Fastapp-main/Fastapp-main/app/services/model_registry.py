@@ -0,0 +1,144 @@
+from typing import Dict, Optional
+import copy
+import logging
+import threading
+import time
+
+from fastapi import Depends
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud.recommendations import get_model_versions
+from app.db.deps import get_db
+from app.db.session import SessionLocal
+from .augmented_recommender import AugmentedHybridRecommender
+from .cooccurrence import CooccurrenceModel
+from .recommender import HybridRecommender
+
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    """
+    Process-wide holder for the serving HybridRecommender.
+
+    The model is loaded once and shared read-only by every request handled by
+    this process. A cheap version check against ModelData runs at most once per
+    refresh interval; when save_model_data has bumped the version, a new
+    recommender is loaded off to the side and swapped in with a single
+    reference assignment, so in-flight requests keep the instance they started with.
+
+    The co-occurrence model is saved under its own name and version. When only
+    that version moves, it is loaded alone and served from a shallow copy of
+    the current recommender instead of reloading the hybrid model.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "hybrid_recommender",
+        refresh_interval: float = settings.MODEL_REFRESH_INTERVAL
+    ):
+        self.model_name = model_name
+        self.refresh_interval = refresh_interval
+        self._recommender: Optional[HybridRecommender] = None
+        self._augmented: Optional[AugmentedHybridRecommender] = None
+        self._checked_at = 0.0
+        self._load_lock = threading.Lock()
+        self._augmented_lock = threading.Lock()
+
+    @property
+    def version(self) -> Optional[int]:
+        recommender = self._recommender
+        return recommender.version if recommender else None
+
+    @property
+    def augmented_recommender(self) -> AugmentedHybridRecommender:
+        """The file-backed augmented recommender, loaded once per process."""
+        if self._augmented is None:
+            with self._augmented_lock:
+                if self._augmented is None:
+                    self._augmented = AugmentedHybridRecommender()
+        return self._augmented
+
+    def get_recommender(self, db: Session) -> HybridRecommender:
+        """Return the current recommender, reloading it if a newer version was saved."""
+        recommender = self._recommender
+        if recommender is None:
+            return self.refresh(db, force=True)
+
+        if time.monotonic() - self._checked_at >= self.refresh_interval:
+            # Never block a request behind another thread's reload
+            if self._load_lock.acquire(blocking=False):
+                try:
+                    self._checked_at = time.monotonic()
+                    self._reload_changed(db, recommender)
+                except Exception as e:
+                    logger.error(f"Error refreshing recommendation model: {str(e)}")
+                finally:
+                    self._load_lock.release()
+        return self._recommender
+
+    def refresh(self, db: Session, force: bool = False) -> HybridRecommender:
+        """Load the latest saved model version, blocking until it is available."""
+        with self._load_lock:
+            current = self._recommender
+            if current is None:
+                self._swap(self._load(db))
+            elif force:
+                self._reload_changed(db, current)
+            self._checked_at = time.monotonic()
+        return self._recommender
+
+    def publish(self, recommender: HybridRecommender) -> None:
+        """Serve a recommender that was trained in this process without reloading it."""
+        with self._load_lock:
+            self._swap(recommender)
+            self._checked_at = time.monotonic()
+
+    def warmup(self) -> None:
+        """Load the serving model ahead of the first request."""
+        db = SessionLocal()
+        try:
+            self.refresh(db, force=True)
+        except Exception as e:
+            logger.error(f"Error warming up recommendation model: {str(e)}")
+        finally:
+            db.close()
+
+    def _latest_versions(self, db: Session) -> Dict[str, int]:
+        return get_model_versions(db, [self.model_name, CooccurrenceModel.model_name])
+
+    def _reload_changed(self, db: Session, current: HybridRecommender) -> None:
+        latest = self._latest_versions(db)
+        hybrid_version = latest.get(self.model_name)
+        if hybrid_version is not None and hybrid_version != current.version:
+            self._swap(self._load(db))
+            return
+
+        cooccurrence_version = latest.get(CooccurrenceModel.model_name)
+        served = current.cooccurrence.version if current.cooccurrence else None
+        if cooccurrence_version is not None and cooccurrence_version != served:
+            updated = copy.copy(current)
+            updated.cooccurrence = CooccurrenceModel.load(db)
+            self._swap(updated)
+            logger.info(f"Serving co-occurrence model version {cooccurrence_version} (was {served})")
+
+    def _load(self, db: Session) -> HybridRecommender:
+        recommender = HybridRecommender(db, augmented_recommender=self.augmented_recommender)
+        # The loading session belongs to the caller's request
+        recommender.db = None
+        return recommender
+
+    def _swap(self, recommender: HybridRecommender) -> None:
+        previous = self.version
+        self._recommender = recommender
+        if previous != recommender.version:
+            logger.info(
+                f"Serving recommendation model version {recommender.version} "
+                f"(was {previous})"
+            )
+
+model_registry = ModelRegistry()
+
+def get_recommender(db: Session = Depends(get_db)) -> HybridRecommender:
+    """Dependency returning the shared, read-only recommender."""
+    return model_registry.get_recommender(db)
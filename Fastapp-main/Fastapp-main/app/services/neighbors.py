@@ -0,0 +1,218 @@
+from typing import Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import logging
+from scipy.sparse import issparse
+
+logger = logging.getLogger(__name__)
+
+# Set once per pool process so blocks are submitted as (start, stop) only
+_block_state = {}
+
+def _init_block_worker(matrix, matrix_t, k: int) -> None:
+    _block_state.update(matrix=matrix, matrix_t=matrix_t, k=k)
+
+def _top_k_block_task(bounds: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    start, stop = bounds
+    return ContentNeighborIndex._top_k_block(
+        _block_state['matrix'][start:stop], _block_state['matrix_t'], start, _block_state['k']
+    )
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indices and values of the k largest entries of each row, best first.
+
+    Uses argpartition so only the selected k entries per row get sorted.
+    Works on a single score vector or a 2-D block of rows.
+    """
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        empty_shape = scores.shape[:-1] + (0,)
+        return np.empty(empty_shape, dtype=np.int64), np.empty(empty_shape, dtype=scores.dtype)
+
+    top = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    top_scores = np.take_along_axis(scores, top, axis=-1)
+    order = np.argsort(-top_scores, axis=-1, kind="stable")
+    return np.take_along_axis(top, order, axis=-1), np.take_along_axis(top_scores, order, axis=-1)
+
+class ContentNeighborIndex:
+    """
+    Top-k nearest neighbours per book under cosine similarity.
+
+    Stores two (n_books, k) arrays instead of the dense N x N similarity matrix:
+    neighbour row indices (-1 where a book has fewer than k neighbours with
+    positive similarity) and their similarity scores, best first.
+    """
+
+    def __init__(self, indices: np.ndarray, scores: np.ndarray):
+        if indices.shape != scores.shape:
+            raise ValueError("Neighbour indices and scores must have the same shape")
+        self.indices = indices
+        self.scores = scores
+
+    @property
+    def k(self) -> int:
+        return self.indices.shape[1]
+
+    def __len__(self) -> int:
+        return self.indices.shape[0]
+
+    @classmethod
+    def build(
+        cls,
+        matrix,
+        k: int = 50,
+        block_size: Optional[int] = None,
+        max_block_bytes: int = 256 * 1024 * 1024,
+        n_jobs: int = 1
+    ) -> "ContentNeighborIndex":
+        """
+        Build the index from an L2-normalised feature matrix (e.g. TF-IDF output).
+
+        Similarities are computed one row block at a time, so peak memory is
+        bounded by block_size x n_books scores regardless of catalog size.
+        With n_jobs > 1 the blocks are spread over a process pool; each block
+        is independent, so the build scales with the number of processes and
+        max_block_bytes is shared between them.
+        """
+        n_rows = matrix.shape[0]
+        k = max(0, min(k, n_rows - 1))
+        indices = np.full((n_rows, k), -1, dtype=np.int32)
+        scores = np.zeros((n_rows, k), dtype=np.float32)
+        if k == 0:
+            return cls(indices, scores)
+
+        n_jobs = max(1, n_jobs)
+        if block_size is None:
+            block_size = max(1, max_block_bytes // (n_rows * 4 * n_jobs))
+            if n_jobs > 1:
+                # Several blocks per process keep the pool busy until the end
+                block_size = min(block_size, -(-n_rows // (4 * n_jobs)))
+        matrix = matrix.tocsr() if issparse(matrix) else matrix
+        matrix_t = matrix.T.tocsr() if issparse(matrix) else matrix.T
+        bounds = [(start, min(start + block_size, n_rows)) for start in range(0, n_rows, block_size)]
+
+        if n_jobs > 1 and len(bounds) > 1:
+            with ProcessPoolExecutor(
+                max_workers=min(n_jobs, len(bounds)),
+                initializer=_init_block_worker,
+                initargs=(matrix, matrix_t, k)
+            ) as pool:
+                for (start, stop), block in zip(bounds, pool.map(_top_k_block_task, bounds)):
+                    indices[start:stop], scores[start:stop] = block
+        else:
+            for start, stop in bounds:
+                indices[start:stop], scores[start:stop] = cls._top_k_block(
+                    matrix[start:stop], matrix_t, start, k
+                )
+
+        logger.info(f"Built content neighbour index for {n_rows} books (k={k}, {n_jobs} processes)")
+        return cls(indices, scores)
+
+    @staticmethod
+    def _top_k_block(block, matrix_t, offset: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        similarities = block @ matrix_t
+        if issparse(similarities):
+            similarities = similarities.toarray()
+        similarities = np.asarray(similarities, dtype=np.float32)
+
+        # A book is never its own neighbour
+        rows = np.arange(similarities.shape[0])
+        similarities[rows, rows + offset] = -np.inf
+
+        top, top_scores = top_k(similarities, k)
+        top = top.astype(np.int32)
+
+        # Books with no overlapping terms are not neighbours
+        empty = top_scores <= 0
+        top[empty] = -1
+        top_scores[empty] = 0.0
+        return top, top_scores
+
+    def extend(
+        self,
+        matrix,
+        n_existing: int,
+        k: Optional[int] = None,
+        block_size: Optional[int] = None,
+        max_block_bytes: int = 256 * 1024 * 1024,
+        n_jobs: int = 1
+    ) -> "ContentNeighborIndex":
+        """
+        Return a new index that also covers rows n_existing.. of `matrix`.
+
+        New books get their top-k against the whole catalog. Existing books
+        only need to compare their current neighbours with the new books,
+        so the cost grows with the number of added rows, not with N^2.
+
+        `k` defaults to the current width. An index narrower than `k` (e.g.
+        one build() clamped because the catalog was small) cannot be merged
+        into, so it is rebuilt at width `k` with the same block and process
+        settings.
+        """
+        n_rows = matrix.shape[0]
+        n_new = n_rows - n_existing
+        if n_new <= 0:
+            return self
+        requested_k = self.k if k is None else k
+        if self.k < min(requested_k, n_rows - 1):
+            return ContentNeighborIndex.build(
+                matrix,
+                k=requested_k,
+                block_size=block_size,
+                max_block_bytes=max_block_bytes,
+                n_jobs=n_jobs
+            )
+        k = self.k
+
+        matrix = matrix.tocsr() if issparse(matrix) else matrix
+        new_rows = matrix[n_existing:]
+        if block_size is None:
+            block_size = max(1, max_block_bytes // ((n_rows + k + n_new) * 4))
+
+        # Neighbours of the new books against the whole catalog
+        matrix_t = matrix.T.tocsr() if issparse(matrix) else matrix.T
+        new_indices = np.full((n_new, k), -1, dtype=np.int32)
+        new_scores = np.zeros((n_new, k), dtype=np.float32)
+        for start in range(0, n_new, block_size):
+            stop = min(start + block_size, n_new)
+            new_indices[start:stop], new_scores[start:stop] = self._top_k_block(
+                new_rows[start:stop], matrix_t, n_existing + start, k
+            )
+
+        # Existing books keep their neighbours unless a new book beats them
+        indices = np.array(self.indices, dtype=np.int32)
+        scores = np.array(self.scores, dtype=np.float32)
+        new_rows_t = new_rows.T.tocsr() if issparse(new_rows) else new_rows.T
+        new_columns = np.arange(n_existing, n_rows, dtype=np.int32)
+        for start in range(0, n_existing, block_size):
+            stop = min(start + block_size, n_existing)
+            cross = matrix[start:stop] @ new_rows_t
+            if issparse(cross):
+                cross = cross.toarray()
+            candidate_scores = np.hstack([
+                np.where(indices[start:stop] >= 0, scores[start:stop], -np.inf),
+                np.asarray(cross, dtype=np.float32)
+            ])
+            candidate_indices = np.hstack([
+                indices[start:stop],
+                np.broadcast_to(new_columns, (stop - start, n_new))
+            ])
+            best, best_scores = top_k(candidate_scores, k)
+            best_indices = np.take_along_axis(candidate_indices, best, axis=1)
+            empty = best_scores <= 0
+            best_indices[empty] = -1
+            best_scores[empty] = 0.0
+            indices[start:stop], scores[start:stop] = best_indices, best_scores
+
+        logger.info(f"Extended content neighbour index with {n_new} books")
+        return ContentNeighborIndex(
+            np.vstack([indices, new_indices]),
+            np.vstack([scores, new_scores])
+        )
+
+    def neighbors(self, row: int, n: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return up to n neighbour row indices and scores for a row, best first."""
+        indices = self.indices[row, :n]
+        valid = indices >= 0
+        return indices[valid], self.scores[row, :n][valid]
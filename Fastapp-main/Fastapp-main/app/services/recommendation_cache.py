@@ -0,0 +1,185 @@
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from collections import OrderedDict
+import json
+import logging
+import threading
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Recommendations = List[Dict[str, Any]]
+
+def _json_default(value: Any) -> Any:
+    """Store numpy scalars (e.g. int64 ids) as their native Python values."""
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+class LRUCache:
+    """Thread-safe in-process LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+class RedisCache:
+    """
+    Shared cache backend so every API process sees the same entries and
+    invalidations. Requires the optional `redis` package unless a client
+    is passed in.
+    """
+
+    def __init__(self, url: str, ttl: float, prefix: str = "recs", client: Optional[Any] = None):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise ImportError(
+                    "RECOMMENDATION_CACHE_URL is set but the redis package is not installed"
+                ) from e
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.client.get(f"{self.prefix}:{key}")
+        return None if value is None else json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        self.client.set(f"{self.prefix}:{key}", json.dumps(value, default=_json_default), ex=int(self.ttl))
+
+    def generation(self, user_id: int) -> int:
+        return int(self.client.get(f"{self.prefix}:gen:{user_id}") or 0)
+
+    def bump_generation(self, user_id: int) -> int:
+        return int(self.client.incr(f"{self.prefix}:gen:{user_id}"))
+
+class RecommendationCache:
+    """
+    Read-through cache for served recommendation lists.
+
+    Keys include the model version, so deploying a new model never serves
+    stale lists, and a per-user generation that is bumped whenever the user's
+    activity changes. Without a shared backend, invalidations only reach the
+    current process; other processes fall back on the TTL.
+    """
+
+    def __init__(self, local: LRUCache, shared: Optional[RedisCache] = None):
+        self.local = local
+        self.shared = shared
+        self._generations: Dict[int, int] = {}
+
+    @classmethod
+    def from_settings(cls) -> "RecommendationCache":
+        local = LRUCache(settings.RECOMMENDATION_CACHE_SIZE, settings.RECOMMENDATION_CACHE_TTL)
+        shared = None
+        if settings.RECOMMENDATION_CACHE_URL:
+            try:
+                shared = RedisCache(settings.RECOMMENDATION_CACHE_URL, settings.RECOMMENDATION_CACHE_TTL)
+            except Exception as e:
+                logger.error(f"Error connecting to shared recommendation cache: {str(e)}")
+        return cls(local, shared)
+
+    def personalized(
+        self,
+        user_id: int,
+        model_version: Optional[int],
+        n_recommendations: int,
+        compute: Callable[[], Recommendations],
+        variant: str = ""
+    ) -> Recommendations:
+        """`variant` distinguishes request options that change the result, e.g. weights."""
+        key = f"user:{user_id}:{self._generation(user_id)}:v{model_version}:n{n_recommendations}:{variant}"
+        return self._get_or_compute(key, compute)
+
+    def similar(
+        self,
+        book_id: int,
+        model_version: Optional[int],
+        n_recommendations: int,
+        compute: Callable[[], Recommendations]
+    ) -> Recommendations:
+        key = f"book:{book_id}:v{model_version}:n{n_recommendations}"
+        return self._get_or_compute(key, compute)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Drop a user's cached lists after their activity changed."""
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        if self.shared is not None:
+            try:
+                self.shared.bump_generation(user_id)
+            except Exception as e:
+                logger.error(f"Error invalidating shared recommendation cache: {str(e)}")
+
+    def clear(self) -> None:
+        self.local.clear()
+
+    def _generation(self, user_id: int) -> int:
+        generation = self._generations.get(user_id, 0)
+        if self.shared is not None:
+            try:
+                generation = self.shared.generation(user_id)
+            except Exception as e:
+                logger.error(f"Error reading shared recommendation cache: {str(e)}")
+        return generation
+
+    def _get_or_compute(self, key: str, compute: Callable[[], Recommendations]) -> Recommendations:
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except Exception as e:
+                logger.error(f"Error reading shared recommendation cache: {str(e)}")
+            if value is not None:
+                self.local.set(key, value)
+                return value
+
+        value = compute()
+        # Errors surface as empty lists; do not pin them for the whole TTL
+        if value:
+            self.local.set(key, value)
+            if self.shared is not None:
+                try:
+                    self.shared.set(key, value)
+                except Exception as e:
+                    logger.error(f"Error writing shared recommendation cache: {str(e)}")
+        return value
+
+recommendation_cache = RecommendationCache.from_settings()
+
+# Trending lists are the same for every user; recomputed from the popularity rollup at most once per TTL
+trending_cache = LRUCache(maxsize=64, ttl=settings.TRENDING_CACHE_TTL)
@@ -1,100 +1,173 @@
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 import numpy as np
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.decomposition import NMF
-from scipy.sparse import csr_matrix
+from scipy.sparse import csr_matrix, vstack
 import pickle
 import logging
 from datetime import datetime
-from pathlib import Path
-import os
 
-from app.models.recommendations import ModelData
+from app.core.config import settings
 from app.crud.recommendations import get_model_data, save_model_data
 from app.schemas.recommendations import ModelDataCreate
 from .augmented_recommender import AugmentedHybridRecommender
+from .artifacts import ModelArtifactStore
+from .neighbors import ContentNeighborIndex, top_k
+from .vector_index import build_index
+from .blending import ScoreBlender, Signal
+from .candidates import RecommendationPipeline
+from .cooccurrence import CooccurrenceModel
+from .strategies import (
+    AugmentedStrategy, RecommendationContext, ScoringStrategy, model_strategies, run_strategies, sql_strategies
+)
+from .text_features import PARALLEL_MIN_DOCUMENTS, ShardedTfidfVectorizer, build_content
 
 logger = logging.getLogger(__name__)
 
+def _solve_nonnegative(
+    numerator: np.ndarray,
+    gram: np.ndarray,
+    initial: np.ndarray,
+    n_iterations: int = 50
+) -> np.ndarray:
+    """
+    Row-wise min ||x - wF|| subject to w >= 0 via multiplicative updates.
+
+    Takes the projections x Fᵀ (numerator) and the k x k Gram matrix F Fᵀ,
+    so the cost never depends on the length of x.
+    """
+    solution = np.array(initial, dtype=np.float64)
+    for _ in range(n_iterations):
+        solution *= numerator / (solution @ gram + 1e-10)
+    return solution
+
 class HybridRecommender:
-    def __init__(self, db_session):
+    def __init__(
+        self,
+        db_session,
+        augmented_recommender: Optional[AugmentedHybridRecommender] = None
+    ):
         self.db = db_session
         self.content_model = None
         self.collaborative_model = None
         self.books_df = None
         self.user_item_matrix = None
         self.vectorizer = None
+        self.book_ids = None
+        self.book_index = {}
+        self.user_factors = None
+        self.user_ids = None
+        self.user_index = {}
+        self.content_matrix = None
+        self.training_stats = {}
+        self._gram = None
+        self._item_factor_index = None
+        self._item_popularity = None
+        self.cooccurrence = None
+        self.pipeline = RecommendationPipeline()
         self.model_name = "hybrid_recommender"
-        self.augmented_model = None
-        self.augmented_recommender = AugmentedHybridRecommender()
+        self.version = None
+        self.artifact_store = ModelArtifactStore(settings.MODEL_DIR)
+        # The augmented recommender is file-backed and independent of the
+        # ModelData version, so the registry passes in one shared instance.
+        self.augmented_recommender = augmented_recommender or AugmentedHybridRecommender()
+        self.augmented_model = self.augmented_recommender.model
         self.load_model()
 
     def load_model(self) -> None:
-        """Load both base and augmented models."""
+        """Load the base model; the augmented model is owned by augmented_recommender."""
         try:
-            # Load base model from database
+            # Model metadata lives in the database, arrays in the artifact store
             model_data = get_model_data(self.db, self.model_name)
             if model_data:
-                data = model_data.data
+                manifest = (model_data.data or {}).get('artifacts')
+                if manifest is None:
+                    logger.warning(
+                        f"Model {self.model_name} version {model_data.version} was saved "
+                        "in the legacy inline format; retrain to use it"
+                    )
+                    return
                 try:
-                    self.vectorizer = pickle.loads(data['vectorizer'])
-                    self.content_model = pickle.loads(data['content_model'])
-                    self.collaborative_model = pickle.loads(data['collaborative_model'])
-                    self.books_df = pd.DataFrame(data['books_data'])
-                    self.user_item_matrix = csr_matrix(data['user_item_matrix'])
+                    arrays, objects = self.artifact_store.load(
+                        manifest,
+                        verify=settings.MODEL_VERIFY_CHECKSUMS
+                    )
+                    self.vectorizer = objects['vectorizer']
+                    self.collaborative_model = objects['collaborative_model']
+                    self.books_df = objects['books_df']
+                    self.training_stats = objects.get('training_stats', {})
+                    self.content_matrix = arrays.get('content_matrix')
+                    self.content_model = ContentNeighborIndex(
+                        arrays['content_indices'],
+                        arrays['content_scores']
+                    )
+                    self.user_item_matrix = arrays['user_item_matrix']
+                    self.user_factors = arrays['user_factors']
+                    self.user_ids = arrays['user_ids']
+                    self.version = model_data.version
+                    self._build_book_index()
+                    self._build_user_index()
                     logger.info(f"Loaded base recommendation model version {model_data.version}")
                 except Exception as e:
-                    logger.error(f"Error unpickling model data: {str(e)}")
+                    logger.error(f"Error loading model artifacts: {str(e)}")
                     raise
 
-            # Load augmented model from file
-            augmented_model_path = Path("ml_models/augmented_hybrid_model.pkl")
-            if augmented_model_path.exists():
-                try:
-                    with open(augmented_model_path, 'rb') as f:
-                        self.augmented_model = pickle.load(f)
-                    logger.info("Loaded augmented hybrid model")
-                except Exception as e:
-                    logger.error(f"Error loading augmented model: {str(e)}")
-                    raise
-            else:
-                logger.warning(f"Augmented hybrid model not found at {augmented_model_path}")
+            try:
+                self.cooccurrence = CooccurrenceModel.load(self.db)
+            except Exception as e:
+                logger.error(f"Error loading co-occurrence model: {str(e)}")
 
         except Exception as e:
             logger.error(f"Error loading models: {str(e)}")
             raise
 
     def save_model(self) -> None:
-        """Save the current model state to the database."""
+        """Write model artifacts to disk and record their manifest in the database."""
         try:
             # Ensure all required components are present
             if not all([self.vectorizer, self.content_model, self.collaborative_model, 
-                       self.books_df is not None, self.user_item_matrix is not None]):
+                       self.books_df is not None, self.user_item_matrix is not None,
+                       self.user_factors is not None]):
                 raise ValueError("Missing required model components")
 
-            # Prepare model data for storage
-            model_data = {
-                'vectorizer': pickle.dumps(self.vectorizer),
-                'content_model': pickle.dumps(self.content_model),
-                'collaborative_model': pickle.dumps(self.collaborative_model),
-                'books_data': self.books_df.to_dict(),
-                'user_item_matrix': self.user_item_matrix.toarray()
-            }
-            
+            manifest = self.artifact_store.save(
+                self.model_name,
+                arrays={
+                    'content_indices': self.content_model.indices,
+                    'content_scores': self.content_model.scores,
+                    'content_matrix': self.content_matrix,
+                    'user_item_matrix': self.user_item_matrix,
+                    'user_factors': self.user_factors,
+                    'user_ids': self.user_ids
+                },
+                objects={
+                    'vectorizer': self.vectorizer,
+                    'collaborative_model': self.collaborative_model,
+                    'books_df': self.books_df,
+                    'training_stats': self.training_stats
+                }
+            )
+
             # Save to database
-            save_model_data(
+            saved = save_model_data(
                 self.db,
                 ModelDataCreate(
                     name=self.model_name,
-                    data=model_data
+                    data={'artifacts': manifest}
                 )
             )
+            self.version = saved.version
+            self.artifact_store.prune(
+                self.model_name,
+                keep=settings.MODEL_ARTIFACT_VERSIONS,
+                current=manifest['path']
+            )
             logger.info("Successfully saved recommendation model")
 
             # Save augmented model to file
-            augmented_model_path = Path("ml_models/augmented_hybrid_model.pkl")
+            if self.augmented_model is None:
+                return
+            augmented_model_path = settings.ML_MODELS_DIR / "augmented_hybrid_model.pkl"
             try:
                 with open(augmented_model_path, 'wb') as f:
                     pickle.dump(self.augmented_model, f)
@@ -111,18 +184,15 @@ class HybridRecommender:
         self,
         books: List[Dict[str, Any]],
         user_activities: List[Dict[str, Any]]
-    ) -> Tuple[pd.DataFrame, csr_matrix]:
-        """Prepare data for model training."""
+    ) -> Tuple[pd.DataFrame, csr_matrix, np.ndarray]:
+        """Prepare data for model training; also returns the user id of each matrix row."""
         try:
             # Prepare books data
             books_df = pd.DataFrame(books)
-            books_df['content'] = books_df.apply(
-                lambda x: f"{x['title']} {x['author']} {x['description']} {' '.join(x['genres'])}",
-                axis=1
-            )
+            books_df['content'] = build_content(books_df)
 
             # Create user-item interaction matrix
-            user_ids = {activity['user_id']: idx for idx, activity in enumerate(set(a['user_id'] for a in user_activities))}
+            user_ids = {user_id: idx for idx, user_id in enumerate(sorted(set(a['user_id'] for a in user_activities)))}
             book_ids = {book['book_id']: idx for idx, book in enumerate(books)}
             
             matrix_data = []
@@ -141,34 +211,64 @@ class HybridRecommender:
                 shape=(len(user_ids), len(book_ids))
             )
 
-            return books_df, user_item_matrix
+            return books_df, user_item_matrix, np.array(list(user_ids), dtype=np.int64)
 
         except Exception as e:
             logger.error(f"Error preparing data: {str(e)}")
             raise
 
+    @property
+    def is_trained(self) -> bool:
+        return self.content_model is not None and self.collaborative_model is not None
+
     def train(
         self,
         books: List[Dict[str, Any]],
-        user_activities: List[Dict[str, Any]]
+        user_activities: List[Dict[str, Any]],
+        data_as_of: Optional[datetime] = None
     ) -> None:
-        """Train both content-based and collaborative filtering models."""
+        """
+        Train both content-based and collaborative filtering models.
+
+        `data_as_of` is when `books` and `user_activities` were read (default
+        now); the next incremental update starts from it. Take it before
+        querying, so rows written during the query are picked up later.
+        """
         try:
             # Prepare data
-            self.books_df, self.user_item_matrix = self.prepare_data(books, user_activities)
+            self.books_df, self.user_item_matrix, self.user_ids = self.prepare_data(books, user_activities)
 
             # Train content-based model
-            self.vectorizer = TfidfVectorizer(
+            # Large catalogs are tokenized and compared on several processes
+            n_jobs = settings.TRAINING_N_JOBS if len(self.books_df) >= PARALLEL_MIN_DOCUMENTS else 1
+            self.vectorizer = ShardedTfidfVectorizer(
                 max_features=5000,
                 stop_words='english',
-                ngram_range=(1, 2)
+                ngram_range=(1, 2),
+                n_jobs=n_jobs
+            )
+            self.content_matrix = self.vectorizer.fit_transform(self.books_df['content'])
+            self.content_model = ContentNeighborIndex.build(
+                self.content_matrix, k=settings.CONTENT_NEIGHBORS, n_jobs=n_jobs
             )
-            content_matrix = self.vectorizer.fit_transform(self.books_df['content'])
-            self.content_model = cosine_similarity(content_matrix)
+            self._build_book_index()
 
             # Train collaborative filtering model using NMF
             self.collaborative_model = NMF(n_components=64, init='random', random_state=42)
-            self.collaborative_model.fit(self.user_item_matrix)
+            # Keep W (user factors) so scoring is a plain W x H product
+            self.user_factors = self.collaborative_model.fit_transform(self.user_item_matrix)
+            self._gram = None
+            self._item_factor_index = None
+            self._item_popularity = None
+            self._build_user_index()
+            self.training_stats = {
+                'trained_at': datetime.utcnow().isoformat(),
+                'updated_at': (data_as_of or datetime.utcnow()).isoformat(),
+                'n_books': len(self.books_df),
+                'n_users': len(self.user_ids),
+                'books_added': 0,
+                'users_updated': 0
+            }
 
             # Save the trained model
             self.save_model()
@@ -177,6 +277,168 @@ class HybridRecommender:
             logger.error(f"Error training model: {str(e)}")
             raise
 
+    def update(
+        self,
+        books: List[Dict[str, Any]],
+        user_activities: List[Dict[str, Any]],
+        data_as_of: Optional[datetime] = None
+    ) -> bool:
+        """
+        Incrementally add new books and interactions to a trained model.
+
+        New books are vectorized with the fitted vocabulary and merged into
+        the neighbour index; interactions are folded into the user (and new
+        book) factors without refitting NMF. The updated model is saved as a
+        new version. Returns True when drift since the last full fit exceeds
+        MODEL_DRIFT_THRESHOLD and a full retrain should be scheduled.
+        `data_as_of` is as for train().
+
+        Call this on a private instance; the serving instance is shared.
+        """
+        try:
+            if not self.is_trained:
+                raise ValueError("No trained model to update")
+            if self.content_matrix is None or not self.training_stats:
+                # Saved before incremental state was stored; cannot extend it
+                return True
+
+            new_books = [book for book in books if book['book_id'] not in self.book_index]
+            if new_books:
+                self._add_books(new_books)
+            if user_activities:
+                self._add_interactions(user_activities)
+
+            if new_books or user_activities:
+                self._item_factor_index = None
+                self._item_popularity = None
+                self.training_stats['updated_at'] = (data_as_of or datetime.utcnow()).isoformat()
+                self.save_model()
+            drift = self.drift()
+            logger.info(
+                f"Incrementally added {len(new_books)} books and "
+                f"{len(user_activities)} interactions (drift {drift:.2f})"
+            )
+            return drift > settings.MODEL_DRIFT_THRESHOLD
+        except Exception as e:
+            logger.error(f"Error updating model: {str(e)}")
+            raise
+
+    def drift(self) -> float:
+        """Share of books added or users changed since the last full fit."""
+        stats = self.training_stats
+        if not stats:
+            return 1.0
+        return max(
+            stats['books_added'] / max(stats['n_books'], 1),
+            stats['users_updated'] / max(stats['n_users'], 1)
+        )
+
+    def _add_books(self, books: List[Dict[str, Any]]) -> None:
+        new_df = pd.DataFrame(books)
+        new_df['content'] = build_content(new_df)
+        n_existing = len(self.books_df)
+
+        self.content_matrix = vstack([
+            self.content_matrix,
+            self.vectorizer.transform(new_df['content'])
+        ]).tocsr()
+        n_jobs = settings.TRAINING_N_JOBS if self.content_matrix.shape[0] >= PARALLEL_MIN_DOCUMENTS else 1
+        self.content_model = self.content_model.extend(
+            self.content_matrix, n_existing, k=settings.CONTENT_NEIGHBORS, n_jobs=n_jobs
+        )
+        self.books_df = pd.concat([self.books_df, new_df], ignore_index=True)
+        self._build_book_index()
+
+        # New books have no interactions yet; their item factors start at zero
+        item_factors = self.collaborative_model.components_
+        self.collaborative_model.components_ = np.hstack([
+            item_factors,
+            np.zeros((item_factors.shape[0], len(new_df)), dtype=item_factors.dtype)
+        ])
+        self.user_item_matrix = csr_matrix(
+            (self.user_item_matrix.data, self.user_item_matrix.indices, self.user_item_matrix.indptr),
+            shape=(self.user_item_matrix.shape[0], len(self.books_df))
+        )
+        self.training_stats['books_added'] += len(new_df)
+
+    def _add_interactions(self, user_activities: List[Dict[str, Any]]) -> None:
+        # Only the latest event per (user, book) counts; activities come oldest first
+        latest = {
+            (a['user_id'], a['book_id']): a for a in user_activities if a['book_id'] in self.book_index
+        }
+        activities = list(latest.values())
+        if not activities:
+            return
+
+        # Append rows for users the model has not seen
+        new_user_ids = sorted({a['user_id'] for a in activities} - set(self.user_index))
+        n_users = len(self.user_ids) + len(new_user_ids)
+        self.user_ids = np.concatenate([self.user_ids, np.array(new_user_ids, dtype=np.int64)])
+        self._build_user_index()
+
+        updates = csr_matrix(
+            (
+                np.array([a['interaction_score'] for a in activities], dtype=np.float64),
+                (
+                    np.array([self.user_index[a['user_id']] for a in activities]),
+                    np.array([self.book_index[a['book_id']] for a in activities])
+                )
+            ),
+            shape=(n_users, len(self.books_df))
+        )
+        matrix = self.user_item_matrix
+        if new_user_ids:
+            indptr = np.concatenate([
+                matrix.indptr,
+                np.full(len(new_user_ids), matrix.indptr[-1], dtype=matrix.indptr.dtype)
+            ])
+            matrix = csr_matrix(
+                (matrix.data, matrix.indices, indptr),
+                shape=(n_users, matrix.shape[1])
+            )
+        # The latest interaction score replaces the stored one
+        pattern = updates.copy()
+        pattern.data[:] = 1
+        self.user_item_matrix = (matrix - matrix.multiply(pattern) + updates).tocsr()
+
+        user_factors = np.zeros((n_users, self.collaborative_model.n_components_))
+        user_factors[:len(self.user_factors)] = self.user_factors
+        item_factors = np.array(self.collaborative_model.components_)
+
+        # Books that had no factors yet are folded in from the users who touched them
+        touched_books = np.unique(updates.indices)
+        cold_books = touched_books[~item_factors[:, touched_books].any(axis=0)]
+        if len(cold_books):
+            columns = self.user_item_matrix[:, cold_books].T.tocsr()
+            item_factors[:, cold_books] = _solve_nonnegative(
+                columns @ user_factors,
+                user_factors.T @ user_factors,
+                np.full((len(cold_books), item_factors.shape[0]), 1.0 / item_factors.shape[0])
+            ).T
+            self.collaborative_model.components_ = item_factors
+            self._gram = None
+
+        # Refit the factor rows of every user whose interactions changed
+        touched_users = np.unique(updates.tocoo().row)
+        rows = self.user_item_matrix[touched_users]
+        row_means = np.asarray(rows.sum(axis=1)).ravel() / np.maximum(np.diff(rows.indptr), 1)
+        user_factors[touched_users] = _solve_nonnegative(
+            rows @ item_factors.T,
+            self._item_gram(),
+            np.outer(row_means, np.ones(item_factors.shape[0])) / item_factors.shape[0]
+        )
+        self.user_factors = user_factors
+        self.training_stats['users_updated'] += len(touched_users)
+
+    def _build_book_index(self) -> None:
+        """Map book ids to catalog rows so lookups avoid scanning books_df."""
+        self.book_ids = self.books_df['book_id'].to_numpy()
+        self.book_index = {int(book_id): idx for idx, book_id in enumerate(self.book_ids)}
+
+    def _build_user_index(self) -> None:
+        """Map user ids to rows of the user-item matrix and user factors."""
+        self.user_index = {int(user_id): idx for idx, user_id in enumerate(self.user_ids)}
+
     def get_content_recommendations(
         self,
         book_id: int,
@@ -184,13 +446,16 @@ class HybridRecommender:
     ) -> List[Tuple[int, float]]:
         """Get content-based recommendations for a book."""
         try:
-            book_idx = self.books_df[self.books_df['book_id'] == book_id].index[0]
-            book_similarities = self.content_model[book_idx]
-            similar_indices = np.argsort(book_similarities)[::-1][1:n_recommendations + 1]
-            
+            book_idx = self.book_index.get(book_id)
+            if book_idx is None or self.content_model is None:
+                return []
+
+            neighbor_indices, neighbor_scores = self.content_model.neighbors(
+                book_idx, n_recommendations
+            )
             return [
-                (self.books_df.iloc[idx]['book_id'], float(book_similarities[idx]))
-                for idx in similar_indices
+                (int(self.book_ids[idx]), float(score))
+                for idx, score in zip(neighbor_indices, neighbor_scores)
             ]
         except Exception as e:
             logger.error(f"Error getting content recommendations: {str(e)}")
@@ -199,221 +464,318 @@ class HybridRecommender:
     def get_collaborative_recommendations(
         self,
         user_id: int,
-        n_recommendations: int = 10
+        n_recommendations: int = 10,
+        interactions: Optional[Dict[int, float]] = None
     ) -> List[Tuple[int, float]]:
-        """Get collaborative filtering recommendations for a user."""
+        """
+        Get collaborative filtering recommendations for a user.
+
+        Known users are scored with their trained factor row; users the model
+        has not seen are folded in from `interactions` (book_id -> score).
+        """
         try:
-            # Get user's interaction vector
-            user_idx = list(self.user_item_matrix.getcol(user_id).nonzero()[0])
-            if not user_idx:
+            user_features = self.get_user_factors(user_id, interactions)
+            if user_features is None:
                 return []
 
-            # Get user's latent features
-            user_features = self.collaborative_model.transform(self.user_item_matrix[user_idx])
-            
             # Get predictions for all items
-            predictions = self.collaborative_model.inverse_transform(user_features)
-            
-            # Get top recommendations
-            top_indices = np.argsort(predictions[0])[::-1][:n_recommendations]
-            
+            predictions = user_features @ self.collaborative_model.components_
+            top_indices, top_scores = top_k(predictions, n_recommendations)
+
             return [
-                (self.books_df.iloc[idx]['book_id'], float(predictions[0][idx]))
-                for idx in top_indices
+                (int(self.book_ids[idx]), float(score))
+                for idx, score in zip(top_indices, top_scores)
             ]
         except Exception as e:
             logger.error(f"Error getting collaborative recommendations: {str(e)}")
             return []
 
-    def get_hybrid_recommendations(
+    def get_user_factors(
         self,
         user_id: int,
-        n_recommendations: int = 10
-    ) -> List[Dict[str, Any]]:
-        """Get hybrid recommendations combining base and augmented models."""
+        interactions: Optional[Dict[int, float]] = None
+    ) -> Optional[np.ndarray]:
+        """Return the stored factor row for a user, folding in cold users."""
+        if self.collaborative_model is None:
+            return None
+
+        user_idx = self.user_index.get(user_id)
+        if user_idx is not None:
+            return np.asarray(self.user_factors[user_idx])
+
+        if interactions:
+            return self.fold_in(interactions)
+        return None
+
+    def fold_in(
+        self,
+        interactions: Dict[int, float],
+        n_iterations: int = 50
+    ) -> Optional[np.ndarray]:
+        """
+        Project an interaction vector onto the trained item factors H.
+
+        Solves min ||x - wH|| for w >= 0 with multiplicative updates. Only the
+        columns the user touched are read from H, and every iteration works on
+        the precomputed k x k Gram matrix H Hᵀ, so the cost does not depend on
+        catalog size.
+        """
+        columns = [self.book_index[book_id] for book_id in interactions if book_id in self.book_index]
+        if not columns:
+            return None
+
+        item_factors = self.collaborative_model.components_
+        values = np.array(
+            [score for book_id, score in interactions.items() if book_id in self.book_index],
+            dtype=np.float64
+        )
+        numerator = item_factors[:, columns] @ values
+        initial = np.full(item_factors.shape[0], values.mean() / item_factors.shape[0])
+        return _solve_nonnegative(numerator, self._item_gram(), initial, n_iterations)
+
+    def _item_gram(self) -> np.ndarray:
+        if self._gram is None:
+            item_factors = self.collaborative_model.components_
+            self._gram = item_factors @ item_factors.T
+        return self._gram
+
+    def recommend_batch(
+        self,
+        user_ids: Sequence[int],
+        n_recommendations: int = 10,
+        exclude_seen: bool = True,
+        block_size: int = 1024
+    ) -> Dict[int, List[Tuple[int, float]]]:
+        """
+        Get collaborative top-N recommendations for many users at once.
+
+        Scores a block of users with one W[block] x H product and selects each
+        row's top-N with argpartition. Users without trained factors are omitted.
+        """
         try:
-            # Get recommendations from both models
-            base_recs = self._get_base_recommendations(user_id, n_recommendations)
-            augmented_recs = self.augmented_recommender.get_user_recommendations(
-                user_id, n_recommendations
+            if self.user_factors is None or self.collaborative_model is None:
+                return {}
+
+            rows = np.array(
+                [self.user_index[user_id] for user_id in user_ids if user_id in self.user_index],
+                dtype=np.int64
             )
+            item_factors = self.collaborative_model.components_
+            results = {}
 
-            # Combine recommendations with weights
-            combined_recs = {}
-            for rec in base_recs:
-                book_id = rec['book_id']
-                combined_recs[book_id] = {
-                    'score': rec['score'] * 0.6,  # 60% weight to base model
-                    'reason': rec['reason']
-                }
+            for start in range(0, len(rows), block_size):
+                block_rows = rows[start:start + block_size]
+                scores = np.asarray(self.user_factors[block_rows]) @ item_factors
 
-            for rec in augmented_recs:
-                book_id = rec['book_id']
-                if book_id in combined_recs:
-                    combined_recs[book_id]['score'] += rec['score'] * 0.4  # 40% weight to augmented model
-                else:
-                    combined_recs[book_id] = {
-                        'score': rec['score'] * 0.4,
-                        'reason': rec['reason']
-                    }
-
-            # Sort and return top recommendations
-            sorted_recs = sorted(
-                combined_recs.items(),
-                key=lambda x: x[1]['score'],
-                reverse=True
-            )
+                if exclude_seen:
+                    seen = self.user_item_matrix[block_rows].tocoo()
+                    scores[seen.row, seen.col] = -np.inf
 
-            return [
-                {
-                    'book_id': book_id,
-                    'score': float(info['score']),
-                    'reason': info['reason']
-                }
-                for book_id, info in sorted_recs[:n_recommendations]
-            ]
+                top, top_scores = top_k(scores, n_recommendations)
+
+                for row, items, item_scores in zip(block_rows, top, top_scores):
+                    valid = np.isfinite(item_scores)
+                    results[int(self.user_ids[row])] = [
+                        (int(self.book_ids[idx]), float(score))
+                        for idx, score in zip(items[valid], item_scores[valid])
+                    ]
 
+            return results
         except Exception as e:
-            logger.error(f"Error getting hybrid recommendations: {str(e)}")
-            return []
+            logger.error(f"Error getting batch recommendations: {str(e)}")
+            return {}
 
-    def _get_base_recommendations(
+    def get_hybrid_recommendations(
         self,
         user_id: int,
-        n_recommendations: int = 10
+        n_recommendations: int = 10,
+        interactions: Optional[Dict[int, float]] = None,
+        content_weight: float = 0.4,
+        collab_weight: float = 0.6,
+        augmented_weight: float = 0.4,
+        extra_signals: Optional[Sequence[Signal]] = None,
+        strategies: Optional[Sequence[ScoringStrategy]] = None,
+        db=None
     ) -> List[Dict[str, Any]]:
-        """Get recommendations from the base model."""
+        """
+        Get hybrid recommendations combining base and augmented models.
+
+        content_weight and collab_weight split the base model's share,
+        augmented_weight is the share of the augmented model. extra_signals
+        (e.g. popularity or recency vectors over the catalog) are blended in
+        with their own weights. `strategies` replaces the default scoring
+        strategies; before any model is trained the SQL-backed ones are used.
+        `db` is the request's session, needed by the SQL-backed strategies
+        when this instance is shared (see ModelRegistry) and has none.
+        Catalogs of CANDIDATE_MIN_CATALOG books or more go through the
+        two-stage candidate pipeline instead of scoring every book.
+        """
         try:
-            # Get content-based recommendations
-            content_recs = self.get_content_recommendations(user_id, n_recommendations)
-            
-            # Get collaborative filtering recommendations
-            collab_recs = self.get_collaborative_recommendations(user_id, n_recommendations)
-            
-            # Combine recommendations
-            combined_recs = {}
-            for book_id, score in content_recs:
-                combined_recs[book_id] = {
-                    'score': score * 0.4,  # 40% weight to content-based
-                    'reason': "Based on book content similarity"
-                }
-            
-            for book_id, score in collab_recs:
-                if book_id in combined_recs:
-                    combined_recs[book_id]['score'] += score * 0.6  # 60% weight to collaborative
-                    combined_recs[book_id]['reason'] = "Based on both content and user behavior"
+            if strategies is None:
+                if self.book_ids is not None and len(self.book_ids) >= settings.CANDIDATE_MIN_CATALOG:
+                    return self.pipeline.recommend(
+                        self, user_id, n_recommendations, interactions,
+                        content_weight=content_weight,
+                        collab_weight=collab_weight,
+                        augmented_weight=augmented_weight,
+                        extra_signals=extra_signals,
+                        db=db
+                    )
+                if self.content_model is None and self.collaborative_model is None:
+                    strategies = sql_strategies() + [AugmentedStrategy(augmented_weight)]
                 else:
-                    combined_recs[book_id] = {
-                        'score': score * 0.6,
-                        'reason': "Based on similar users' preferences"
-                    }
-            
-            # Sort and return top recommendations
-            sorted_recs = sorted(
-                combined_recs.items(),
-                key=lambda x: x[1]['score'],
-                reverse=True
-            )
-            
-            return [
-                {
-                    'book_id': book_id,
-                    'score': float(info['score']),
-                    'reason': info['reason']
-                }
-                for book_id, info in sorted_recs[:n_recommendations]
-            ]
-            
+                    strategies = model_strategies(content_weight, collab_weight, augmented_weight)
+
+            context = RecommendationContext(self, user_id, n_recommendations, interactions, db=db)
+            blender = self._blender()
+            blender.extend(run_strategies(context, strategies))
+            blender.extend(extra_signals or [])
+            return blender.blend(n_recommendations)
+
         except Exception as e:
-            logger.error(f"Error getting base recommendations: {str(e)}")
+            logger.error(f"Error getting hybrid recommendations: {str(e)}")
             return []
 
+    def get_content_scores(
+        self,
+        user_id: int,
+        interactions: Optional[Dict[int, float]] = None
+    ) -> np.ndarray:
+        """
+        Content affinity of a user for every catalog book.
+
+        Sums the stored neighbour similarities of the books the user
+        interacted with, weighted by the interaction scores.
+        """
+        scores = np.zeros(len(self.book_ids), dtype=np.float32)
+        columns, totals = self.content_contributions(*self.user_history(user_id, interactions))
+        scores[columns] = totals
+        return scores
+
+    def user_history(
+        self,
+        user_id: int,
+        interactions: Optional[Dict[int, float]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Catalog rows and interaction scores of a user (stored, else `interactions`)."""
+        user_idx = self.user_index.get(user_id)
+        if user_idx is not None:
+            row = self.user_item_matrix[user_idx]
+            return row.indices, row.data
+        known = [
+            (self.book_index[book_id], score)
+            for book_id, score in (interactions or {}).items()
+            if book_id in self.book_index
+        ]
+        if not known:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        rows, weights = zip(*known)
+        return np.array(rows, dtype=np.int64), np.array(weights, dtype=np.float32)
+
+    def content_contributions(
+        self,
+        rows: np.ndarray,
+        weights: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Weighted neighbour similarities of the given books, summed per neighbour.
+
+        Returns (sorted catalog rows, totals); only touches len(rows) x k entries.
+        """
+        neighbor_indices = self.content_model.indices[rows]
+        contributions = self.content_model.scores[rows] * np.asarray(weights, dtype=np.float32)[:, None]
+        valid = neighbor_indices >= 0
+        columns, inverse = np.unique(neighbor_indices[valid], return_inverse=True)
+        totals = np.zeros(len(columns), dtype=np.float32)
+        np.add.at(totals, inverse, contributions[valid])
+        return columns.astype(np.int64), totals
+
+    def item_factor_index(self):
+        """
+        Inner-product index over the NMF item factors, built on first use.
+
+        Collaborative scores are user_factors . item_factors, so retrieval
+        ranks by the same dot product rather than by cosine.
+        """
+        if self._item_factor_index is None:
+            self._item_factor_index = build_index(
+                self.collaborative_model.components_.T, metric="inner_product"
+            )
+        return self._item_factor_index
+
+    def item_popularity(self) -> Optional[np.ndarray]:
+        """Number of stored interactions per catalog book."""
+        if self._item_popularity is None and self.user_item_matrix is not None:
+            self._item_popularity = np.bincount(
+                self.user_item_matrix.indices, minlength=len(self.book_ids)
+            ).astype(np.float32)
+        return self._item_popularity
+
     def get_similar_books(
         self,
         book_id: int,
-        n_recommendations: int = 10
+        n_recommendations: int = 10,
+        augmented_weight: float = 0.4
     ) -> List[Dict[str, Any]]:
         """Get similar books using both base and augmented models."""
         try:
-            # Get recommendations from both models
-            base_recs = self._get_base_similar_books(book_id, n_recommendations)
+            blender = self._blender()
+            book_idx = self.book_index.get(book_id)
+            if book_idx is not None and self.content_model is not None:
+                neighbor_indices, neighbor_scores = self.content_model.neighbors(
+                    book_idx, n_recommendations
+                )
+                blender.add(Signal(
+                    'content',
+                    neighbor_scores,
+                    1.0 - augmented_weight,
+                    f"Similar to {self.books_df['title'].iloc[book_idx]}",
+                    item_ids=self.book_ids[neighbor_indices].tolist()
+                ))
+
             augmented_recs = self.augmented_recommender.get_similar_books(
                 book_id, n_recommendations
             )
-
-            # Combine recommendations with weights
-            combined_recs = {}
-            for rec in base_recs:
-                book_id = rec['book_id']
-                combined_recs[book_id] = {
-                    'score': rec['score'] * 0.6,  # 60% weight to base model
-                    'reason': rec['reason']
-                }
-
-            for rec in augmented_recs:
-                book_id = rec['book_id']
-                if book_id in combined_recs:
-                    combined_recs[book_id]['score'] += rec['score'] * 0.4  # 40% weight to augmented model
-                else:
-                    combined_recs[book_id] = {
-                        'score': rec['score'] * 0.4,
-                        'reason': rec['reason']
-                    }
-
-            # Sort and return top recommendations
-            sorted_recs = sorted(
-                combined_recs.items(),
-                key=lambda x: x[1]['score'],
-                reverse=True
-            )
-
-            return [
-                {
-                    'book_id': book_id,
-                    'score': float(info['score']),
-                    'reason': info['reason']
-                }
-                for book_id, info in sorted_recs[:n_recommendations]
-            ]
+            self._add_recommendations(blender, 'augmented', augmented_recs, augmented_weight)
+            return blender.blend(n_recommendations, exclude=[book_id])
 
         except Exception as e:
             logger.error(f"Error getting similar books: {str(e)}")
             return []
 
-    def _get_base_similar_books(
-        self,
-        book_id: int,
-        n_recommendations: int = 10
-    ) -> List[Dict[str, Any]]:
-        """Get similar books from the base model."""
-        try:
-            if self.books_df is None:
-                return []
-
-            # Get book features
-            book_features = self.books_df[self.books_df['book_id'] == book_id]
-            if book_features.empty:
-                return []
-
-            # Calculate similarity with other books
-            similarities = cosine_similarity(
-                book_features.drop(['book_id', 'title'], axis=1),
-                self.books_df.drop(['book_id', 'title'], axis=1)
-            )[0]
-
-            # Get top similar books
-            similar_indices = np.argsort(similarities)[::-1][1:n_recommendations + 1]
-            similar_books = self.books_df.iloc[similar_indices]
-
-            return [
-                {
-                    'book_id': row['book_id'],
-                    'score': float(similarities[idx]),
-                    'reason': f"Similar to {book_features['title'].iloc[0]}"
-                }
-                for idx, row in similar_books.iterrows()
-            ]
-
-        except Exception as e:
-            logger.error(f"Error getting base similar books: {str(e)}")
-            return [] 
\ No newline at end of file
+    def get_also_borrowed(self, book_id: int, n_recommendations: int = 10) -> List[Dict[str, Any]]:
+        """Books other readers borrowed, bought or liked together with book_id."""
+        if self.cooccurrence is None:
+            return []
+        return [
+            {
+                'book_id': similar_id,
+                'score': score,
+                'reason': "Readers of this book also borrowed it"
+            }
+            for similar_id, score in self.cooccurrence.similar(book_id, n_recommendations)
+        ]
+
+    def _blender(self) -> ScoreBlender:
+        if self.book_ids is None:
+            return ScoreBlender([], {})
+        return ScoreBlender(self.book_ids, self.book_index)
+
+    @staticmethod
+    def _add_recommendations(
+        blender: ScoreBlender,
+        name: str,
+        recommendations: List[Dict[str, Any]],
+        weight: float
+    ) -> None:
+        """Blend a ranked list of {book_id, score, reason} dicts as one signal."""
+        if not recommendations:
+            return
+        blender.add(Signal(
+            name,
+            [rec['score'] for rec in recommendations],
+            weight,
+            recommendations[0]['reason'],
+            item_ids=[rec['book_id'] for rec in recommendations],
+            reasons=[rec['reason'] for rec in recommendations]
+        ))
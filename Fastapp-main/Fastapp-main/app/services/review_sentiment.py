@@ -0,0 +1,112 @@
+from typing import Any, Dict, List, Optional, Sequence
+import hashlib
+import logging
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.crud import reviews as crud_reviews
+from app.db.session import SessionLocal
+from app.models.reviews import BookReview
+from .sentiment_analyzer import (
+    current_sentiment_model_version, get_sentiment_analyzer, sentiment_interpretation
+)
+
+logger = logging.getLogger(__name__)
+
+def review_text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def polarity(scores: Dict[str, float]) -> float:
+    """Sentiment on a -1 (negative) to 1 (positive) scale."""
+    return float(scores.get("positive", 0.0) - scores.get("negative", 0.0))
+
+def get_review_sentiments(
+    db: Session,
+    reviews: Sequence[BookReview],
+    analyzer: Optional[Any] = None
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Sentiment of every review with text, keyed by review_id.
+
+    Stored results are returned as they are while their text hash matches
+    and their model version is that of the analyzer that would run (the
+    rule-based fallback while no model is installed); only missing or stale
+    ones go through the analyzer, in one batch, and are written back. The
+    shared analyzer is only loaded (when none is given) if some are.
+    """
+    reviews = [review for review in reviews if review.review_text]
+    stored = crud_reviews.get_review_sentiments(db, [review.review_id for review in reviews])
+
+    def split(version: str):
+        fresh, stale = {}, []
+        for review in reviews:
+            text_hash = review_text_hash(review.review_text)
+            row = stored.get(review.review_id)
+            if row is not None and row.text_hash == text_hash and row.model_version == version:
+                fresh[review.review_id] = {
+                    "sentiment": row.sentiment,
+                    "confidence": row.confidence,
+                    "scores": row.scores
+                }
+            else:
+                stale.append((review, text_hash))
+        return fresh, stale
+
+    version = analyzer.model_version if analyzer is not None else current_sentiment_model_version()
+    results, stale = split(version)
+    if stale and analyzer is None:
+        analyzer = get_sentiment_analyzer()
+        # e.g. a backend that fell back to torch when loaded
+        if analyzer.model_version != version:
+            results, stale = split(analyzer.model_version)
+
+    if stale:
+        sentiments = analyzer.analyze_batch([review.review_text for review, _ in stale])
+        rows = []
+        for (review, text_hash), sentiment in zip(stale, sentiments):
+            results[review.review_id] = sentiment
+            rows.append({
+                "review_id": review.review_id,
+                "text_hash": text_hash,
+                "model_version": analyzer.model_version,
+                "sentiment": sentiment["sentiment"],
+                "confidence": sentiment["confidence"],
+                "scores": sentiment["scores"]
+            })
+        try:
+            crud_reviews.save_review_sentiments(db, rows)
+        except Exception as e:
+            # The results are still good for this request
+            db.rollback()
+            logger.error(f"Error storing review sentiments: {str(e)}")
+    return results
+
+def refresh_review_sentiment(review_id: int, analyzer=None) -> None:
+    """
+    Compute and store one review's sentiment; run as a background task after
+    a write, so loading the shared analyzer never delays the response.
+    """
+    db = SessionLocal()
+    try:
+        review = crud_reviews.get_book_review(db, review_id)
+        if review is not None:
+            get_review_sentiments(db, [review], analyzer)
+    except Exception as e:
+        logger.error(f"Error refreshing sentiment of review {review_id}: {str(e)}")
+    finally:
+        db.close()
+
+def sentiment_stats(sentiments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Mean polarity and the number of reviews per interpretation."""
+    polarities = [polarity(sentiment["scores"]) for sentiment in sentiments]
+    distribution = {
+        label: 0 for label in ("Very Positive", "Positive", "Neutral", "Negative", "Very Negative")
+    }
+    for value in polarities:
+        distribution[sentiment_interpretation(value)] += 1
+    return {
+        "average_sentiment": float(np.mean(polarities)) if polarities else 0.0,
+        "sentiment_distribution": distribution,
+        "total_reviews": len(polarities)
+    }
@@ -1,76 +1,217 @@
-from typing import Dict, Any, List, Tuple
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+from typing import Dict, Any, List, Optional, Sequence, Tuple
 import numpy as np
 import logging
+import threading
 from pathlib import Path
 
+from app.core.config import settings
+
 logger = logging.getLogger(__name__)
 
+SENTIMENT_LABELS = ["negative", "neutral", "positive"]
+SENTIMENT_BACKENDS = ("torch", "quantized", "onnx")
+
+def sentiment_model_path() -> Path:
+    """The RoBERTa model directory, resolved against ML_MODELS_DIR when called."""
+    return Path(settings.ML_MODELS_DIR) / "roberta_model"
+
+def sentiment_model_version(backend: Optional[str] = None) -> str:
+    """
+    Version stamped on sentiments computed by `backend` (default
+    SENTIMENT_BACKEND). Backends score slightly differently, so each one,
+    and each ONNX graph, gets its own version.
+    """
+    backend = backend or settings.SENTIMENT_BACKEND
+    if backend == "onnx":
+        backend = f"onnx:{settings.SENTIMENT_ONNX_FILE}"
+    return f"{settings.SENTIMENT_MODEL_VERSION}+{backend}"
+
+def length_buckets(
+    lengths: Sequence[int],
+    batch_size: int,
+    max_batch_tokens: int
+) -> List[List[int]]:
+    """
+    Group text indices into batches of similar token length.
+
+    Texts are sorted by length, so padding each batch to its longest member
+    wastes little; a batch is closed at `batch_size` texts or when padding it
+    would exceed `max_batch_tokens`.
+    """
+    batches, batch, longest = [], [], 0
+    for idx in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        length = max(lengths[idx], 1)
+        if batch and (len(batch) >= batch_size or (len(batch) + 1) * max(longest, length) > max_batch_tokens):
+            batches.append(batch)
+            batch, longest = [], 0
+        batch.append(idx)
+        longest = max(longest, length)
+    if batch:
+        batches.append(batch)
+    return batches
+
+def sentiment_interpretation(score: float) -> str:
+    """Human-readable interpretation of a -1 to 1 sentiment score."""
+    if score >= 0.5:
+        return "Very Positive"
+    elif score >= 0.1:
+        return "Positive"
+    elif score >= -0.1:
+        return "Neutral"
+    elif score >= -0.5:
+        return "Negative"
+    else:
+        return "Very Negative"
+
 class SentimentAnalyzer:
-    def __init__(self):
+    """
+    RoBERTa sentiment classifier with a selectable CPU/GPU backend.
+
+    "torch" runs the full-precision model, "quantized" the same model with
+    its Linear layers dynamically quantized to int8, and "onnx" the graph
+    written by scripts/export_sentiment_onnx.py through onnxruntime. A
+    backend that cannot be loaded falls back to "torch"; `backend` holds the
+    one actually in use, and `model_version` names it, so results from
+    different backends are never reused as one another's.
+
+    torch and transformers are imported only when a model is loaded, so
+    importing this module (and the routers using it) stays cheap.
+    """
+
+    def __init__(self, backend: Optional[str] = None):
         self.model = None
+        self.session = None
         self.tokenizer = None
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        # Stored sentiments from another version are recomputed
+        self.model_version = "rule-based"
+        self.backend = backend or settings.SENTIMENT_BACKEND
+        if self.backend not in SENTIMENT_BACKENDS:
+            raise ValueError(f"Unknown sentiment backend {self.backend}, expected one of {SENTIMENT_BACKENDS}")
+        self.device = None
+        self.model_path = sentiment_model_path()
         self.load_model()
 
     def load_model(self) -> None:
-        """Load the RoBERTa model and tokenizer."""
+        """Load the tokenizer and the model for the configured backend."""
         try:
-            model_path = Path("ml_models/roberta_model")
-            if not model_path.exists():
+            if not self.model_path.exists():
                 logger.warning("RoBERTa model not found. Using default sentiment analysis.")
                 return
 
-            self.tokenizer = AutoTokenizer.from_pretrained(model_path)
-            self.model = AutoModelForSequenceClassification.from_pretrained(model_path)
-            self.model.to(self.device)
-            logger.info("Successfully loaded RoBERTa model")
+            import torch
+            from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+            if settings.SENTIMENT_NUM_THREADS:
+                torch.set_num_threads(settings.SENTIMENT_NUM_THREADS)
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+            if self.backend == "onnx" and not self._load_onnx():
+                self.backend = "torch"
+            # Quantized kernels and onnxruntime run on the CPU
+            use_cuda = torch.cuda.is_available() and self.backend == "torch"
+            self.device = torch.device("cuda" if use_cuda else "cpu")
+            if self.backend != "onnx":
+                model = AutoModelForSequenceClassification.from_pretrained(self.model_path)
+                model.eval()
+                if self.backend == "quantized":
+                    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+                self.model = model.to(self.device)
+            self.model_version = sentiment_model_version(self.backend)
+            logger.info(f"Successfully loaded RoBERTa model ({self.backend} backend)")
         except Exception as e:
             logger.error(f"Error loading RoBERTa model: {str(e)}")
             raise
 
+    def _load_onnx(self) -> bool:
+        onnx_path = self.model_path / settings.SENTIMENT_ONNX_FILE
+        try:
+            import onnxruntime
+        except ImportError:
+            logger.warning("onnxruntime is not installed, using the torch sentiment backend")
+            return False
+        if not onnx_path.exists():
+            logger.warning(f"{onnx_path} not found (see scripts/export_sentiment_onnx.py), using the torch sentiment backend")
+            return False
+
+        options = onnxruntime.SessionOptions()
+        if settings.SENTIMENT_NUM_THREADS:
+            options.intra_op_num_threads = settings.SENTIMENT_NUM_THREADS
+        self.session = onnxruntime.InferenceSession(
+            str(onnx_path), options, providers=["CPUExecutionProvider"]
+        )
+        return True
+
     def analyze_sentiment(self, text: str) -> Dict[str, Any]:
         """Analyze the sentiment of a given text using RoBERTa."""
-        try:
-            if not self.model or not self.tokenizer:
-                return self._default_sentiment_analysis(text)
+        return self.analyze_batch([text])[0]
 
-            # Tokenize and prepare input
-            inputs = self.tokenizer(
-                text,
-                return_tensors="pt",
-                truncation=True,
-                max_length=512,
-                padding=True
-            ).to(self.device)
+    def analyze_batch(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Analyze sentiment for a batch of texts.
 
-            # Get model predictions
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                predictions = torch.softmax(outputs.logits, dim=1)
-                sentiment_scores = predictions.cpu().numpy()[0]
+        Texts are tokenized once, grouped by token length, and each group is
+        padded to its own longest text and run in a single forward pass.
+        Results are returned in the order of `texts`.
+        """
+        if not texts:
+            return []
+        if (self.model is None and self.session is None) or self.tokenizer is None:
+            return [self._default_sentiment_analysis(text) for text in texts]
+
+        try:
+            encodings = self.tokenizer(
+                list(texts),
+                truncation=True,
+                max_length=settings.SENTIMENT_MAX_LENGTH
+            )
+            lengths = [len(input_ids) for input_ids in encodings["input_ids"]]
+            results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
 
-            # Map scores to sentiment labels
-            sentiment_labels = ["negative", "neutral", "positive"]
-            sentiment = sentiment_labels[np.argmax(sentiment_scores)]
-            confidence = float(np.max(sentiment_scores))
+            for batch in length_buckets(
+                lengths,
+                batch_size or settings.SENTIMENT_BATCH_SIZE,
+                settings.SENTIMENT_MAX_BATCH_TOKENS
+            ):
+                predictions = self._predict(
+                    {key: [encodings[key][idx] for idx in batch] for key in encodings.keys()}
+                )
+                for idx, sentiment_scores in zip(batch, predictions):
+                    results[idx] = self._result(sentiment_scores)
+            return results
 
-            return {
-                "sentiment": sentiment,
-                "confidence": confidence,
-                "scores": {
-                    label: float(score)
-                    for label, score in zip(sentiment_labels, sentiment_scores)
-                }
-            }
         except Exception as e:
             logger.error(f"Error analyzing sentiment: {str(e)}")
-            return self._default_sentiment_analysis(text)
+            return [self._default_sentiment_analysis(text) for text in texts]
+
+    def _predict(self, features: Dict[str, List[List[int]]]) -> np.ndarray:
+        """Class probabilities for one batch of tokenized texts, padded here."""
+        if self.session is not None:
+            inputs = self.tokenizer.pad(features, return_tensors="np")
+            logits = self.session.run(None, {
+                node.name: inputs[node.name].astype(np.int64) for node in self.session.get_inputs()
+            })[0]
+            exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+            return exp / exp.sum(axis=1, keepdims=True)
+
+        import torch
+        inputs = self.tokenizer.pad(features, return_tensors="pt").to(self.device)
+        with torch.inference_mode():
+            return torch.softmax(self.model(**inputs).logits, dim=1).cpu().numpy()
 
-    def analyze_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
-        """Analyze sentiment for a batch of texts."""
-        return [self.analyze_sentiment(text) for text in texts]
+    @staticmethod
+    def _result(sentiment_scores: np.ndarray) -> Dict[str, Any]:
+        """Map class probabilities to sentiment labels."""
+        return {
+            "sentiment": SENTIMENT_LABELS[int(np.argmax(sentiment_scores))],
+            "confidence": float(np.max(sentiment_scores)),
+            "scores": {
+                label: float(score)
+                for label, score in zip(SENTIMENT_LABELS, sentiment_scores)
+            }
+        }
 
     def _default_sentiment_analysis(self, text: str) -> Dict[str, Any]:
         """Fallback sentiment analysis when RoBERTa model is not available."""
@@ -106,28 +247,18 @@ class SentimentAnalyzer:
         """
         Convert a sentiment score to a human-readable interpretation.
         """
-        if score >= 0.5:
-            return "Very Positive"
-        elif score >= 0.1:
-            return "Positive"
-        elif score >= -0.1:
-            return "Neutral"
-        elif score >= -0.5:
-            return "Negative"
-        else:
-            return "Very Negative"
+        return sentiment_interpretation(score)
     
     def analyze_reviews(self, reviews: List[Tuple[int, str, str]]) -> List[Dict]:
         """
         Analyze a list of reviews and return sentiment analysis results.
         Each review should be a tuple of (review_id, book_title, review_text).
         """
+        reviews = [review for review in reviews if review[2]]
+        sentiments = self.analyze_batch([text for _, _, text in reviews])
+
         results = []
-        for review_id, book_title, text in reviews:
-            if not text:
-                continue
-            
-            sentiment = self.analyze_sentiment(text)
+        for (review_id, book_title, _), sentiment in zip(reviews, sentiments):
             interpretation = self.get_sentiment_interpretation(sentiment["confidence"])
             
             results.append({
@@ -191,4 +322,40 @@ class SentimentAnalyzer:
             "average_confidence": float(avg_confidence),
             "sentiment_stats": sentiment_stats,
             "interpretation": interpretation
-        } 
\ No newline at end of file
+        }
+
+# Shared by every request of this process, loaded on first use
+_shared_analyzer: Optional[SentimentAnalyzer] = None
+_shared_lock = threading.Lock()
+
+def get_sentiment_analyzer() -> SentimentAnalyzer:
+    """Dependency returning this process's sentiment analyzer, loading it once."""
+    global _shared_analyzer
+    if _shared_analyzer is None:
+        with _shared_lock:
+            if _shared_analyzer is None:
+                _shared_analyzer = SentimentAnalyzer()
+    return _shared_analyzer
+
+def current_sentiment_model_version() -> str:
+    """
+    Version of the results the shared analyzer produces, without loading it:
+    "rule-based" while no model is installed.
+    """
+    if _shared_analyzer is not None:
+        return _shared_analyzer.model_version
+    if not sentiment_model_path().exists():
+        return "rule-based"
+    return sentiment_model_version()
+
+def warmup_sentiment_analyzer() -> threading.Thread:
+    """Load the shared analyzer in the background, without delaying startup."""
+    def load():
+        try:
+            get_sentiment_analyzer()
+        except Exception as e:
+            logger.error(f"Error warming up sentiment model: {str(e)}")
+
+    thread = threading.Thread(target=load, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,255 @@
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import logging
+
+from app.core.config import settings
+from app.crud.recommendations import get_book_popularity, get_sql_strategy_scores
+from .blending import Signal
+from .recommendation_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Inputs that do not depend on the request (e.g. catalog popularity), shared
+# by every request of this process until they expire
+shared_inputs = LRUCache(maxsize=16, ttl=settings.SHARED_INPUT_TTL)
+
+class RecommendationContext:
+    """
+    Inputs of one recommendation request, each computed at most once.
+
+    Strategies declare the inputs they need in `requires` and read them with
+    `get`, so two strategies needing e.g. the user's history or catalog
+    popularity share a single query or computation. Inputs registered with
+    `shared=True` are also reused across requests for SHARED_INPUT_TTL.
+
+    `db` is the request's session; the recommender may be a shared instance
+    without one.
+    """
+
+    providers: Dict[str, Callable[["RecommendationContext"], Any]] = {}
+    shared: set = set()
+
+    def __init__(
+        self,
+        recommender,
+        user_id: int,
+        n_recommendations: int,
+        interactions: Optional[Dict[int, float]] = None,
+        db=None
+    ):
+        self.recommender = recommender
+        self.db = db if db is not None else recommender.db
+        self.user_id = user_id
+        self.n_recommendations = n_recommendations
+        self.interactions = interactions
+        self._values: Dict[str, Any] = {}
+
+    @classmethod
+    def provider(cls, name: str, shared: bool = False):
+        """Register the function computing input `name` from a context."""
+        def register(function: Callable[["RecommendationContext"], Any]):
+            cls.providers[name] = function
+            if shared:
+                cls.shared.add(name)
+            return function
+        return register
+
+    def get(self, name: str) -> Any:
+        if name not in self._values:
+            if name not in self.providers:
+                raise KeyError(f"No provider for recommendation input {name}")
+            if name in self.shared:
+                key = (name, self.recommender.version)
+                value = shared_inputs.get(key)
+                if value is None:
+                    value = self.providers[name](self)
+                    shared_inputs.set(key, value)
+            else:
+                value = self.providers[name](self)
+            self._values[name] = value
+        return self._values[name]
+
+@RecommendationContext.provider("history")
+def _history(context: RecommendationContext) -> Tuple[np.ndarray, np.ndarray]:
+    return context.recommender.user_history(context.user_id, context.interactions)
+
+@RecommendationContext.provider("user_features")
+def _user_features(context: RecommendationContext) -> Optional[np.ndarray]:
+    return context.recommender.get_user_factors(context.user_id, context.interactions)
+
+@RecommendationContext.provider("sql_scores")
+def _sql_scores(context: RecommendationContext) -> Dict[str, List[Tuple[int, float]]]:
+    # Every SQL-backed per-user strategy in one round-trip
+    return get_sql_strategy_scores(context.db, context.user_id, limit=settings.SQL_STRATEGY_LIMIT)
+
+@RecommendationContext.provider("popularity", shared=True)
+def _popularity(context: RecommendationContext) -> List[Tuple[int, float]]:
+    return get_book_popularity(context.db, limit=settings.SQL_STRATEGY_LIMIT)
+
+class ScoringStrategy(ABC):
+    """
+    One pluggable source of recommendation scores.
+
+    `requires` names the RecommendationContext inputs the strategy reads;
+    `score` returns a Signal for the blender, or None when the strategy has
+    nothing to say for this user.
+    """
+
+    name = "base"
+    reason = ""
+    requires: Tuple[str, ...] = ()
+
+    def __init__(self, weight: float):
+        self.weight = weight
+
+    @abstractmethod
+    def score(self, context: RecommendationContext) -> Optional[Signal]:
+        ...
+
+    def _sparse_signal(self, pairs: Sequence[Tuple[Any, float]]) -> Optional[Signal]:
+        if not pairs:
+            return None
+        item_ids, scores = zip(*pairs)
+        return Signal(self.name, scores, self.weight, self.reason, item_ids=list(item_ids))
+
+class ContentStrategy(ScoringStrategy):
+    """Stored content neighbours of the user's books (matrix-backed)."""
+
+    name = "content"
+    reason = "Based on book content similarity"
+    requires = ("history",)
+
+    def score(self, context):
+        recommender = context.recommender
+        if recommender.content_model is None:
+            return None
+        scores = np.zeros(len(recommender.book_ids), dtype=np.float32)
+        columns, totals = recommender.content_contributions(*context.get("history"))
+        scores[columns] = totals
+        return Signal(self.name, scores, self.weight, self.reason)
+
+class CollaborativeStrategy(ScoringStrategy):
+    """NMF user factors times item factors (matrix-backed)."""
+
+    name = "collaborative"
+    reason = "Based on similar users' preferences"
+    requires = ("user_features",)
+
+    def score(self, context):
+        user_features = context.get("user_features")
+        if user_features is None:
+            return None
+        return Signal(
+            self.name,
+            user_features @ context.recommender.collaborative_model.components_,
+            self.weight,
+            self.reason
+        )
+
+class AugmentedStrategy(ScoringStrategy):
+    """Recommendations of the augmented (file-backed) model."""
+
+    name = "augmented"
+
+    def score(self, context):
+        recommendations = context.recommender.augmented_recommender.get_user_recommendations(
+            context.user_id, context.n_recommendations
+        )
+        if not recommendations:
+            return None
+        return Signal(
+            self.name,
+            [rec['score'] for rec in recommendations],
+            self.weight,
+            recommendations[0]['reason'],
+            item_ids=[rec['book_id'] for rec in recommendations],
+            reasons=[rec['reason'] for rec in recommendations]
+        )
+
+class SimilarReadersStrategy(ScoringStrategy):
+    """Books liked by readers who liked the same books (SQL-backed)."""
+
+    name = "similar_readers"
+    reason = "Liked by readers with similar taste"
+    requires = ("sql_scores",)
+
+    def score(self, context):
+        return self._sparse_signal(context.get("sql_scores")[self.name])
+
+class CategoryStrategy(ScoringStrategy):
+    """Books sharing categories with the books the user liked (SQL-backed)."""
+
+    name = "category"
+    reason = "In categories you like"
+    requires = ("sql_scores",)
+
+    def score(self, context):
+        return self._sparse_signal(context.get("sql_scores")[self.name])
+
+class PopularityStrategy(ScoringStrategy):
+    """Catalog-wide popularity, shared across requests (SQL-backed)."""
+
+    name = "popularity"
+    reason = "Popular with readers"
+    requires = ("popularity",)
+
+    def score(self, context):
+        return self._sparse_signal(context.get("popularity"))
+
+def model_strategies(
+    content_weight: float = 0.4,
+    collab_weight: float = 0.6,
+    augmented_weight: float = 0.4
+) -> List[ScoringStrategy]:
+    """The trained-model blend: content and collaborative share 1 - augmented_weight."""
+    base_weight = 1.0 - augmented_weight
+    return [
+        ContentStrategy(base_weight * content_weight),
+        CollaborativeStrategy(base_weight * collab_weight),
+        AugmentedStrategy(augmented_weight)
+    ]
+
+def sql_strategies(
+    collab_weight: float = 0.4,
+    content_weight: float = 0.3,
+    popularity_weight: float = 0.3
+) -> List[ScoringStrategy]:
+    """Database-only blend for when no model has been trained yet."""
+    return [
+        SimilarReadersStrategy(collab_weight),
+        CategoryStrategy(content_weight),
+        PopularityStrategy(popularity_weight)
+    ]
+
+def run_strategies(
+    context: RecommendationContext,
+    strategies: Sequence[ScoringStrategy]
+) -> List[Signal]:
+    """
+    Score every strategy against one context.
+
+    The union of the strategies' `requires` is computed first, once per
+    input, so a failing input is logged once and only the strategies that
+    need it are skipped, as is any strategy whose scoring fails.
+    """
+    failed = set()
+    for name in dict.fromkeys(name for strategy in strategies for name in strategy.requires):
+        try:
+            context.get(name)
+        except Exception as e:
+            logger.error(f"Error computing recommendation input {name}: {str(e)}")
+            failed.add(name)
+
+    signals = []
+    for strategy in strategies:
+        if failed.intersection(strategy.requires):
+            continue
+        try:
+            signal = strategy.score(context)
+        except Exception as e:
+            logger.error(f"Error scoring {strategy.name} strategy: {str(e)}")
+            continue
+        if signal is not None:
+            signals.append(signal)
+    return signals
@@ -0,0 +1,99 @@
+from typing import Optional, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, vstack
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Below this many documents a process pool costs more than it saves
+PARALLEL_MIN_DOCUMENTS = 10000
+
+def build_content(books_df: pd.DataFrame) -> pd.Series:
+    """
+    Concatenate title, author, description and genres into one text per book.
+
+    Column-wise string operations instead of a per-row apply; missing fields
+    become empty strings.
+    """
+    def text(column: str) -> pd.Series:
+        if column not in books_df:
+            return pd.Series("", index=books_df.index)
+        return books_df[column].fillna("").astype(str)
+
+    if 'genres' in books_df:
+        genres = books_df['genres'].map(lambda g: " ".join(g) if isinstance(g, (list, tuple)) else "")
+    else:
+        genres = pd.Series("", index=books_df.index)
+    return text('title').str.cat([text('author'), text('description'), genres], sep=" ")
+
+def _hash_shard(args: Tuple[HashingVectorizer, Sequence[str]]) -> csr_matrix:
+    hasher, documents = args
+    return hasher.transform(documents)
+
+class ShardedTfidfVectorizer:
+    """
+    TF-IDF features whose tokenization runs on several processes.
+
+    Tokenizing and counting n-grams is the expensive part of TfidfVectorizer
+    and is inherently single-threaded. Here a stateless HashingVectorizer
+    counts each shard of documents independently, so shards can go to a
+    process pool. The counts are stacked, reduced to the max_features most
+    frequent hashed terms (like TfidfVectorizer's max_features), and
+    IDF-weighted and L2-normalised by TfidfTransformer.
+    """
+
+    def __init__(
+        self,
+        max_features: Optional[int] = 5000,
+        ngram_range: Tuple[int, int] = (1, 2),
+        stop_words: Optional[str] = 'english',
+        n_features: int = 2 ** 20,
+        n_jobs: int = 1,
+        shard_size: int = 2000
+    ):
+        self.max_features = max_features
+        self.n_jobs = n_jobs
+        self.shard_size = shard_size
+        self.hasher = HashingVectorizer(
+            n_features=n_features,
+            ngram_range=ngram_range,
+            stop_words=stop_words,
+            alternate_sign=False,
+            norm=None
+        )
+        self.columns = None
+        self.transformer = None
+
+    def fit_transform(self, documents: Sequence[str]) -> csr_matrix:
+        counts = self._count(documents)
+        term_counts = np.asarray(counts.sum(axis=0)).ravel()
+        columns = np.flatnonzero(term_counts)
+        if self.max_features is not None and len(columns) > self.max_features:
+            columns = columns[np.argsort(-term_counts[columns], kind="stable")[:self.max_features]]
+        self.columns = np.sort(columns)
+
+        counts = counts[:, self.columns]
+        self.transformer = TfidfTransformer()
+        return self.transformer.fit_transform(counts).tocsr()
+
+    def transform(self, documents: Sequence[str]) -> csr_matrix:
+        if self.transformer is None:
+            raise ValueError("Vectorizer is not fitted")
+        return self.transformer.transform(self._count(documents)[:, self.columns]).tocsr()
+
+    def _count(self, documents: Sequence[str]) -> csr_matrix:
+        documents = list(documents)
+        if self.n_jobs <= 1 or len(documents) < PARALLEL_MIN_DOCUMENTS:
+            return self.hasher.transform(documents).tocsr()
+
+        shards = [
+            (self.hasher, documents[start:start + self.shard_size])
+            for start in range(0, len(documents), self.shard_size)
+        ]
+        with ProcessPoolExecutor(max_workers=min(self.n_jobs, len(shards))) as pool:
+            counts = vstack(list(pool.map(_hash_shard, shards))).tocsr()
+        logger.info(f"Counted terms of {len(documents)} documents on {self.n_jobs} processes")
+        return counts
@@ -0,0 +1,83 @@
+from typing import Optional
+from datetime import datetime
+import logging
+
+from app.crud.books import get_books, get_books_created_since
+from app.crud.recommendations import get_activities_since, get_cooccurrence_events, get_training_job
+from app.db.session import SessionLocal, engine
+from .cooccurrence import CooccurrenceModel
+from .recommender import HybridRecommender
+
+logger = logging.getLogger(__name__)
+
+def init_training_process() -> None:
+    """Process pool initializer: never reuse connections inherited from the parent."""
+    engine.dispose(close=False)
+
+def run_training_job(job_id: int) -> Optional[int]:
+    """
+    Execute one queued training job and return the model version it saved.
+
+    Runs inside a worker process with its own session. The API processes pick
+    the new version up through ModelRegistry's version check.
+    """
+    db = SessionLocal()
+    try:
+        job = get_training_job(db, job_id)
+        if job is None:
+            raise ValueError(f"Training job {job_id} not found")
+
+        _refresh_cooccurrence(db, full=job.kind == "train")
+
+        recommender = HybridRecommender(db)
+        if job.kind == "update":
+            since = (job.payload or {}).get("since") or recommender.training_stats.get("updated_at")
+            if since is None or not recommender.is_trained:
+                logger.info("No incrementally updatable model, running a full retrain")
+                _train(db, recommender)
+            else:
+                since = datetime.fromisoformat(since)
+                # Taken before reading, so rows written meanwhile are in the next update
+                data_as_of = datetime.utcnow()
+                books = get_books_created_since(db, since=since)
+                activities = get_activities_since(db, since=since)
+                needs_refit = recommender.update(
+                    books=[book.__dict__ for book in books],
+                    user_activities=[activity.__dict__ for activity in activities],
+                    data_as_of=data_as_of
+                )
+                if needs_refit:
+                    logger.info("Model drift above threshold, retraining from scratch")
+                    _train(db, recommender)
+        elif job.kind == "train":
+            _train(db, recommender)
+        else:
+            raise ValueError(f"Unknown training job kind: {job.kind}")
+        return recommender.version
+    finally:
+        db.close()
+
+def _train(db, recommender: HybridRecommender) -> None:
+    data_as_of = datetime.utcnow()
+    books = get_books(db, skip=0, limit=None)
+    activities = get_activities_since(db)
+    recommender.train(
+        books=[book.__dict__ for book in books],
+        user_activities=[activity.__dict__ for activity in activities],
+        data_as_of=data_as_of
+    )
+
+def _refresh_cooccurrence(db, full: bool) -> None:
+    try:
+        started = datetime.utcnow()
+        model = None if full else CooccurrenceModel.load(db)
+        if model is None:
+            model = CooccurrenceModel.build(get_cooccurrence_events(db))
+        else:
+            since = datetime.fromisoformat(model.updated_at) if model.updated_at else None
+            added = model.add_events(get_cooccurrence_events(db, since=since))
+            logger.info(f"Added {added} events to the co-occurrence model")
+        model.updated_at = started.isoformat()
+        model.save(db)
+    except Exception as e:
+        logger.error(f"Error refreshing co-occurrence model: {str(e)}")
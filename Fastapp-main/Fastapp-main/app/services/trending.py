@@ -0,0 +1,235 @@
+from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+import heapq
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Relative weight of each event type in a book's trending score
+EVENT_WEIGHTS = {
+    "view": 1.0,
+    "favorite": 3.0,
+    "review": 2.0,
+    "borrow": 4.0,
+    "purchase": 5.0
+}
+
+# Rebase stored scores before exp() of the elapsed time gets this large
+MAX_EXPONENT = 50.0
+
+class TrendingEngine:
+    """
+    Streaming trending scores: every event adds its weight to the book's
+    score, and all scores decay exponentially with TRENDING_HALF_LIFE.
+
+    Scores are stored relative to a reference time (forward decay): an event
+    at time t adds weight * exp(rate * (t - reference)), so an update touches
+    only its own book and the ranking never changes as time passes without
+    events. A lazily cleaned max-heap answers top-k at any instant.
+
+    Each API process keeps its own engine, so live scores only reflect the
+    events served by that worker. Every TRENDING_CHECKPOINT_INTERVAL seconds
+    the events this process recorded are checkpointed to a file of its own;
+    on startup the checkpoints of all processes are summed.
+    """
+
+    def __init__(
+        self,
+        half_life: float = settings.TRENDING_HALF_LIFE,
+        checkpoint_path: Optional[Path] = None,
+        checkpoint_interval: float = settings.TRENDING_CHECKPOINT_INTERVAL
+    ):
+        self.rate = math.log(2) / half_life
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.reference: Optional[float] = None
+        self.scores: Dict[int, float] = {}
+        # Events recorded by this process only, in the same units as `scores`
+        self.recorded: Dict[int, float] = {}
+        self.instance_id = uuid.uuid4().hex[:12]
+        self._heap: List[Tuple[float, int]] = []
+        self._lock = threading.Lock()
+        self._last_checkpoint = time.monotonic()
+        self._checkpointing = False
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def record(
+        self,
+        book_id: int,
+        event: str = "view",
+        weight: Optional[float] = None,
+        at: Optional[float] = None
+    ) -> None:
+        """Add one event (Unix time `at`, default now) to the book's score."""
+        weight = EVENT_WEIGHTS.get(event, 1.0) if weight is None else weight
+        if weight <= 0:
+            return
+        at = time.time() if at is None else at
+        with self._lock:
+            if self.reference is None:
+                self.reference = at
+            exponent = self.rate * (at - self.reference)
+            if exponent > MAX_EXPONENT:
+                self._rebase(at)
+                exponent = 0.0
+            increment = weight * math.exp(exponent)
+            value = self.scores.get(book_id, 0.0) + increment
+            self.scores[book_id] = value
+            self.recorded[book_id] = self.recorded.get(book_id, 0.0) + increment
+            heapq.heappush(self._heap, (-value, book_id))
+            # Every update leaves a stale heap entry behind
+            if len(self._heap) > 2 * len(self.scores) + 1024:
+                self._heap = [(-value, book_id) for book_id, value in self.scores.items()]
+                heapq.heapify(self._heap)
+        self.maybe_checkpoint()
+
+    def retract(self, book_id: int, event: str = "favorite", at: Optional[float] = None) -> None:
+        """
+        Undo one event (e.g. an unfavorite) by subtracting its weight at `at`.
+        A favorite undone right away nets to zero; an older one takes away at
+        most the book's current score, so toggling never inflates it.
+        """
+        at = time.time() if at is None else at
+        with self._lock:
+            if book_id not in self.scores:
+                return
+            decrement = EVENT_WEIGHTS.get(event, 1.0) * math.exp(self.rate * (at - self.reference))
+            value = max(self.scores[book_id] - decrement, 0.0)
+            self.recorded[book_id] = self.recorded.get(book_id, 0.0) - (self.scores[book_id] - value)
+            if value > 0:
+                self.scores[book_id] = value
+                heapq.heappush(self._heap, (-value, book_id))
+            else:
+                del self.scores[book_id]
+        self.maybe_checkpoint()
+
+    def score(self, book_id: int, at: Optional[float] = None) -> float:
+        """Decayed score of one book at `at` (default now)."""
+        with self._lock:
+            return self.scores.get(book_id, 0.0) * self._decay(at)
+
+    def top(self, k: int = 10, at: Optional[float] = None) -> List[Tuple[int, float]]:
+        """The k highest-scoring books as (book_id, decayed score) pairs."""
+        with self._lock:
+            found = []
+            seen = set()
+            while self._heap and len(found) < k:
+                entry = heapq.heappop(self._heap)
+                # A retraction can bring a score back to an older value; keep one entry per book
+                if self.scores.get(entry[1]) == -entry[0] and entry[1] not in seen:
+                    found.append(entry)
+                    seen.add(entry[1])
+            for entry in found:
+                heapq.heappush(self._heap, entry)
+            decay = self._decay(at)
+        return [(book_id, -value * decay) for value, book_id in found]
+
+    def _decay(self, at: Optional[float]) -> float:
+        if self.reference is None:
+            return 0.0
+        at = time.time() if at is None else at
+        return math.exp(-self.rate * (at - self.reference))
+
+    def _rebase(self, at: float) -> None:
+        """Move the reference time to `at`, dropping books that decayed to nothing."""
+        factor = math.exp(-self.rate * (at - self.reference))
+        self.scores = {
+            book_id: value * factor for book_id, value in self.scores.items() if value * factor > 1e-6
+        }
+        self.recorded = {
+            book_id: value * factor for book_id, value in self.recorded.items() if abs(value * factor) > 1e-6
+        }
+        self.reference = at
+        self._heap = [(-value, book_id) for book_id, value in self.scores.items()]
+        heapq.heapify(self._heap)
+
+    def _path(self) -> Path:
+        """This process's checkpoint, e.g. trending_checkpoint.<instance id>.json."""
+        base = Path(self.checkpoint_path or settings.ML_MODELS_DIR / "trending_checkpoint.json")
+        return base.with_name(f"{base.stem}.{self.instance_id}{base.suffix}")
+
+    def _checkpoint_paths(self) -> List[Path]:
+        """The checkpoints of every process, this one's included."""
+        base = Path(self.checkpoint_path or settings.ML_MODELS_DIR / "trending_checkpoint.json")
+        return sorted(base.parent.glob(f"{base.stem}.*{base.suffix}"))
+
+    def maybe_checkpoint(self) -> None:
+        """Write a checkpoint in the background if the interval has passed."""
+        if self._checkpointing or time.monotonic() - self._last_checkpoint < self.checkpoint_interval:
+            return
+        self._checkpointing = True
+        self._last_checkpoint = time.monotonic()
+        threading.Thread(target=self._background_save, daemon=True).start()
+
+    def _background_save(self) -> None:
+        try:
+            self.save()
+        except Exception as e:
+            logger.error(f"Error checkpointing trending scores: {str(e)}")
+        finally:
+            self._checkpointing = False
+
+    def save(self) -> None:
+        """Checkpoint the events recorded by this process."""
+        with self._lock:
+            state = {"rate": self.rate, "reference": self.reference, "scores": dict(self.recorded)}
+        if state["reference"] is None:
+            return
+        path = self._path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # A temporary file of its own, so concurrent checkpoints never share one
+        with tempfile.NamedTemporaryFile("w", dir=path.parent, suffix=".tmp", delete=False) as f:
+            json.dump(state, f)
+        os.replace(f.name, path)
+
+    def restore(self) -> bool:
+        """
+        Load the sum of every process's last checkpoint; returns False if
+        there is none. Checkpoints that decayed to nothing are deleted.
+        """
+        states = []
+        now = time.time()
+        for path in self._checkpoint_paths():
+            try:
+                if now - path.stat().st_mtime > 20 * math.log(2) / self.rate:
+                    path.unlink()
+                    continue
+                with open(path) as f:
+                    state = json.load(f)
+                if not math.isclose(state["rate"], self.rate):
+                    logger.warning(f"TRENDING_HALF_LIFE changed, ignoring trending checkpoint {path.name}")
+                    continue
+                states.append(state)
+            except Exception as e:
+                logger.error(f"Error restoring trending checkpoint {path.name}: {str(e)}")
+        if not states:
+            return False
+
+        # Sum the states at the latest reference time
+        reference = max(state["reference"] for state in states)
+        scores: Dict[int, float] = {}
+        for state in states:
+            factor = math.exp(-self.rate * (reference - state["reference"]))
+            for book_id, value in state["scores"].items():
+                scores[int(book_id)] = scores.get(int(book_id), 0.0) + value * factor
+        with self._lock:
+            self.reference = reference
+            self.scores = {book_id: value for book_id, value in scores.items() if value > 1e-6}
+            self.recorded = {}
+            self._heap = [(-value, book_id) for book_id, value in self.scores.items()]
+            heapq.heapify(self._heap)
+        logger.info(f"Restored trending scores for {len(self.scores)} books from {len(states)} checkpoints")
+        return True
+
+trending_engine = TrendingEngine()
@@ -0,0 +1,83 @@
+from typing import Hashable, List, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+import logging
+
+logger = logging.getLogger(__name__)
+
+class UserHistoryIndex:
+    """
+    Load-time index over a long-format ratings table (user_id, book_id, rating).
+
+    Ratings are held in a users x books CSR matrix with user_id -> row and
+    book column -> book_id maps, so reading one user's history touches a
+    single row. A second CSR keeps only ratings at or above liked_threshold,
+    which makes "books liked by these users" a sparse row sum.
+    """
+
+    def __init__(
+        self,
+        user_ids: List[Hashable],
+        book_ids: np.ndarray,
+        ratings: csr_matrix,
+        liked_threshold: float = 4
+    ):
+        self.user_ids = user_ids
+        self.book_ids = book_ids
+        self.user_rows = {user_id: row for row, user_id in enumerate(user_ids)}
+        self.ratings = ratings
+        self.liked_threshold = liked_threshold
+
+        liked = ratings.copy()
+        liked.data[liked.data < liked_threshold] = 0
+        liked.eliminate_zeros()
+        self.liked = liked
+
+    @classmethod
+    def from_ratings(cls, ratings_df: pd.DataFrame, liked_threshold: float = 4) -> "UserHistoryIndex":
+        users = ratings_df['user_id'].astype('category')
+        books = ratings_df['book_id'].astype('category')
+        ratings = csr_matrix(
+            (
+                ratings_df['rating'].to_numpy(dtype=np.float32),
+                (users.cat.codes.to_numpy(), books.cat.codes.to_numpy())
+            ),
+            shape=(len(users.cat.categories), len(books.cat.categories))
+        )
+        # Repeated (user, book) rows are summed by the constructor; keep the latest instead
+        if ratings.nnz != len(ratings_df):
+            deduped = ratings_df.drop_duplicates(['user_id', 'book_id'], keep='last')
+            return cls.from_ratings(deduped, liked_threshold)
+
+        logger.info(f"Indexed {ratings.nnz} ratings from {ratings.shape[0]} users")
+        return cls(
+            users.cat.categories.tolist(),
+            books.cat.categories.to_numpy(),
+            ratings,
+            liked_threshold
+        )
+
+    def __contains__(self, user_id: Hashable) -> bool:
+        return user_id in self.user_rows
+
+    def history(self, user_id: Hashable) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (book_ids, ratings) for one user; empty arrays for unknown users."""
+        row = self.user_rows.get(user_id)
+        if row is None:
+            return self.book_ids[:0], np.empty(0, dtype=np.float32)
+        start, stop = self.ratings.indptr[row], self.ratings.indptr[row + 1]
+        return self.book_ids[self.ratings.indices[start:stop]], self.ratings.data[start:stop]
+
+    def liked_totals(self, user_ids: Sequence[Hashable]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sum the liked ratings of several users per book.
+
+        Returns (book_columns, totals) for books at least one of them liked.
+        """
+        rows = [self.user_rows[user_id] for user_id in user_ids if user_id in self.user_rows]
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        totals = np.asarray(self.liked[rows].sum(axis=0)).ravel()
+        columns = np.flatnonzero(totals)
+        return columns, totals[columns]
@@ -0,0 +1,239 @@
+from typing import Dict, Any, Optional, Tuple
+import numpy as np
+import logging
+import time
+
+from app.core.config import settings
+from .neighbors import top_k
+
+logger = logging.getLogger(__name__)
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+class ExactIndex:
+    """
+    Brute-force cosine search over all vectors.
+
+    Queries are scored one block at a time so a large batch never
+    materialises the full (n_queries x n_vectors) score matrix.
+    """
+
+    def __init__(self, block_size: int = 1024):
+        self.block_size = block_size
+        self.vectors = None
+
+    def __len__(self) -> int:
+        return 0 if self.vectors is None else self.vectors.shape[0]
+
+    def fit(self, vectors: np.ndarray) -> "ExactIndex":
+        self.vectors = _normalize(vectors)
+        return self
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (indices, scores) of the k most similar vectors per query row."""
+        queries = _normalize(np.atleast_2d(queries))
+        k = min(k, len(self))
+        indices = np.empty((len(queries), k), dtype=np.int64)
+        scores = np.empty((len(queries), k), dtype=np.float32)
+        for start in range(0, len(queries), self.block_size):
+            stop = start + self.block_size
+            indices[start:stop], scores[start:stop] = top_k(queries[start:stop] @ self.vectors.T, k)
+        return indices, scores
+
+class IVFIndex:
+    """
+    Inverted-file approximate cosine search in pure NumPy.
+
+    Vectors are partitioned into n_lists clusters with spherical k-means.
+    A query is compared against the centroids first and then only against the
+    members of its n_probe closest clusters. That is roughly
+    n_probe / n_lists of the collection, instead of all of it.
+    """
+
+    def __init__(
+        self,
+        n_lists: Optional[int] = None,
+        n_probe: int = 8,
+        n_iter: int = 10,
+        max_train_points: int = 256,
+        random_state: int = 42
+    ):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.max_train_points = max_train_points
+        self.random_state = random_state
+        self.vectors = None
+        self.centroids = None
+        self.list_members = None
+        self.list_offsets = None
+
+    def __len__(self) -> int:
+        return 0 if self.vectors is None else self.vectors.shape[0]
+
+    def fit(self, vectors: np.ndarray) -> "IVFIndex":
+        self.vectors = _normalize(vectors)
+        n_vectors = len(self.vectors)
+        n_lists = self.n_lists or max(1, int(np.sqrt(n_vectors)))
+        n_lists = min(n_lists, n_vectors)
+
+        rng = np.random.default_rng(self.random_state)
+        sample_size = min(n_vectors, n_lists * self.max_train_points)
+        sample = self.vectors[rng.choice(n_vectors, sample_size, replace=False)]
+        self.centroids = self._train_centroids(sample, n_lists, rng)
+
+        assignments = self._assign(self.vectors)
+        self.list_members = np.argsort(assignments, kind="stable")
+        self.list_offsets = np.searchsorted(
+            assignments[self.list_members], np.arange(n_lists + 1)
+        )
+        logger.info(f"Built IVF index over {n_vectors} vectors with {n_lists} lists")
+        return self
+
+    def _train_centroids(self, sample: np.ndarray, n_lists: int, rng) -> np.ndarray:
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(self.n_iter):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            counts = np.bincount(assignments, minlength=n_lists)
+
+            # Re-seed clusters that lost all their points
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = _normalize(sums)
+        return centroids
+
+    def _assign(self, vectors: np.ndarray, block_size: int = 4096) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), block_size):
+            block = vectors[start:start + block_size]
+            assignments[start:start + block_size] = np.argmax(block @ self.centroids.T, axis=1)
+        return assignments
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        n_probe: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (indices, scores) of approximately the k most similar vectors.
+
+        Rows are padded with index -1 when the probed lists hold fewer than k vectors.
+        """
+        queries = _normalize(np.atleast_2d(queries))
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        probes, _ = top_k(queries @ self.centroids.T, n_probe)
+
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.zeros((len(queries), k), dtype=np.float32)
+        for row, (query, lists) in enumerate(zip(queries, probes)):
+            candidates = np.concatenate([
+                self.list_members[self.list_offsets[l]:self.list_offsets[l + 1]]
+                for l in lists
+            ])
+            best, best_scores = top_k(self.vectors[candidates] @ query, k)
+            indices[row, :len(best)] = candidates[best]
+            scores[row, :len(best)] = best_scores
+        return indices, scores
+
+class InnerProductIndex:
+    """
+    Maximum inner product search on top of a cosine index.
+
+    Every vector v gets one extra coordinate sqrt(M^2 - |v|^2), where M is the
+    largest norm in the collection, and queries get a 0 there. All augmented
+    vectors then have norm M, so their cosine with a query q is q.v / (|q| M)
+    and ranks exactly like the inner product. Scores are returned as q.v.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.max_norm = 0.0
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def fit(self, vectors: np.ndarray) -> "InnerProductIndex":
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1)
+        self.max_norm = float(norms.max()) if len(norms) else 0.0
+        padding = np.sqrt(np.clip(self.max_norm ** 2 - norms ** 2, 0.0, None))
+        self.index.fit(np.hstack([vectors, padding[:, None]]))
+        return self
+
+    def search(self, queries: np.ndarray, k: int, **search_kwargs) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (indices, inner products) of the k best vectors per query row."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        padded = np.hstack([queries, np.zeros((len(queries), 1), dtype=np.float32)])
+        indices, scores = self.index.search(padded, k, **search_kwargs)
+        scale = np.linalg.norm(queries, axis=1, keepdims=True) * self.max_norm
+        return indices, scores * scale
+
+def build_index(vectors: np.ndarray, kind: Optional[str] = None, metric: str = "cosine"):
+    """
+    Build the configured vector index.
+
+    Collections smaller than VECTOR_INDEX_MIN_SIZE always use the exact index,
+    where a linear scan is already cheaper than probing clusters. With
+    metric="inner_product" the index ranks by dot product instead of cosine.
+    """
+    kind = kind or settings.VECTOR_INDEX
+    if kind not in ("ivf", "exact"):
+        raise ValueError(f"Unknown vector index type: {kind}")
+    if metric not in ("cosine", "inner_product"):
+        raise ValueError(f"Unknown vector index metric: {metric}")
+
+    if kind == "ivf" and len(vectors) >= settings.VECTOR_INDEX_MIN_SIZE:
+        index = IVFIndex(n_probe=settings.VECTOR_INDEX_PROBES)
+    else:
+        index = ExactIndex()
+    if metric == "inner_product":
+        index = InnerProductIndex(index)
+    return index.fit(vectors)
+
+def benchmark_index(
+    index,
+    queries: np.ndarray,
+    k: int = 10,
+    exact: Optional[ExactIndex] = None,
+    **search_kwargs
+) -> Dict[str, Any]:
+    """
+    Measure recall@k against exact search, plus single-query and batch latency.
+
+    `exact` defaults to a brute-force index over the same vectors.
+    """
+    exact = exact or ExactIndex().fit(index.vectors)
+    expected, _ = exact.search(queries, k)
+
+    latencies = []
+    found = []
+    for query in queries:
+        start = time.perf_counter()
+        indices, _ = index.search(query, k, **search_kwargs)
+        latencies.append(time.perf_counter() - start)
+        found.append(indices[0])
+
+    start = time.perf_counter()
+    index.search(queries, k, **search_kwargs)
+    batch_seconds = time.perf_counter() - start
+
+    hits = sum(
+        len(np.intersect1d(result[result >= 0], truth))
+        for result, truth in zip(found, expected)
+    )
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "recall_at_k": hits / float(expected.size) if expected.size else 0.0,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "batch_queries_per_second": len(queries) / batch_seconds if batch_seconds else float("inf")
+    }
@@ -0,0 +1,127 @@
+"""
+Training worker: runs queued recommender training jobs outside the API.
+
+Start with `python -m app.worker`. Jobs are claimed from the training_jobs
+table and trained on a process pool, so training never competes with
+request handling for the API's CPU or GIL. The worker also seeds and
+prunes the book_popularity rollup behind /trending/.
+"""
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import timedelta
+from typing import Dict
+import logging
+import signal
+import time
+
+from app.core.config import settings
+from app.crud.recommendations import (
+    claim_training_job,
+    fail_stale_training_jobs,
+    finish_training_job,
+    prune_book_popularity,
+    rebuild_book_popularity
+)
+from app.models.recommendations import BookPopularity
+from app.db.session import SessionLocal, engine
+from app.models import Base
+from app.services.training import init_training_process, run_training_job
+
+logger = logging.getLogger(__name__)
+
+class TrainingWorker:
+    def __init__(
+        self,
+        max_workers: int = settings.TRAINING_WORKERS,
+        poll_interval: float = settings.TRAINING_POLL_INTERVAL
+    ):
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.running: Dict[int, Future] = {}
+        self._stopping = False
+        self._last_prune = 0.0
+
+    def stop(self, *args) -> None:
+        logger.info("Stopping training worker after running jobs finish")
+        self._stopping = True
+
+    def run(self) -> None:
+        db = SessionLocal()
+        try:
+            stale = fail_stale_training_jobs(
+                db, older_than=timedelta(seconds=settings.TRAINING_JOB_TIMEOUT)
+            )
+            if stale:
+                logger.warning(f"Marked {stale} abandoned training jobs as failed")
+            if db.query(BookPopularity).first() is None:
+                logger.info(f"Seeded popularity rollup with {rebuild_book_popularity(db)} buckets")
+        finally:
+            db.close()
+
+        with ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=init_training_process
+        ) as pool:
+            logger.info(f"Training worker started with {self.max_workers} processes")
+            while not self._stopping or self.running:
+                self._collect()
+                if not self._stopping:
+                    self._submit(pool)
+                self._prune_popularity()
+                time.sleep(self.poll_interval)
+
+    def _prune_popularity(self) -> None:
+        # Expired buckets only slow down trending reads; hourly is plenty
+        if time.monotonic() - self._last_prune < 3600:
+            return
+        self._last_prune = time.monotonic()
+        db = SessionLocal()
+        try:
+            deleted = prune_book_popularity(db)
+            if deleted:
+                logger.info(f"Pruned {deleted} expired popularity buckets")
+        except Exception as e:
+            logger.error(f"Error pruning popularity buckets: {str(e)}")
+        finally:
+            db.close()
+
+    def _submit(self, pool: ProcessPoolExecutor) -> None:
+        db = SessionLocal()
+        try:
+            while len(self.running) < self.max_workers:
+                job = claim_training_job(db)
+                if job is None:
+                    return
+                logger.info(f"Starting training job {job.id} ({job.kind} {job.model_name})")
+                self.running[job.id] = pool.submit(run_training_job, job.id)
+        finally:
+            db.close()
+
+    def _collect(self) -> None:
+        finished = [job_id for job_id, future in self.running.items() if future.done()]
+        if not finished:
+            return
+        db = SessionLocal()
+        try:
+            for job_id in finished:
+                future = self.running.pop(job_id)
+                try:
+                    version = future.result()
+                    finish_training_job(db, job_id, model_version=version)
+                    logger.info(f"Training job {job_id} finished with model version {version}")
+                except Exception as e:
+                    logger.error(f"Training job {job_id} failed: {str(e)}")
+                    finish_training_job(db, job_id, error=str(e))
+        finally:
+            db.close()
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine)
+
+    worker = TrainingWorker()
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+# Allow running as `python scripts/backfill_review_sentiment.py` from the project root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.sentiment_analyzer import sentiment_model_version
+
+# Set up logging with rotation
+from logging.handlers import RotatingFileHandler
+
+# Create logs directory if it doesn't exist
+Path('logs').mkdir(exist_ok=True)
+
+# Set up logging with rotation (10MB max size, keep 5 backup files)
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        RotatingFileHandler('logs/backfill_sentiment.log', maxBytes=10*1024*1024, backupCount=5),
+        logging.StreamHandler()
+    ]
+)
+
+# Database connection parameters
+DB_PARAMS = {
+    'dbname': settings.POSTGRES_DB,
+    'user': settings.POSTGRES_USER,
+    'password': settings.POSTGRES_PASSWORD,
+    'host': settings.POSTGRES_HOST,
+    'port': settings.POSTGRES_PORT
+}
+
+CHECKPOINT_FILE = 'logs/sentiment_backfill_checkpoint.json'
+
+# Reviews with text, after the checkpoint, optionally only those without an up-to-date stored sentiment
+SELECT_REVIEWS = """
+    SELECT r.review_id, r.review_text
+    FROM book_reviews r
+    LEFT JOIN review_sentiments s ON s.review_id = r.review_id
+    WHERE r.review_id > %(after)s
+      AND r.review_text IS NOT NULL AND r.review_text <> ''
+      AND (%(recompute)s
+           OR s.review_id IS NULL
+           OR s.model_version <> %(model_version)s
+           OR s.text_hash <> encode(sha256(convert_to(r.review_text, 'UTF8')), 'hex'))
+    ORDER BY r.review_id
+"""
+
+UPSERT_SENTIMENTS = """
+    INSERT INTO review_sentiments (review_id, text_hash, model_version, sentiment, confidence, scores)
+    VALUES %s
+    ON CONFLICT (review_id) DO UPDATE
+    SET text_hash = EXCLUDED.text_hash,
+        model_version = EXCLUDED.model_version,
+        sentiment = EXCLUDED.sentiment,
+        confidence = EXCLUDED.confidence,
+        scores = EXCLUDED.scores,
+        updated_at = now()
+"""
+
+# One analyzer per worker process, loaded by the pool initializer
+_analyzer = None
+
+def init_worker(num_threads: int):
+    """Load this worker's copy of the model, limited to `num_threads` intra-op threads."""
+    global _analyzer
+    settings.SENTIMENT_NUM_THREADS = num_threads
+    from app.services.sentiment_analyzer import SentimentAnalyzer
+    _analyzer = SentimentAnalyzer()
+
+def analyze_batch(batch: List[Tuple[int, str]]) -> List[Tuple]:
+    """Sentiment rows for `batch`, ready for UPSERT_SENTIMENTS."""
+    from app.services.review_sentiment import review_text_hash
+    sentiments = _analyzer.analyze_batch([text for _, text in batch])
+    return [
+        (
+            review_id,
+            review_text_hash(text),
+            _analyzer.model_version,
+            sentiment["sentiment"],
+            sentiment["confidence"],
+            json.dumps(sentiment["scores"])
+        )
+        for (review_id, text), sentiment in zip(batch, sentiments)
+    ]
+
+def load_checkpoint() -> int:
+    """Load the last review_id written by a previous run of the same model version"""
+    if os.path.exists(CHECKPOINT_FILE):
+        try:
+            with open(CHECKPOINT_FILE) as f:
+                checkpoint = json.load(f)
+            if checkpoint["model_version"] == sentiment_model_version():
+                return checkpoint["last_review_id"]
+            logging.info("Checkpoint is from another model version, starting from the first review")
+        except Exception as e:
+            logging.warning(f"Failed to load checkpoint: {e}")
+    return 0
+
+def save_checkpoint(review_id: int):
+    """Save the last review_id whose sentiment (and every earlier one's) is written"""
+    try:
+        temporary = CHECKPOINT_FILE + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({"last_review_id": review_id, "model_version": sentiment_model_version()}, f)
+        os.replace(temporary, CHECKPOINT_FILE)
+    except Exception as e:
+        logging.error(f"Failed to save checkpoint: {e}")
+
+def verify_database_connection():
+    """Verify database connection and required tables exist"""
+    try:
+        conn = psycopg2.connect(**DB_PARAMS)
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT table_name
+                FROM information_schema.tables
+                WHERE table_schema = 'public'
+                AND table_name IN ('book_reviews', 'review_sentiments')
+            """)
+            missing_tables = {'book_reviews', 'review_sentiments'} - {row[0] for row in cur.fetchall()}
+            if missing_tables:
+                raise Exception(f"Missing required tables: {missing_tables}")
+        logging.info("Database connection and tables verified successfully")
+        return conn
+    except Exception as e:
+        logging.error(f"Database verification failed: {e}")
+        raise
+
+def read_batches(
+    conn,
+    after: int,
+    recompute: bool,
+    batch_size: int,
+    limit: Optional[int]
+) -> Iterator[List[Tuple[int, str]]]:
+    """Stream reviews in review_id order through a server-side cursor."""
+    with conn.cursor(name='sentiment_backfill') as cur:
+        cur.itersize = batch_size * 4
+        cur.execute(SELECT_REVIEWS, {
+            'after': after,
+            'recompute': recompute,
+            'model_version': sentiment_model_version()
+        })
+        remaining = limit
+        while remaining is None or remaining > 0:
+            rows = cur.fetchmany(batch_size if remaining is None else min(batch_size, remaining))
+            if not rows:
+                break
+            if remaining is not None:
+                remaining -= len(rows)
+            yield rows
+
+def backfill(
+    workers: int,
+    threads_per_worker: int,
+    batch_size: int,
+    recompute: bool = False,
+    restart: bool = False,
+    limit: Optional[int] = None,
+    progress_interval: float = 10.0
+):
+    """Compute and store the sentiment of every review that lacks an up-to-date one"""
+    start_time = time.time()
+    read_conn = verify_database_connection()
+    write_conn = psycopg2.connect(**DB_PARAMS)
+    after = 0 if restart else load_checkpoint()
+    if after:
+        logging.info(f"Resuming after review {after}")
+
+    processed = 0
+    last_progress_update = start_time
+    # Batches in flight; bounds memory to a few batches per worker
+    pending = deque()
+
+    def write_oldest():
+        nonlocal processed, last_progress_update
+        last_review_id, future = pending.popleft()
+        rows = future.result()
+        with write_conn.cursor() as cur:
+            execute_values(cur, UPSERT_SENTIMENTS, rows, template="(%s, %s, %s, %s, %s, %s::json)")
+        write_conn.commit()
+        # Batches are written in review_id order, so everything up to here is done
+        save_checkpoint(last_review_id)
+        processed += len(rows)
+
+        current_time = time.time()
+        if current_time - last_progress_update >= progress_interval:
+            elapsed = current_time - start_time
+            logging.info(
+                f"Processed: {processed} | "
+                f"Last review: {last_review_id} | "
+                f"Speed: {processed / elapsed:.1f} rows/s"
+            )
+            last_progress_update = current_time
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker,
+            initargs=(threads_per_worker,)
+        ) as executor:
+            for batch in read_batches(read_conn, after, recompute, batch_size, limit):
+                pending.append((batch[-1][0], executor.submit(analyze_batch, batch)))
+                if len(pending) >= 2 * workers:
+                    write_oldest()
+            while pending:
+                write_oldest()
+
+        total_time = time.time() - start_time
+        logging.info(f"""
+Backfill completed:
+- Total rows processed: {processed}
+- Workers: {workers} x {threads_per_worker} threads
+- Total time: {total_time:.2f}s
+- Average speed: {processed / total_time:.2f} rows/second
+        """)
+
+    except Exception as e:
+        logging.error(f"Fatal error during backfill: {e}")
+        write_conn.rollback()
+        raise
+    finally:
+        read_conn.close()
+        write_conn.close()
+        logging.info("Database connections closed")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute and store sentiment for all book reviews")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes, each holding one copy of the model")
+    parser.add_argument("--threads-per-worker", type=int, default=1,
+                        help="Torch threads per worker; workers x threads should match the cores")
+    parser.add_argument("--batch-size", type=int, default=256, help="Reviews per worker task")
+    parser.add_argument("--recompute", action="store_true",
+                        help="Recompute reviews whose stored sentiment is up to date")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from the first review")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many reviews (test runs)")
+    args = parser.parse_args()
+
+    backfill(
+        args.workers,
+        args.threads_per_worker,
+        args.batch_size,
+        recompute=args.recompute,
+        restart=args.restart,
+        limit=args.limit
+    )
+
+if __name__ == "__main__":
+    main()
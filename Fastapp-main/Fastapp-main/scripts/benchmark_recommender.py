@@ -0,0 +1,110 @@
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Allow running as `python scripts/benchmark_recommender.py` from the project root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.db.session import Base
+from app.services.evaluation import (
+    make_synthetic_catalog, peak_rss_mb, precision_recall_at_k, split_by_user, time_calls
+)
+
+def print_latency(name: str, report: dict) -> None:
+    print(f"{name:<24}{report['calls']:>8}{report['p50_ms']:>10.2f}{report['p95_ms']:>10.2f}"
+          f"{report['p99_ms']:>10.2f}{report['max_ms']:>10.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Training time, serving latency and accuracy of the hybrid recommender")
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--interactions", type=int, default=20, help="Mean interactions per user")
+    parser.add_argument("--genres", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200, help="Timed calls per serving path")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--test-fraction", type=float, default=0.2)
+    parser.add_argument("--eval-users", type=int, default=1000, help="Users scored for precision/recall")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # Keep the benchmark's models and rows away from the real ones
+    workdir = Path(tempfile.mkdtemp(prefix="recommender-benchmark-"))
+    settings.ML_MODELS_DIR = workdir
+    settings.MODEL_DIR = workdir / "artifacts"
+    engine = create_engine(f"sqlite:///{workdir / 'benchmark.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    # The augmented model is not trained here; one warning per call would drown the report
+    logging.getLogger("app.services.augmented_recommender").setLevel(logging.ERROR)
+
+    # Imported after the settings override so the model directories apply
+    from app.services.recommender import HybridRecommender
+
+    start = time.perf_counter()
+    books, activities = make_synthetic_catalog(
+        args.books, args.users, args.interactions, args.genres, seed=args.seed
+    )
+    train_activities, held_out = split_by_user(activities, args.test_fraction, seed=args.seed)
+    print(f"{args.books} books, {args.users} users, {len(activities)} interactions "
+          f"({len(train_activities)} train), generated in {time.perf_counter() - start:.2f}s")
+
+    recommender = HybridRecommender(db)
+    start = time.perf_counter()
+    recommender.train(books, train_activities)
+    print(f"train: {time.perf_counter() - start:.2f}s, peak RSS {peak_rss_mb():.0f} MB")
+
+    rng = np.random.default_rng(args.seed + 1)
+    user_ids = [int(user_id) for user_id in rng.choice(args.users, args.queries)]
+    book_ids = [int(book_id) for book_id in rng.choice(args.books, args.queries)]
+
+    print(f"{'path':<24}{'calls':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    print_latency("hybrid", time_calls(
+        lambda user_id: recommender.get_hybrid_recommendations(user_id, args.k), user_ids
+    ))
+    print_latency("collaborative", time_calls(
+        lambda user_id: recommender.get_collaborative_recommendations(user_id, args.k), user_ids
+    ))
+    print_latency("similar_books", time_calls(
+        lambda book_id: recommender.get_similar_books(book_id, args.k), book_ids
+    ))
+    batches = [
+        list(range(offset, min(offset + args.batch_size, args.users)))
+        for offset in range(0, args.users, args.batch_size)
+    ]
+    start = time.perf_counter()
+    batch_report = time_calls(lambda batch: recommender.recommend_batch(batch, args.k), batches)
+    print_latency(f"batch/{args.batch_size}", batch_report)
+    print(f"batch throughput: {args.users / (time.perf_counter() - start):.0f} users/s")
+
+    eval_users = list(held_out)[:args.eval_users]
+    relevant = {user_id: held_out[user_id] for user_id in eval_users}
+    rankings = {
+        "hybrid": {
+            user_id: [rec['book_id'] for rec in recommender.get_hybrid_recommendations(user_id, args.k)]
+            for user_id in eval_users
+        },
+        "collaborative": {
+            user_id: [book_id for book_id, _ in recs]
+            for user_id, recs in recommender.recommend_batch(eval_users, args.k).items()
+        }
+    }
+    print(f"{'model':<24}{f'precision@{args.k}':>14}{f'recall@{args.k}':>12}")
+    for name, recommended in rankings.items():
+        metrics = precision_recall_at_k(recommended, relevant, args.k)
+        print(f"{name:<24}{metrics[f'precision@{args.k}']:>14.4f}{metrics[f'recall@{args.k}']:>12.4f}")
+    print(f"peak RSS: {peak_rss_mb():.0f} MB")
+    db.close()
+
+if __name__ == "__main__":
+    main()
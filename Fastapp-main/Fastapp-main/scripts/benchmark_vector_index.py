@@ -0,0 +1,53 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Allow running as `python scripts/benchmark_vector_index.py` from the project root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.vector_index import ExactIndex, IVFIndex, benchmark_index
+
+def make_vectors(n_vectors: int, dim: int, n_clusters: int, seed: int) -> np.ndarray:
+    """Clustered random vectors, closer to real embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim))
+    labels = rng.integers(0, n_clusters, size=n_vectors)
+    return (centers[labels] + 0.3 * rng.normal(size=(n_vectors, dim))).astype(np.float32)
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs latency of the vector indexes")
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--lists", type=int, default=None, help="IVF lists (default sqrt(n))")
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.vectors, args.dim, max(1, args.vectors // 500), args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+
+    exact = ExactIndex().fit(vectors)
+    start = time.perf_counter()
+    ivf = IVFIndex(n_lists=args.lists).fit(vectors)
+    build_seconds = time.perf_counter() - start
+    print(f"{args.vectors} vectors x {args.dim} dims, IVF build {build_seconds:.2f}s "
+          f"({len(ivf.centroids)} lists)")
+
+    print(f"{'index':<12}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'batch q/s':>12}")
+    rows = [("exact", exact, {})] + [
+        (f"ivf/{probe}", ivf, {"n_probe": probe}) for probe in args.probes
+    ]
+    for name, index, kwargs in rows:
+        report = benchmark_index(index, queries, k=args.k, exact=exact, **kwargs)
+        print(f"{name:<12}{report['recall_at_k']:>10.3f}{report['p50_ms']:>10.2f}"
+              f"{report['p95_ms']:>10.2f}{report['p99_ms']:>10.2f}"
+              f"{report['batch_queries_per_second']:>12.0f}")
+
+if __name__ == "__main__":
+    main()
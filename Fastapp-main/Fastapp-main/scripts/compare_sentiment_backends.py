@@ -0,0 +1,93 @@
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Allow running as `python scripts/compare_sentiment_backends.py` from the project root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.evaluation import time_calls
+from app.services.sentiment_analyzer import SENTIMENT_BACKENDS, SENTIMENT_LABELS, SentimentAnalyzer
+
+def rating_label(rating: float) -> str:
+    """Star rating as a sentiment label: 1-2 negative, 3 neutral, 4-5 positive."""
+    if rating >= 4:
+        return "positive"
+    if rating <= 2:
+        return "negative"
+    return "neutral"
+
+def load_texts(texts_file: Optional[str], limit: int) -> Tuple[List[str], Optional[List[str]]]:
+    """(texts, labels from the star ratings or None) from a file or the book_reviews table."""
+    if texts_file:
+        with open(texts_file) as f:
+            return [line.strip() for line in f if line.strip()][:limit], None
+
+    from app.db.session import SessionLocal
+    from app.models.reviews import BookReview
+
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(BookReview.review_text, BookReview.rating)
+            .filter(BookReview.review_text.isnot(None), BookReview.review_text != "")
+            .order_by(BookReview.review_id)
+            .limit(limit)
+            .all()
+        )
+    finally:
+        db.close()
+    return [text for text, _ in rows], [rating_label(float(rating)) for _, rating in rows]
+
+def score_matrix(results: List[dict]) -> np.ndarray:
+    return np.array([[result["scores"][label] for label in SENTIMENT_LABELS] for result in results])
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy and latency of the sentiment inference backends")
+    parser.add_argument("--backends", nargs="+", choices=SENTIMENT_BACKENDS, default=list(SENTIMENT_BACKENDS),
+                        help="The first one is the reference for agreement")
+    parser.add_argument("--texts-file", default=None,
+                        help="One text per line; defaults to reviews from the database, labelled by rating")
+    parser.add_argument("--limit", type=int, default=1000, help="Texts scored per backend")
+    parser.add_argument("--queries", type=int, default=100, help="Timed single-text calls per backend")
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    texts, labels = load_texts(args.texts_file, args.limit)
+    if not texts:
+        sys.exit("No texts to score")
+    print(f"{len(texts)} texts, mean length {np.mean([len(text) for text in texts]):.0f} characters")
+
+    reference = None
+    print(f"{'backend':<12}{'load s':>8}{'p50 ms':>10}{'p95 ms':>10}{'texts/s':>10}"
+          f"{'agree':>8}{'max diff':>10}{'rating acc':>12}")
+    for backend in args.backends:
+        start = time.perf_counter()
+        analyzer = SentimentAnalyzer(backend=backend)
+        load_seconds = time.perf_counter() - start
+        if analyzer.model_version == "rule-based":
+            sys.exit(f"No sentiment model in {analyzer.model_path}")
+        if analyzer.backend != backend:
+            print(f"{backend:<12}unavailable, fell back to {analyzer.backend}")
+            continue
+
+        single = time_calls(analyzer.analyze_sentiment, texts[:args.queries])
+        start = time.perf_counter()
+        results = analyzer.analyze_batch(texts, args.batch_size)
+        throughput = len(texts) / (time.perf_counter() - start)
+
+        predicted = [result["sentiment"] for result in results]
+        scores = score_matrix(results)
+        if reference is None:
+            reference = (predicted, scores)
+        agreement = np.mean([a == b for a, b in zip(predicted, reference[0])])
+        max_diff = np.abs(scores - reference[1]).max()
+        accuracy = f"{np.mean([a == b for a, b in zip(predicted, labels)]):>12.4f}" if labels else f"{'-':>12}"
+        print(f"{backend:<12}{load_seconds:>8.1f}{single['p50_ms']:>10.2f}{single['p95_ms']:>10.2f}"
+              f"{throughput:>10.1f}{agreement:>8.4f}{max_diff:>10.4f}{accuracy}")
+
+if __name__ == "__main__":
+    main()
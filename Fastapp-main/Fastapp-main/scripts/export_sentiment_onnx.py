@@ -0,0 +1,86 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+# Allow running as `python scripts/export_sentiment_onnx.py` from the project root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.sentiment_analyzer import sentiment_model_path
+
+SAMPLE_TEXTS = [
+    "A wonderful book, I could not put it down.",
+    "Dull plot and flat characters; I gave up halfway through the second part."
+]
+
+def export(model_dir: Path, output: Path, opset: int) -> None:
+    """Write the sentiment model as an ONNX graph with dynamic batch and sequence axes."""
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    # Plain tuple outputs trace cleanly
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir, return_dict=False)
+    model.eval()
+
+    inputs = tokenizer(SAMPLE_TEXTS, padding=True, return_tensors="pt")
+    dynamic_axes = {
+        "input_ids": {0: "batch", 1: "sequence"},
+        "attention_mask": {0: "batch", 1: "sequence"},
+        "logits": {0: "batch"}
+    }
+    with torch.inference_mode():
+        torch.onnx.export(
+            model,
+            (inputs["input_ids"], inputs["attention_mask"]),
+            str(output),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset
+        )
+        expected = model(inputs["input_ids"], attention_mask=inputs["attention_mask"])[0].numpy()
+    print(f"Exported {output} ({output.stat().st_size / 1e6:.0f} MB)")
+
+    try:
+        import onnxruntime
+    except ImportError:
+        print("onnxruntime is not installed, skipping the output check")
+        return
+    session = onnxruntime.InferenceSession(str(output), providers=["CPUExecutionProvider"])
+    logits = session.run(None, {
+        "input_ids": inputs["input_ids"].numpy(),
+        "attention_mask": inputs["attention_mask"].numpy()
+    })[0]
+    print(f"Max logit difference to torch: {np.abs(logits - expected).max():.2e}")
+
+def quantize(output: Path) -> Path:
+    """Write an int8 dynamically quantized copy of the exported graph."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized = output.with_name(f"{output.stem}.int8.onnx")
+    quantize_dynamic(str(output), str(quantized), weight_type=QuantType.QInt8)
+    print(f"Quantized {quantized} ({quantized.stat().st_size / 1e6:.0f} MB); "
+          f"set SENTIMENT_ONNX_FILE={quantized.name} to serve it")
+    return quantized
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the RoBERTa sentiment model for the onnx backend")
+    parser.add_argument("--model-dir", type=Path, default=sentiment_model_path(),
+                        help="Defaults to roberta_model in ML_MODELS_DIR")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="Defaults to SENTIMENT_ONNX_FILE in the model directory")
+    parser.add_argument("--opset", type=int, default=14)
+    parser.add_argument("--quantize", action="store_true",
+                        help="Also write an int8 quantized graph (needs onnxruntime)")
+    args = parser.parse_args()
+
+    output = args.output or args.model_dir / settings.SENTIMENT_ONNX_FILE
+    export(args.model_dir, output, args.opset)
+    if args.quantize:
+        quantize(output)
+
+if __name__ == "__main__":
+    main()
@@ -34,5 +34,9 @@ setup(
         "ml": [
             "scikit-surprise>=1.1.3",
         ],
+        "onnx": [
+            "onnx>=1.15.0",
+            "onnxruntime>=1.17.0",
+        ],
     },
 ) 
\ No newline at end of file
@@ -23,4 +23,101 @@ def db():
     finally:
         db.close()
         # Drop all tables after the test
-        Base.metadata.drop_all(bind=engine) 
\ No newline at end of file
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(autouse=True)
+def ml_models_dir(tmp_path, monkeypatch):
+    # Keep model files written by tests out of the repository's ml_models/
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "ML_MODELS_DIR", tmp_path)
+    monkeypatch.setattr(settings, "MODEL_DIR", tmp_path / "artifacts")
+    return tmp_path
+
+@pytest.fixture
+def add_books(db):
+    # e.g. add_books({1: ["Fiction"], 2: ["Fiction", "History"]}); categories are shared by name
+    from app.models.books import Book, Category
+    categories = {}
+
+    def add(books):
+        db.add_all([
+            Book(
+                book_id=book_id,
+                title=f"Book {book_id}",
+                author="A",
+                categories=[categories.setdefault(name, Category(name=name)) for name in names]
+            )
+            for book_id, names in books.items()
+        ])
+        db.commit()
+    return add
+
+@pytest.fixture
+def add_users(db):
+    from app.models.users import User
+
+    def add(user_ids):
+        db.add_all([User(id=user_id, username=f"u{user_id}", email=f"u{user_id}@x.org") for user_id in user_ids])
+        db.commit()
+    return add
+
+@pytest.fixture
+def add_reviews(db):
+    # (user_id, book_id, rating) triples
+    from app.models.reviews import BookReview
+
+    def add(reviews):
+        db.add_all([BookReview(user_id=user_id, book_id=book_id, rating=rating) for user_id, book_id, rating in reviews])
+        db.commit()
+    return add
+
+@pytest.fixture
+def sample_books():
+    return [
+        {
+            "book_id": 1,
+            "title": "The Great Gatsby",
+            "author": "F. Scott Fitzgerald",
+            "description": "A story of the fabulously wealthy Jay Gatsby",
+            "genres": ["Fiction", "Classic"]
+        },
+        {
+            "book_id": 2,
+            "title": "1984",
+            "author": "George Orwell",
+            "description": "A dystopian social science fiction novel",
+            "genres": ["Fiction", "Dystopian"]
+        },
+        {
+            "book_id": 3,
+            "title": "To Kill a Mockingbird",
+            "author": "Harper Lee",
+            "description": "The story of racial injustice and the loss of innocence",
+            "genres": ["Fiction", "Classic"]
+        }
+    ]
+
+@pytest.fixture
+def sample_activities():
+    return [
+        {
+            "user_id": 1,
+            "book_id": 1,
+            "interaction_score": 1.0
+        },
+        {
+            "user_id": 1,
+            "book_id": 2,
+            "interaction_score": 0.8
+        },
+        {
+            "user_id": 2,
+            "book_id": 1,
+            "interaction_score": 0.9
+        },
+        {
+            "user_id": 2,
+            "book_id": 3,
+            "interaction_score": 0.7
+        }
+    ]
@@ -0,0 +1,59 @@
+import numpy as np
+from app.services.recommendation_cache import LRUCache, RecommendationCache, RedisCache
+
+def test_recommendation_cache_invalidation():
+    """Test that cached lists are reused until the user or the model changes"""
+    cache = RecommendationCache(LRUCache(maxsize=2, ttl=60))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return [{"book_id": 1, "score": 1.0, "reason": "test"}]
+
+    cache.personalized(1, model_version=1, n_recommendations=5, compute=compute)
+    cache.personalized(1, model_version=1, n_recommendations=5, compute=compute)
+    assert len(calls) == 1
+
+    cache.invalidate_user(1)
+    cache.personalized(1, model_version=1, n_recommendations=5, compute=compute)
+    cache.personalized(1, model_version=2, n_recommendations=5, compute=compute)
+    assert len(calls) == 3
+    assert len(cache.local) == 2  # the oldest entry was evicted
+
+    # Empty results (errors) are not cached
+    cache.similar(1, model_version=2, n_recommendations=5, compute=list)
+    assert len(cache.local) == 2
+
+def test_redis_cache_round_trip():
+    """Test the shared backend stores numpy ids and shares invalidations"""
+    class FakeRedis:
+        def __init__(self):
+            self.values = {}
+
+        def get(self, key):
+            return self.values.get(key)
+
+        def set(self, key, value, ex=None):
+            self.values[key] = value.encode() if isinstance(value, str) else value
+
+        def incr(self, key):
+            self.values[key] = str(int(self.values.get(key) or 0) + 1).encode()
+            return int(self.values[key])
+
+    shared = RedisCache("redis://unused", ttl=60, client=FakeRedis())
+    recommendations = [{"book_id": np.int64(7), "score": np.float32(0.5), "reason": "Similar to A"}]
+    first = RecommendationCache(LRUCache(maxsize=10, ttl=60), shared)
+    first.similar(1, model_version=1, n_recommendations=5, compute=lambda: recommendations)
+
+    # Another process reads the same entry from the shared backend
+    second = RecommendationCache(LRUCache(maxsize=10, ttl=60), shared)
+    cached = second.similar(1, model_version=1, n_recommendations=5, compute=list)
+    assert cached == [{"book_id": 7, "score": 0.5, "reason": "Similar to A"}]
+    assert type(cached[0]["book_id"]) is int
+
+    calls = []
+    compute = lambda: calls.append(1) or [{"book_id": 1, "score": 1.0, "reason": "test"}]
+    second.personalized(3, model_version=1, n_recommendations=5, compute=compute)
+    first.invalidate_user(3)
+    second.personalized(3, model_version=1, n_recommendations=5, compute=compute)
+    assert len(calls) == 2
@@ -0,0 +1,19 @@
+from sqlalchemy.orm import Session
+from app.crud import recommendations as crud_recommendations
+from app.services.cold_start import ColdStartRecommender, is_cold_start
+
+def test_cold_start_recommendations(db: Session, add_books, add_users, add_reviews):
+    """Test favorite-genre popularity for new users with the overall fallback"""
+    add_books({1: ["Fantasy"], 2: ["Fantasy"], 3: ["Poetry"], 4: ["Fantasy"]})
+    add_users([1, 2, 3])
+    add_reviews([(1, 1, 5), (2, 1, 5), (1, 2, 4), (2, 3, 5), (3, 3, 5), (1, 3, 5)])
+
+    assert is_cold_start(len(crud_recommendations.get_user_book_ids(db, 3)))
+    cold_start = ColdStartRecommender()
+    recommendations = cold_start.recommend(db, ["fantasy"], n_recommendations=3, exclude={2})
+    assert [rec['book_id'] for rec in recommendations] == [1, 3]
+    assert recommendations[0]['reason'] == "Popular in fantasy"
+    assert recommendations[1]['reason'] == "Popular with readers"
+
+    # Unknown genres fall back to overall popularity
+    assert [rec['book_id'] for rec in cold_start.recommend(db, ["Horror"], n_recommendations=2)] == [3, 1]
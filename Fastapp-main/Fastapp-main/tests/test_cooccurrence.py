@@ -0,0 +1,44 @@
+import numpy as np
+from sqlalchemy.orm import Session
+from app.crud import recommendations as crud_recommendations
+from app.models.reviews import BookReview
+from app.models.user_activities import UserActivity
+from app.services.cooccurrence import CooccurrenceModel
+
+def test_cooccurrence_incremental_matches_full_build(db: Session):
+    """Test sparse co-occurrence counts, incremental updates and the event query"""
+    events = [(1, 10), (1, 20), (2, 10), (2, 20), (2, 30), (3, 30), (3, 40), (4, 10), (4, 40), (5, 10), (5, 40)]
+    full = CooccurrenceModel.build(events, k=2)
+    incremental = CooccurrenceModel.build(events[:4], k=2)
+    assert incremental.add_events(events[4:] + [(1, 10)]) == 7  # repeats are ignored
+
+    # Same AᵀA as a brute-force product over the final interactions
+    order = [incremental.book_index[book_id] for book_id in full.book_ids]
+    assert np.array_equal(incremental.counts.toarray()[np.ix_(order, order)], full.counts.toarray())
+    dense = full.interactions.toarray()
+    assert np.array_equal(full.counts.toarray(), dense.T @ dense)
+
+    assert [book_id for book_id, _ in full.similar(10)] == [20, 40]
+    assert incremental.similar(10) == full.similar(10)
+
+    db.add_all([
+        UserActivity(user_id=1, book_id=10, activity_type="view"),
+        BookReview(user_id=2, book_id=20, rating=5),
+        BookReview(user_id=3, book_id=30, rating=2)
+    ])
+    db.commit()
+    assert sorted(crud_recommendations.get_cooccurrence_events(db)) == [(1, 10), (2, 20)]
+
+def test_registry_serves_a_newer_cooccurrence_model(db: Session):
+    """Test that the registry polls the co-occurrence version alongside the hybrid model"""
+    from app.services.model_registry import ModelRegistry
+
+    registry = ModelRegistry(refresh_interval=0)
+    recommender = registry.get_recommender(db)
+    assert recommender.get_also_borrowed(10) == []
+
+    CooccurrenceModel.build([(1, 10), (1, 20)], k=2).save(db)
+    served = registry.get_recommender(db)
+    assert served is not recommender
+    assert [book_id for book_id, _ in served.cooccurrence.similar(10)] == [20]
+    assert recommender.cooccurrence is None  # in-flight requests keep their instance
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+from app.services.neighbors import ContentNeighborIndex
+from app.services.text_features import ShardedTfidfVectorizer, build_content
+from app.services.vector_index import ExactIndex, InnerProductIndex, IVFIndex, benchmark_index
+
+def test_content_neighbor_index_matches_brute_force(sample_books):
+    """Test blocked top-k neighbours against the full similarity matrix"""
+    contents = [
+        f"{book['title']} {book['author']} {book['description']} {' '.join(book['genres'])}"
+        for book in sample_books
+    ]
+    matrix = TfidfVectorizer().fit_transform(contents)
+    index = ContentNeighborIndex.build(matrix, k=2, block_size=1)
+
+    similarities = cosine_similarity(matrix)
+    np.fill_diagonal(similarities, -1)
+    for row in range(len(sample_books)):
+        indices, scores = index.neighbors(row)
+        assert row not in indices
+        assert indices[0] == np.argmax(similarities[row])
+        assert np.allclose(scores, similarities[row, indices], atol=1e-6)
+
+def test_sharded_tfidf_and_parallel_index_match_serial(sample_books):
+    """Test that the hashed TF-IDF and the process-pool index build match the serial path"""
+    contents = build_content(pd.DataFrame(sample_books))
+    assert contents[0] == "The Great Gatsby F. Scott Fitzgerald A story of the fabulously wealthy Jay Gatsby Fiction Classic"
+
+    hashed = ShardedTfidfVectorizer().fit_transform(contents)
+    exact = TfidfVectorizer(max_features=5000, stop_words='english', ngram_range=(1, 2)).fit_transform(contents)
+    assert np.allclose((hashed @ hashed.T).toarray(), (exact @ exact.T).toarray(), atol=1e-6)
+
+    serial = ContentNeighborIndex.build(hashed, k=2)
+    parallel = ContentNeighborIndex.build(hashed, k=2, block_size=1, n_jobs=2)
+    assert np.array_equal(serial.indices, parallel.indices)
+    assert np.allclose(serial.scores, parallel.scores)
+
+def test_extend_rebuilds_a_clamped_index(sample_books):
+    """Test that extending an index narrowed by a tiny catalog restores the requested k"""
+    matrix = TfidfVectorizer().fit_transform(build_content(pd.DataFrame(sample_books)))
+    single = ContentNeighborIndex.build(matrix[:1], k=2)
+    assert single.k == 0
+
+    extended = single.extend(matrix, 1, k=2, block_size=1)
+    rebuilt = ContentNeighborIndex.build(matrix, k=2)
+    assert extended.k == 2
+    assert np.array_equal(extended.indices, rebuilt.indices)
+
+def test_ivf_index_recall():
+    """Test that the approximate index finds most exact neighbours"""
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(20, 16))
+    vectors = centers[rng.integers(0, 20, size=2000)] + 0.1 * rng.normal(size=(2000, 16))
+
+    exact = ExactIndex().fit(vectors)
+    indices, scores = exact.search(vectors[:5], k=3)
+    assert list(indices[:, 0]) == list(range(5))
+    assert np.allclose(scores[:, 0], 1.0, atol=1e-5)
+
+    ivf = IVFIndex(n_lists=20, n_probe=3).fit(vectors)
+    report = benchmark_index(ivf, vectors[:50], k=10, exact=exact)
+    assert report["recall_at_k"] >= 0.9
+
+def test_inner_product_index_ranks_by_dot_product():
+    """Test that the MIPS augmentation finds the largest dot products, not the closest angles"""
+    rng = np.random.default_rng(1)
+    vectors = rng.random((200, 8)) * rng.random((200, 1)) * 5
+    queries = rng.random((5, 8))
+
+    index = InnerProductIndex(ExactIndex()).fit(vectors)
+    indices, scores = index.search(queries, k=5)
+    dots = queries @ vectors.T
+    assert np.array_equal(indices, np.argsort(-dots, axis=1)[:, :5])
+    assert np.allclose(scores, np.take_along_axis(dots, indices, axis=1), rtol=1e-4)
@@ -1,57 +1,10 @@
 import pytest
 from sqlalchemy.orm import Session
+from app.core.config import settings
 from app.services.recommender import HybridRecommender
 from app.crud import books as crud_books
 from app.crud import recommendations as crud_recommendations
 
-# Sample test data
-SAMPLE_BOOKS = [
-    {
-        "book_id": 1,
-        "title": "The Great Gatsby",
-        "author": "F. Scott Fitzgerald",
-        "description": "A story of the fabulously wealthy Jay Gatsby",
-        "genres": ["Fiction", "Classic"]
-    },
-    {
-        "book_id": 2,
-        "title": "1984",
-        "author": "George Orwell",
-        "description": "A dystopian social science fiction novel",
-        "genres": ["Fiction", "Dystopian"]
-    },
-    {
-        "book_id": 3,
-        "title": "To Kill a Mockingbird",
-        "author": "Harper Lee",
-        "description": "The story of racial injustice and the loss of innocence",
-        "genres": ["Fiction", "Classic"]
-    }
-]
-
-SAMPLE_ACTIVITIES = [
-    {
-        "user_id": 1,
-        "book_id": 1,
-        "interaction_score": 1.0
-    },
-    {
-        "user_id": 1,
-        "book_id": 2,
-        "interaction_score": 0.8
-    },
-    {
-        "user_id": 2,
-        "book_id": 1,
-        "interaction_score": 0.9
-    },
-    {
-        "user_id": 2,
-        "book_id": 3,
-        "interaction_score": 0.7
-    }
-]
-
 def test_recommender_initialization(db: Session):
     """Test recommender initialization"""
     recommender = HybridRecommender(db)
@@ -61,10 +14,10 @@ def test_recommender_initialization(db: Session):
     assert recommender.user_item_matrix is None
     assert recommender.vectorizer is None
 
-def test_recommender_training(db: Session):
+def test_recommender_training(db: Session, sample_books, sample_activities):
     """Test recommender training"""
     recommender = HybridRecommender(db)
-    recommender.train(SAMPLE_BOOKS, SAMPLE_ACTIVITIES)
+    recommender.train(sample_books, sample_activities)
     
     assert recommender.content_model is not None
     assert recommender.collaborative_model is not None
@@ -72,30 +25,30 @@ def test_recommender_training(db: Session):
     assert recommender.user_item_matrix is not None
     assert recommender.vectorizer is not None
 
-def test_content_recommendations(db: Session):
+def test_content_recommendations(db: Session, sample_books, sample_activities):
     """Test content-based recommendations"""
     recommender = HybridRecommender(db)
-    recommender.train(SAMPLE_BOOKS, SAMPLE_ACTIVITIES)
+    recommender.train(sample_books, sample_activities)
     
     recommendations = recommender.get_content_recommendations(book_id=1, n_recommendations=2)
     assert len(recommendations) == 2
     assert all(isinstance(rec[0], int) for rec in recommendations)
     assert all(isinstance(rec[1], float) for rec in recommendations)
 
-def test_collaborative_recommendations(db: Session):
+def test_collaborative_recommendations(db: Session, sample_books, sample_activities):
     """Test collaborative filtering recommendations"""
     recommender = HybridRecommender(db)
-    recommender.train(SAMPLE_BOOKS, SAMPLE_ACTIVITIES)
+    recommender.train(sample_books, sample_activities)
     
     recommendations = recommender.get_collaborative_recommendations(user_id=1, n_recommendations=2)
     assert len(recommendations) == 2
     assert all(isinstance(rec[0], int) for rec in recommendations)
     assert all(isinstance(rec[1], float) for rec in recommendations)
 
-def test_hybrid_recommendations(db: Session):
+def test_hybrid_recommendations(db: Session, sample_books, sample_activities):
     """Test hybrid recommendations"""
     recommender = HybridRecommender(db)
-    recommender.train(SAMPLE_BOOKS, SAMPLE_ACTIVITIES)
+    recommender.train(sample_books, sample_activities)
     
     recommendations = recommender.get_hybrid_recommendations(
         user_id=1,
@@ -108,17 +61,339 @@ def test_hybrid_recommendations(db: Session):
     assert all(isinstance(rec["score"], float) for rec in recommendations)
     assert all(isinstance(rec["reason"], str) for rec in recommendations)
 
-def test_recommendation_reasons(db: Session):
+def test_score_blender():
+    """Test weighted blending of dense and sparse signals"""
+    import numpy as np
+    from app.services.blending import ScoreBlender, Signal
+
+    blender = ScoreBlender(np.array([10, 20, 30]))
+    blender.add(Signal('content', [1.0, 0.5, 0.0], 0.3, "content"))
+    blender.add(Signal('collaborative', [0.0, 2.0, 1.0], 0.7, "collab"))
+    # Items outside the catalog are appended rather than dropped
+    blender.add(Signal('augmented', [4.0], 0.5, "augmented", item_ids=[40]))
+
+    results = blender.blend(3, exclude=[30])
+    assert [rec['book_id'] for rec in results] == [20, 40, 10]
+    assert [rec['reason'] for rec in results] == ["collab", "augmented", "content"]
+    assert np.isclose(results[0]['score'], 0.3 * 0.5 + 0.7 * 1.0)
+
+def test_two_stage_pipeline_matches_full_scoring(db: Session, sample_books, sample_activities):
+    """Test that re-ranking the candidate union reproduces full-catalog scoring"""
+    from app.services.candidates import RecommendationPipeline, StageTimings
+
+    recommender = HybridRecommender(db)
+    recommender.train(sample_books, sample_activities)
+
+    timings = StageTimings()
+    pipeline = RecommendationPipeline(timings=timings)
+    two_stage = pipeline.recommend(recommender, user_id=1, n_recommendations=3)
+    full = recommender.get_hybrid_recommendations(user_id=1, n_recommendations=3)
+
+    assert [rec['book_id'] for rec in two_stage] == [rec['book_id'] for rec in full]
+    assert all(abs(a['score'] - b['score']) < 1e-6 for a, b in zip(two_stage, full))
+    assert {"candidates.content", "rerank", "total"} <= set(timings.summary())
+
+    # A single collaborative candidate keeps its full-catalog score: retrieval
+    # ranks by dot product and signals are normalised by catalog-wide maxima
+    from app.services.candidates import CollaborativeCandidates
+    narrow = RecommendationPipeline([CollaborativeCandidates(n_candidates=1)], timings=timings)
+    [only] = narrow.recommend(recommender, user_id=1, n_recommendations=1)
+    full_scores = {
+        rec['book_id']: rec['score']
+        for rec in recommender.get_hybrid_recommendations(user_id=1, n_recommendations=len(sample_books))
+    }
+    assert abs(only['score'] - full_scores[only['book_id']]) < 1e-6
+
+def test_trending_and_category_candidates(db: Session, sample_books, sample_activities, add_books):
+    """Test the trending and shared-category candidate generators"""
+    from app.services.candidates import CategoryCandidates, TrendingCandidates
+    from app.services.trending import TrendingEngine
+
+    add_books({1: ["Fiction", "Classic"], 2: ["Fiction"], 3: ["Fiction", "Classic"], 4: []})
+    recommender = HybridRecommender(db)
+    recommender.train(sample_books, sample_activities)
+    history = recommender.user_history(1)
+
+    rows = CategoryCandidates().generate(recommender, history, None, db=db)
+    assert recommender.book_ids[rows].tolist() == [3]
+
+    engine = TrendingEngine(half_life=3600.0)
+    engine.record(2, weight=2.0)
+    engine.record(99, weight=5.0)  # Not in the trained catalog
+    engine.record(3, weight=1.0)
+    rows = TrendingCandidates(engine=engine).generate(recommender, history, None)
+    assert recommender.book_ids[rows].tolist() == [2, 3]
+
+def test_recommendation_reasons(db: Session, sample_books, sample_activities):
     """Test recommendation reason generation"""
     recommender = HybridRecommender(db)
-    recommender.train(SAMPLE_BOOKS, SAMPLE_ACTIVITIES)
-    
-    # Test user-based recommendation reason
-    reason = recommender._get_recommendation_reason(book_id=1, user_id=1, source_book_id=None)
-    assert isinstance(reason, str)
-    assert "reading history" in reason.lower()
-    
-    # Test book-based recommendation reason
-    reason = recommender._get_recommendation_reason(book_id=1, user_id=None, source_book_id=2)
-    assert isinstance(reason, str)
-    assert "similarity" in reason.lower() 
\ No newline at end of file
+    recommender.train(sample_books, sample_activities)
+
+    # Test user-based recommendation reasons
+    recommendations = recommender.get_hybrid_recommendations(user_id=1, n_recommendations=2)
+    assert recommendations
+    for rec in recommendations:
+        assert isinstance(rec['reason'], str)
+        assert "content similarity" in rec['reason'] or "similar users" in rec['reason']
+
+    # Test book-based recommendation reasons
+    recommendations = recommender.get_similar_books(book_id=2, n_recommendations=2)
+    assert recommendations
+    assert all(rec['reason'] == "Similar to 1984" for rec in recommendations)
+
+def test_evaluation_metrics():
+    """Test synthetic data generation, the held-out split and precision/recall@k"""
+    from app.services.evaluation import (
+        latency_summary, make_synthetic_catalog, precision_recall_at_k, split_by_user
+    )
+
+    books, activities = make_synthetic_catalog(n_books=200, n_users=50, n_genres=5, seed=1)
+    assert len(books) == 200
+    assert {activity['book_id'] for activity in activities} <= set(range(200))
+
+    train, test = split_by_user(activities, test_fraction=0.25, seed=1)
+    assert len(train) + sum(len(items) for items in test.values()) == len(activities)
+    for user_id, items in test.items():
+        train_items = {a['book_id'] for a in train if a['user_id'] == user_id}
+        assert train_items and not train_items & items
+
+    metrics = precision_recall_at_k({1: [5, 6, 7, 8], 2: [9]}, {1: {5, 8}, 2: {1, 2}}, k=4)
+    assert metrics['precision@4'] == pytest.approx((2 / 4 + 0) / 2)
+    assert metrics['recall@4'] == pytest.approx((2 / 2 + 0) / 2)
+
+    summary = latency_summary([0.001] * 99 + [0.1])
+    assert summary['p50_ms'] == pytest.approx(1.0)
+    assert summary['max_ms'] == pytest.approx(100.0)
+
+def test_artifact_store_round_trip(tmp_path):
+    """Test that saved artifacts load back memory-mapped and verified"""
+    import numpy as np
+    from scipy.sparse import csr_matrix
+    from app.services.artifacts import ModelArtifactStore
+
+    store = ModelArtifactStore(tmp_path)
+    dense = np.arange(12, dtype=np.float32).reshape(3, 4)
+    sparse = csr_matrix(np.array([[0, 1.5], [2.0, 0]]))
+    manifest = store.save("test_model", arrays={"dense": dense, "sparse": sparse}, objects={"meta": {"k": 2}})
+
+    arrays, objects = store.load(manifest)
+    assert isinstance(arrays["dense"], np.memmap)
+    assert np.array_equal(arrays["dense"], dense)
+    assert np.array_equal(arrays["sparse"].toarray(), sparse.toarray())
+    assert objects["meta"] == {"k": 2}
+
+    # Corrupted files are rejected when verified, truncated ones on every load
+    dense_file = tmp_path / manifest["path"] / manifest["files"]["dense"]["file"]
+    with open(dense_file, "r+b") as f:
+        f.seek(-1, 2)
+        f.write(b"\xff")
+    with pytest.raises(ValueError):
+        store.verify(manifest)
+    with pytest.raises(ValueError):
+        store.load(manifest, verify=True)
+    with open(dense_file, "r+b") as f:
+        f.truncate(dense_file.stat().st_size - 8)
+    with pytest.raises(ValueError):
+        store.load(manifest)
+
+def test_batch_recommendations(db: Session, sample_books, sample_activities):
+    """Test batch scoring against a per-user W x H ranking"""
+    import numpy as np
+
+    recommender = HybridRecommender(db)
+    recommender.train(sample_books, sample_activities)
+
+    batch = recommender.recommend_batch([1, 2, 99], n_recommendations=3, exclude_seen=False)
+    assert set(batch) == {1, 2}
+
+    item_factors = recommender.collaborative_model.components_
+    for user_id, recs in batch.items():
+        scores = recommender.user_factors[recommender.user_index[user_id]] @ item_factors
+        expected = [int(recommender.book_ids[idx]) for idx in np.argsort(-scores, kind="stable")]
+        assert [book_id for book_id, _ in recs] == expected
+
+    # Books the user already interacted with are skipped by default
+    unseen = recommender.recommend_batch([1], n_recommendations=3)
+    assert [book_id for book_id, _ in unseen[1]] == [3]
+
+def test_bulk_create_recommendations(db: Session):
+    """Test storing recommendation sets for many users at once"""
+    created = crud_recommendations.bulk_create_recommendations(
+        db,
+        {
+            1: [{"book_id": 2, "relevance_score": 1.0}, {"book_id": 3, "relevance_score": 0.5}],
+            2: [{"book_id": 1, "relevance_score": 1.0}],
+            3: []
+        }
+    )
+    assert created == 2
+
+    recommendations = crud_recommendations.get_user_recommendations(db, user_id=1)
+    assert len(recommendations) == 1
+    assert [item.book_id for item in sorted(recommendations[0].items, key=lambda i: i.position)] == [2, 3]
+
+    # A new batch replaces the previous active set
+    crud_recommendations.bulk_create_recommendations(db, {1: [{"book_id": 3, "relevance_score": 1.0}]})
+    recommendations = crud_recommendations.get_user_recommendations(db, user_id=1)
+    assert len(recommendations) == 1
+    assert recommendations[0].items[0].book_id == 3
+
+def test_collaborative_fold_in_for_new_user(db: Session, sample_books, sample_activities):
+    """Test that users unknown to the model are folded in from their interactions"""
+    import numpy as np
+
+    recommender = HybridRecommender(db)
+    recommender.train(sample_books, sample_activities)
+
+    assert recommender.get_collaborative_recommendations(user_id=99) == []
+
+    interactions = {1: 1.0, 2: 0.8}
+    user_features = recommender.fold_in(interactions)
+    assert user_features.shape == (recommender.collaborative_model.n_components_,)
+    assert np.all(user_features >= 0)
+
+    # Folding in a known user's history reconstructs it about as well as the trained row
+    item_factors = recommender.collaborative_model.components_
+    target = recommender.user_item_matrix[recommender.user_index[1]].toarray()[0]
+    trained_error = np.linalg.norm(target - recommender.user_factors[recommender.user_index[1]] @ item_factors)
+    folded_error = np.linalg.norm(target - user_features @ item_factors)
+    assert folded_error <= trained_error + 0.1
+
+    recommendations = recommender.get_collaborative_recommendations(
+        user_id=99, n_recommendations=2, interactions=interactions
+    )
+    assert len(recommendations) == 2
+
+def test_incremental_update(db: Session, sample_books, sample_activities):
+    """Test that new books and interactions are added without a full refit"""
+    import numpy as np
+    from app.services.neighbors import ContentNeighborIndex
+
+    recommender = HybridRecommender(db)
+    recommender.train(sample_books[:2], sample_activities[:3])
+    version = recommender.version
+
+    needs_refit = recommender.update(
+        sample_books,
+        [
+            {"user_id": 2, "book_id": 3, "interaction_score": 0.7},
+            {"user_id": 3, "book_id": 3, "interaction_score": 1.0}
+        ]
+    )
+    assert needs_refit  # half the catalog is new
+    assert recommender.version == version + 1
+    assert recommender.user_item_matrix.shape == (3, 3)
+    assert recommender.user_item_matrix[recommender.user_index[3], 2] == 1.0
+
+    # Merging the new book into the index matches building it from scratch
+    rebuilt = ContentNeighborIndex.build(recommender.content_matrix, k=recommender.content_model.k)
+    for row in range(3):
+        assert list(recommender.content_model.neighbors(row)[0]) == list(rebuilt.neighbors(row)[0])
+
+    assert np.any(recommender.user_factors[recommender.user_index[3]] > 0)
+    assert len(recommender.get_collaborative_recommendations(user_id=3, n_recommendations=2)) == 2
+
+    # Repeated and updated interactions replace the stored score instead of adding to it
+    recommender.update(sample_books, [
+        {"user_id": 1, "book_id": 1, "interaction_score": 0.2},
+        {"user_id": 3, "book_id": 3, "interaction_score": 0.4},
+        {"user_id": 3, "book_id": 3, "interaction_score": 0.3}
+    ])
+    assert recommender.user_item_matrix[recommender.user_index[1], recommender.book_index[1]] == pytest.approx(0.2)
+    assert recommender.user_item_matrix[recommender.user_index[3], 2] == pytest.approx(0.3)
+
+def test_activities_since_includes_updated_activities(db: Session):
+    """Test incremental updates see activities modified after the last train"""
+    from datetime import datetime, timedelta
+    from app.models.user_activities import UserActivity
+
+    old = datetime.utcnow() - timedelta(days=2)
+    db.add_all([
+        UserActivity(id=1, user_id=1, book_id=1, activity_type="view", created_at=old, updated_at=old),
+        UserActivity(id=2, user_id=1, book_id=2, activity_type="view", created_at=old, updated_at=old)
+    ])
+    db.commit()
+    since = datetime.utcnow() - timedelta(days=1)
+    assert crud_recommendations.get_activities_since(db, since=since) == []
+
+    db.get(UserActivity, 2).activity_type = "favorite"
+    db.commit()
+    assert [activity.id for activity in crud_recommendations.get_activities_since(db, since=since)] == [2]
+    assert len(crud_recommendations.get_activities_since(db)) == 2
+
+def test_training_job_queue(db: Session):
+    """Test that retrain requests are coalesced and one job per model runs at a time"""
+    first = crud_recommendations.enqueue_training_job(db, "hybrid_recommender", kind="update")
+    second = crud_recommendations.enqueue_training_job(db, "hybrid_recommender")
+    assert second.id == first.id
+    assert second.kind == "train"  # a full retrain supersedes the queued update
+
+    job = crud_recommendations.claim_training_job(db)
+    assert job.id == first.id and job.status == "RUNNING"
+
+    # A new request queues behind the running job but cannot start yet
+    queued = crud_recommendations.enqueue_training_job(db, "hybrid_recommender")
+    assert queued.id != job.id
+    assert crud_recommendations.claim_training_job(db) is None
+
+    crud_recommendations.finish_training_job(db, job.id, model_version=2)
+    assert crud_recommendations.get_training_job(db, job.id).status == "SUCCEEDED"
+    assert crud_recommendations.claim_training_job(db).id == queued.id
+
+def test_update_job_watermark_and_untrained_fallback(db: Session, monkeypatch, sample_books, sample_activities):
+    """Test updates need a trained model and resume from when their data was read"""
+    from datetime import datetime
+    from app.services import training
+
+    # A "since" in the payload does not make an untrained model updatable
+    trained = []
+    monkeypatch.setattr(training, "SessionLocal", lambda: db)
+    monkeypatch.setattr(training, "_refresh_cooccurrence", lambda db, full: None)
+    monkeypatch.setattr(training, "_train", lambda db, recommender: trained.append(recommender))
+    as_of = datetime(2026, 1, 1, 12, 0)
+    job = crud_recommendations.enqueue_training_job(
+        db, "hybrid_recommender", kind="update", payload={"since": as_of.isoformat()}
+    )
+    training.run_training_job(job.id)
+    assert len(trained) == 1 and not trained[0].is_trained
+
+    recommender = HybridRecommender(db)
+    recommender.train(sample_books, sample_activities, data_as_of=as_of)
+    assert recommender.training_stats['updated_at'] == as_of.isoformat()
+
+def test_augmented_similar_users(ml_models_dir, monkeypatch):
+    """Test similar-user search over the collaborative ratings file"""
+    import pandas as pd
+    from app.services.augmented_recommender import AugmentedHybridRecommender
+
+    pd.DataFrame({
+        "user_id": [1, 1, 2, 2, 3, 3, 4],
+        "book_id": [10, 11, 10, 11, 12, 13, 12],
+        "rating": [5, 4, 5, 5, 4, 5, 3]
+    }).to_csv(ml_models_dir / "colaborative.csv", index=False)
+    pd.DataFrame({
+        "book_id": [10, 11, 12],
+        "title": ["A", "B", "C"],
+        "feature": [1.0, 0.9, -1.0]
+    }).to_pickle(ml_models_dir / "processed_df.pkl")
+
+    recommender = AugmentedHybridRecommender()
+    assert recommender._get_similar_users(1, n_similar=1) == [2]
+    assert recommender._get_similar_users(3, n_similar=1) == [4]
+    assert recommender.user_vector_index is None
+
+    # Above VECTOR_INDEX_MIN_SIZE users switch to SVD embeddings behind the IVF index
+    monkeypatch.setattr(settings, "VECTOR_INDEX_MIN_SIZE", 4)
+    approximate = AugmentedHybridRecommender()
+    assert approximate.user_unit_rows is None
+    assert approximate._get_similar_users(1, n_similar=1) == [2]
+    assert [rec["book_id"] for rec in recommender.get_similar_books(10, 1)] == [11]
+
+    # Ratings below 4 (user 4's 3 for book 12) do not count as liked
+    recommendations = recommender.get_user_recommendations(1, n_recommendations=5)
+    assert {rec["book_id"]: rec["score"] for rec in recommendations} == {10: 5.0, 11: 5.0, 12: 4.0, 13: 5.0}
+    assert recommendations[-1]["book_id"] == 12
+    assert recommender.get_user_recommendations(99) == []
+
+    book_ids, ratings = recommender.history.history(3)
+    assert dict(zip(book_ids.tolist(), ratings.tolist())) == {12: 4.0, 13: 5.0}
@@ -0,0 +1,154 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.reviews import BookReview
+from app.services import review_sentiment
+from app.services.review_sentiment import get_review_sentiments, sentiment_stats
+from app.services import sentiment_analyzer as sentiment
+from app.services.sentiment_analyzer import length_buckets
+
+def test_review_sentiment_store(db: Session, monkeypatch, ml_models_dir, add_books, add_users):
+    """Test stored sentiments are reused until the text or model version changes"""
+    monkeypatch.setattr(settings, "SENTIMENT_MODEL_VERSION", "v1")
+    monkeypatch.setattr(settings, "SENTIMENT_BACKEND", "torch")
+    monkeypatch.setattr(sentiment, "_shared_analyzer", None)
+    (ml_models_dir / "roberta_model").mkdir()
+
+    class CountingAnalyzer:
+        model_version = "v1+torch"
+
+        def __init__(self):
+            self.analyzed = []
+
+        def analyze_batch(self, texts):
+            self.analyzed.extend(texts)
+            return [
+                {"sentiment": "positive", "confidence": 0.9,
+                 "scores": {"negative": 0.05, "neutral": 0.05, "positive": 0.9}}
+                for _ in texts
+            ]
+
+    add_books({1: []})
+    add_users([1, 2, 3])
+    reviews = [
+        BookReview(review_id=1, user_id=1, book_id=1, rating=5, review_text="Loved it"),
+        BookReview(review_id=2, user_id=2, book_id=1, rating=4, review_text="Great read"),
+        BookReview(review_id=3, user_id=3, book_id=1, rating=3)
+    ]
+    db.add_all(reviews)
+    db.commit()
+
+    analyzer = CountingAnalyzer()
+    sentiments = get_review_sentiments(db, reviews, analyzer)
+    assert set(sentiments) == {1, 2}
+    assert analyzer.analyzed == ["Loved it", "Great read"]
+
+    # Served from the store, without loading an analyzer
+    def no_analyzer():
+        raise AssertionError("the analyzer should not be loaded")
+    monkeypatch.setattr(review_sentiment, "get_sentiment_analyzer", no_analyzer)
+    assert get_review_sentiments(db, reviews) == sentiments
+    assert len(analyzer.analyzed) == 2
+
+    # Only the edited review is recomputed
+    reviews[0].review_text = "Loved it, mostly"
+    db.commit()
+    get_review_sentiments(db, reviews, analyzer)
+    assert analyzer.analyzed[2:] == ["Loved it, mostly"]
+
+    # A new model version recomputes everything
+    monkeypatch.setattr(settings, "SENTIMENT_MODEL_VERSION", "v2")
+    analyzer.model_version = "v2+torch"
+    get_review_sentiments(db, reviews, analyzer)
+    assert len(analyzer.analyzed) == 5
+
+    stats = sentiment_stats(list(sentiments.values()))
+    assert stats["total_reviews"] == 2
+    assert stats["average_sentiment"] == pytest.approx(0.85)
+    assert stats["sentiment_distribution"]["Very Positive"] == 2
+
+def test_rule_based_sentiments_stay_fresh_without_a_model(db: Session, monkeypatch, add_books, add_users):
+    """Test results of the rule-based fallback are reused while no model is installed"""
+    add_books({1: []})
+    add_users([1])
+    reviews = [BookReview(review_id=1, user_id=1, book_id=1, rating=5, review_text="A great book")]
+    db.add_all(reviews)
+    db.commit()
+
+    monkeypatch.setattr(sentiment, "_shared_analyzer", None)
+    sentiments = get_review_sentiments(db, reviews)
+    assert sentiments[1]["sentiment"] == "positive"
+
+    # A fresh process serves them from the store without loading the analyzer
+    def no_analyzer():
+        raise AssertionError("the analyzer should not be loaded")
+    monkeypatch.setattr(sentiment, "_shared_analyzer", None)
+    monkeypatch.setattr(review_sentiment, "get_sentiment_analyzer", no_analyzer)
+    assert get_review_sentiments(db, reviews) == sentiments
+
+def test_sentiment_batches_respect_token_budget(monkeypatch):
+    """Test batched inference stays within the batch limits and returns results in input order"""
+    class StubTokenizer:
+        def __call__(self, texts, truncation, max_length):
+            input_ids = [[1] * min(len(text.split()), max_length) for text in texts]
+            return {"input_ids": input_ids, "attention_mask": [[1] * len(ids) for ids in input_ids]}
+
+        def pad(self, features, return_tensors):
+            longest = max(len(ids) for ids in features["input_ids"])
+            return {
+                key: np.array([row + [0] * (longest - len(row)) for row in rows])
+                for key, rows in features.items()
+            }
+
+    class StubSession:
+        """Labels a text by its token count: <= 3 negative, <= 6 neutral, else positive."""
+
+        def __init__(self):
+            self.shapes = []
+
+        def get_inputs(self):
+            return [SimpleNamespace(name="input_ids"), SimpleNamespace(name="attention_mask")]
+
+        def run(self, outputs, feed):
+            self.shapes.append(feed["input_ids"].shape)
+            lengths = feed["attention_mask"].sum(axis=1)
+            labels = np.digitize(lengths, [4, 7])
+            return [np.eye(3)[labels] * 10]
+
+    monkeypatch.setattr(settings, "SENTIMENT_MAX_BATCH_TOKENS", 12)
+    monkeypatch.setattr(settings, "SENTIMENT_MAX_LENGTH", 10)
+    analyzer = sentiment.SentimentAnalyzer()
+    analyzer.tokenizer, analyzer.session = StubTokenizer(), StubSession()
+
+    texts = [" ".join(["word"] * n) for n in (9, 1, 5, 2, 30, 4, 8, 3, 6)]
+    results = analyzer.analyze_batch(texts, batch_size=3)
+    expected = ["positive", "negative", "neutral", "negative", "positive", "neutral", "positive", "negative", "neutral"]
+    assert [result["sentiment"] for result in results] == expected
+    assert sum(rows for rows, _ in analyzer.session.shapes) == len(texts)
+    for rows, width in analyzer.session.shapes:
+        assert rows <= 3
+        assert width <= settings.SENTIMENT_MAX_LENGTH
+        assert rows == 1 or rows * width <= settings.SENTIMENT_MAX_BATCH_TOKENS
+
+def test_sentiment_batching_and_lazy_loading(monkeypatch):
+    """Test length bucketing and that the shared analyzer loads once, falling back without a model"""
+    lengths = [5, 50, 6, 48, 7, 300]
+    batches = length_buckets(lengths, batch_size=2, max_batch_tokens=200)
+    assert sorted(idx for batch in batches for idx in batch) == list(range(len(lengths)))
+    assert batches == [[0, 2], [4, 3], [1], [5]]
+    assert all(len(batch) * max(lengths[idx] for idx in batch) <= 200 for batch in batches if len(batch) > 1)
+
+    monkeypatch.setattr(sentiment, "_shared_analyzer", None)
+    sentiment.warmup_sentiment_analyzer().join()
+    analyzer = sentiment.get_sentiment_analyzer()
+    assert analyzer is sentiment.get_sentiment_analyzer()
+    assert analyzer.model_version == "rule-based"
+    monkeypatch.setattr(settings, "SENTIMENT_MODEL_VERSION", "v1")
+    monkeypatch.setattr(settings, "SENTIMENT_ONNX_FILE", "model.int8.onnx")
+    assert sentiment.sentiment_model_version("quantized") == "v1+quantized"
+    assert sentiment.sentiment_model_version("onnx") == "v1+onnx:model.int8.onnx"
+    assert [result["sentiment"] for result in analyzer.analyze_batch(["a great book", "awful", "fine"])] == [
+        "positive", "negative", "neutral"
+    ]
@@ -0,0 +1,52 @@
+import pytest
+from sqlalchemy.orm import Session
+from app.services import strategies
+from app.services.recommender import HybridRecommender
+from app.services.strategies import (
+    CategoryStrategy, PopularityStrategy, RecommendationContext, SimilarReadersStrategy, run_strategies
+)
+
+def test_sql_strategies_share_inputs(db: Session, add_books, add_users, add_reviews):
+    """Test the SQL-backed strategies and that shared inputs are computed once per request"""
+    add_books({1: ["Fiction"], 2: ["Fiction"], 3: ["History"], 4: ["History"]})
+    add_users([1, 2])
+    add_reviews([(1, 1, 5), (2, 1, 4), (2, 3, 5), (2, 4, 2)])
+
+    recommender = HybridRecommender(db)
+    calls = []
+    sql_scores = RecommendationContext.providers["sql_scores"]
+    context = RecommendationContext(recommender, user_id=1, n_recommendations=5)
+    context.providers = dict(RecommendationContext.providers, sql_scores=lambda c: calls.append(1) or sql_scores(c))
+    strategies.shared_inputs.clear()
+
+    signals = {
+        signal.name: dict(zip(signal.item_ids, signal.scores.tolist()))
+        for signal in run_strategies(context, [
+            SimilarReadersStrategy(0.4), CategoryStrategy(0.3), PopularityStrategy(0.3)
+        ])
+    }
+    assert len(calls) == 1
+    assert signals["similar_readers"] == {3: 1.0}
+    assert signals["category"] == {2: 1.0}
+    assert list(signals["popularity"]) == [1, 3, 4]
+    assert signals["popularity"][1] == pytest.approx((0.3 * 2) * 4.5 / 5)
+
+    # Without a trained model, hybrid recommendations come from the SQL strategies
+    recommendations = recommender.get_hybrid_recommendations(user_id=1, n_recommendations=3)
+    assert {rec['book_id'] for rec in recommendations} >= {2, 3}
+
+def test_registry_recommender_uses_request_session(db: Session, add_books, add_users, add_reviews):
+    """Test the SQL fallback of the shared, session-less recommender served by the registry"""
+    from app.services.model_registry import ModelRegistry
+
+    add_books({1: ["Fiction"], 2: ["Fiction"], 3: ["History"]})
+    add_users([1, 2])
+    add_reviews([(1, 1, 5), (2, 1, 4), (2, 3, 5)])
+    strategies.shared_inputs.clear()
+
+    recommender = ModelRegistry().get_recommender(db)
+    assert recommender.db is None
+    recommendations = recommender.get_hybrid_recommendations(user_id=1, n_recommendations=3, db=db)
+    reasons = {rec['book_id']: rec['reason'] for rec in recommendations}
+    assert reasons[3] == "Liked by readers with similar taste"
+    assert reasons[2] == "In categories you like"
@@ -0,0 +1,154 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from app.crud import recommendations as crud_recommendations
+from app.models.recommendations import BookPopularity
+from app.services.trending import TrendingEngine
+
+def test_book_popularity_rollup(db: Session, add_books):
+    """Test incremental popularity buckets, trending windows and pruning"""
+    add_books({1: [], 2: [], 3: []})
+
+    now = datetime(2026, 3, 10, 12, 30)
+    record = crud_recommendations.record_popularity_event
+    record(db, 1, views=1, at=now)
+    record(db, 1, views=1, at=now - timedelta(minutes=20))
+    record(db, 1, ratings=1, rating_sum=4.0, at=now)
+    record(db, 2, views=1, favorites=1, at=now - timedelta(hours=3))
+    record(db, 2, favorites=-1, at=now)
+    for day in range(3, 6):
+        record(db, 3, views=1, at=now - timedelta(days=day))
+
+    hourly = db.query(BookPopularity).filter_by(book_id=1, granularity="hour").all()
+    assert len(hourly) == 1 and hourly[0].views == 2 and hourly[0].ratings == 1
+
+    trending = crud_recommendations.get_trending_books(db, limit=2, days=1, now=now)
+    assert [book["book_id"] for book in trending] == [1, 2]
+    assert trending[0]["recent_views"] == 2
+    assert trending[0]["average_rating"] == 4.0
+
+    trending = crud_recommendations.get_trending_books(db, limit=10, days=7, now=now)
+    assert [book["book_id"] for book in trending] == [3, 1, 2]
+
+    deleted = crud_recommendations.prune_book_popularity(db, now=now + timedelta(days=3))
+    assert deleted == 6  # Every hourly bucket; daily ones are kept
+    assert crud_recommendations.get_trending_books(db, days=1, now=now) == []
+
+def test_review_edits_keep_popularity_consistent(db: Session, add_books, add_users):
+    """Test rating edits and deletions retract the review's original rollup counts"""
+    from app.crud import reviews as crud_reviews
+    from app.models.reviews import BookReview
+    from app.schemas.reviews import BookReviewUpdate
+
+    now = datetime.utcnow()
+    old = now - timedelta(days=30)
+    add_books({1: []})
+    add_users([1, 2])
+    db.add_all([
+        BookReview(review_id=1, user_id=1, book_id=1, rating=5, created_at=old, review_date=old),
+        BookReview(review_id=2, user_id=2, book_id=1, rating=4, created_at=now, review_date=now)
+    ])
+    db.commit()
+    crud_recommendations.rebuild_book_popularity(db, now=now)
+    crud_recommendations.record_popularity_event(db, 1, views=1, at=now)
+
+    # A review from outside the window edited inside it counts as a fresh rating
+    crud_reviews.update_book_review(db, 1, BookReviewUpdate(rating=1), user_id=1)
+    trending = crud_recommendations.get_trending_books(db, days=7)
+    assert trending[0]["recent_ratings"] == 2
+    assert trending[0]["average_rating"] == 2.5
+    old_day = db.get(BookPopularity, (1, "day", crud_recommendations.popularity_bucket(old, "day")))
+    assert (old_day.ratings, old_day.rating_sum) == (0, 0.0)
+
+    assert crud_reviews.delete_book_review(db, 2, user_id=2)
+    trending = crud_recommendations.get_trending_books(db, days=7)
+    assert trending[0]["recent_ratings"] == 1
+    assert trending[0]["average_rating"] == 1.0
+
+def test_trending_engine_decay_and_checkpoint(tmp_path):
+    """Test decayed scores, top-k after updates, rebasing and checkpoint restore"""
+    hour = 3600.0
+    engine = TrendingEngine(half_life=hour, checkpoint_path=tmp_path / "trending.json", checkpoint_interval=1e9)
+    engine.record(1, weight=4.0, at=0.0)
+    engine.record(2, weight=1.0, at=0.0)
+    engine.record(2, weight=2.0, at=2 * hour)
+
+    # Book 1 decayed to 1.0 after two half-lives, book 2 is 0.25 + 2
+    assert engine.score(1, at=2 * hour) == pytest.approx(1.0)
+    assert engine.top(2, at=2 * hour) == [(2, pytest.approx(2.25)), (1, pytest.approx(1.0))]
+    assert engine.top(5, at=3 * hour)[0][1] == pytest.approx(1.125)
+
+    # Far-future events rebase the stored scores without changing the ranking semantics
+    engine.record(3, weight=1.0, at=100 * hour)
+    assert engine.reference == 100 * hour
+    assert engine.top(1, at=100 * hour) == [(3, pytest.approx(1.0))]
+    assert engine.score(2, at=100 * hour) == pytest.approx(2.25 * 0.5 ** 98, rel=1e-6, abs=1e-12)
+
+    engine.save()
+    restored = TrendingEngine(half_life=hour, checkpoint_path=tmp_path / "trending.json")
+    assert restored.restore()
+    assert restored.top(3, at=101 * hour) == engine.top(3, at=101 * hour)
+
+def test_trending_checkpoints_of_all_workers_are_summed(tmp_path):
+    """Test every process checkpoints its own events and restore sums them"""
+    hour = 3600.0
+    path = tmp_path / "trending.json"
+    first = TrendingEngine(half_life=hour, checkpoint_path=path, checkpoint_interval=1e9)
+    second = TrendingEngine(half_life=hour, checkpoint_path=path, checkpoint_interval=1e9)
+    first.record(1, weight=2.0, at=0.0)
+    second.record(1, weight=1.0, at=hour)
+    second.record(2, weight=1.0, at=hour)
+    first.save()
+    second.save()
+    assert len(list(tmp_path.glob("trending.*.json"))) == 2
+    assert not list(tmp_path.glob("*.tmp"))
+
+    restored = TrendingEngine(half_life=hour, checkpoint_path=path, checkpoint_interval=1e9)
+    assert restored.restore()
+    assert restored.top(2, at=hour) == [(1, pytest.approx(2.0)), (2, pytest.approx(1.0))]
+
+    # Restored scores are not checkpointed again, only new events are
+    restored.record(2, weight=1.0, at=hour)
+    restored.save()
+    again = TrendingEngine(half_life=hour, checkpoint_path=path)
+    assert again.restore()
+    assert again.score(2, at=hour) == pytest.approx(2.0)
+
+def test_trending_unfavorite_retracts_the_favorite():
+    """Test toggling a favorite on and off never inflates the live score"""
+    hour = 3600.0
+    engine = TrendingEngine(half_life=hour, checkpoint_interval=1e9)
+    engine.record(1, weight=1.0, at=0.0)
+    for _ in range(5):
+        engine.record(1, "favorite", at=hour)
+        engine.retract(1, "favorite", at=hour)
+    assert engine.score(1, at=hour) == pytest.approx(0.5)
+
+    # An old favorite undone later takes away at most the book's score
+    engine.record(2, "favorite", at=0.0)
+    engine.retract(2, "favorite", at=hour)
+    assert engine.score(2, at=hour) == 0.0
+    assert engine.top(5, at=hour) == [(1, pytest.approx(0.5))]
+
+def test_rebuilt_popularity_matches_live_counts(db: Session, add_books, add_users, add_reviews):
+    """Test a rebuild counts the same views, favorites and ratings as the live path"""
+    add_books({1: [], 2: []})
+    add_users([1, 2])
+    for user_id, book_id in [(1, 1), (1, 1), (2, 1), (2, 2)]:
+        crud_recommendations.record_book_view(db, user_id, book_id)
+    crud_recommendations.toggle_favorite(db, 1, 1)
+    crud_recommendations.toggle_favorite(db, 2, 2)
+    crud_recommendations.toggle_favorite(db, 2, 2)
+    add_reviews([(1, 2, 4)])
+    crud_recommendations.record_popularity_event(db, 2, ratings=1, rating_sum=4.0)
+
+    def totals():
+        return {
+            (row.book_id, row.granularity): (row.views, row.favorites, row.ratings, row.rating_sum)
+            for row in db.query(BookPopularity).all()
+        }
+
+    live = totals()
+    assert live[(1, "day")] == (3, 1, 0, 0.0)
+    crud_recommendations.rebuild_book_popularity(db)
+    assert totals() == live